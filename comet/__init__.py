@@ -1,10 +1,38 @@
 __version__ = '1.0.0'
 
-from .application import Application
-from .httpserver import HttpServer
-from .collection import Collection
-from .job import Job
-from .service import Service
-from .device import Device
-from .filewriter import FileWriter, CSVFileWriter, HephyDBFileWriter
-from .settings import Settings
+import importlib
+
+# Public classes by module, submodules are imported on first attribute access
+# so that importing comet does not load pyvisa, yaml, bottle etc.
+_lazy_imports = {
+    'Application': 'application',
+    'HttpServer': 'httpserver',
+    'Collection': 'collection',
+    'Job': 'job',
+    'Service': 'service',
+    'Scheduler': 'scheduler',
+    'Device': 'device',
+    'AsyncDevice': 'asyncdevice',
+    'FileWriter': 'filewriter',
+    'CSVFileWriter': 'filewriter',
+    'HephyDBFileWriter': 'filewriter',
+    'SegmentFileWriter': 'filewriter',
+    'SegmentReader': 'segments',
+    'Settings': 'settings',
+    'SettingsStore': 'settings',
+    'Ramp': 'ramp',
+    'Variant': 'variant',
+}
+
+__all__ = list(_lazy_imports)
+
+def __getattr__(name):
+    module = _lazy_imports.get(name)
+    if module is None:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
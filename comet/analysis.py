@@ -0,0 +1,182 @@
+import logging
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+
+import numpy as np
+
+from .storage import Records
+
+class Analysis:
+    """Collection handle running an analysis callback on batches of new
+    records in a process pool, publishing results to a target collection.
+
+    The callback receives an ordered dict of column arrays and must be
+    picklable (a module level function). It returns either None (nothing to
+    publish), a mapping of scalar values (appended as one record), a mapping
+    of column arrays or a sequence of rows (extended). Results are published
+    in the order batches were submitted by a publisher thread of the
+    analysis, never by the executor's threads.
+
+    If the executor falls behind, at most max_backlog records are kept
+    waiting for submission, the oldest records are dropped beyond that and
+    counted by attribute dropped.
+
+    :param callback: function called with columns of a batch of records
+    :param target: collection receiving results (optional)
+    :param executor: concurrent.futures executor running the callback
+    :param batch_size: minimum number of records per batch (optional)
+    :param max_pending: maximum number of batches submitted at once, further
+        records are coalesced into the next batch (optional)
+    :param max_backlog: maximum number of records waiting for submission
+        (optional)
+
+    >>> def breakdown(columns):
+    ...     index = np.argmax(np.abs(columns['i']) > 1e-6)
+    ...     return dict(time=columns['time'][-1], v=columns['v'][index])
+    >>> iv.add_analysis(breakdown, 'breakdown', batch_size=128)
+    """
+
+    batch_size = 1
+    """Default minimum number of records per batch."""
+
+    max_pending = 2
+    """Default maximum number of batches submitted at once."""
+
+    max_backlog = 1048576
+    """Default maximum number of records waiting for submission."""
+
+    def __init__(self, callback, target, executor, batch_size=None, max_pending=None, max_backlog=None):
+        self.callback = callback
+        self.target = target
+        self.executor = executor
+        if batch_size is not None:
+            self.batch_size = int(batch_size)
+        if max_pending is not None:
+            self.max_pending = int(max_pending)
+        if max_backlog is not None:
+            self.max_backlog = int(max_backlog)
+        if self.batch_size < 1:
+            raise ValueError("batch size must be greater than zero: {}".format(self.batch_size))
+        if self.max_pending < 1:
+            raise ValueError("max pending must be greater than zero: {}".format(self.max_pending))
+        if self.max_backlog < self.batch_size:
+            raise ValueError("max backlog must not be less than batch size: {}".format(self.max_backlog))
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.error = None
+        self.__chunks = []
+        self.__size = 0
+        self.__pending = deque()
+        self.__publisher = None
+        self.__condition = threading.Condition(threading.Lock())
+
+    @property
+    def name(self):
+        return getattr(self.callback, '__name__', repr(self.callback))
+
+    @property
+    def pending(self):
+        """Returns number of submitted batches not published yet."""
+        with self.__condition:
+            return len(self.__pending)
+
+    def append(self, record):
+        self.__add(OrderedDict((name, [value]) for name, value in record.items()), 1)
+
+    def extend(self, records):
+        self.__add(records.columns, len(records))
+
+    def __add(self, columns, size):
+        if not size:
+            return
+        with self.__condition:
+            self.__chunks.append(columns)
+            self.__size += size
+            self.__submit(False)
+            self.__trim()
+
+    def __trim(self):
+        """Drop oldest records exceeding backlog, requires lock to be held."""
+        excess = self.__size - self.max_backlog
+        if excess <= 0:
+            return
+        logging.warning("analysis '%s' falling behind, dropped %s records", self.name, excess)
+        self.dropped += excess
+        self.__size -= excess
+        while excess:
+            chunk = self.__chunks[0]
+            size = len(next(iter(chunk.values())))
+            if size <= excess:
+                self.__chunks.pop(0)
+                excess -= size
+            else:
+                self.__chunks[0] = OrderedDict((name, column[excess:]) for name, column in chunk.items())
+                excess = 0
+
+    def __submit(self, force):
+        """Submit collected records, requires lock to be held."""
+        if not self.__size:
+            return
+        if not force:
+            if self.__size < self.batch_size or len(self.__pending) >= self.max_pending:
+                return
+        names = list(self.__chunks[0].keys())
+        columns = OrderedDict((name, np.concatenate([np.asarray(chunk[name]) for chunk in self.__chunks])) for name in names)
+        self.__chunks = []
+        self.__size = 0
+        future = self.executor.submit(self.callback, columns)
+        self.batches += 1
+        self.__pending.append(future)
+        if self.__publisher is None:
+            self.__publisher = threading.Thread(target=self.__run_publisher, daemon=True)
+            self.__publisher.start()
+
+    def __run_publisher(self):
+        """Publish results of pending batches in order, the thread exits if
+        no batches are pending and is restarted on next submit."""
+        while True:
+            with self.__condition:
+                if not self.__pending:
+                    self.__publisher = None
+                    self.__condition.notify_all()
+                    return
+                future = self.__pending[0]
+            # Publish without holding the lock, target handles might be slow
+            self.__publish(future)
+            with self.__condition:
+                self.__pending.popleft()
+                self.__submit(False)
+                self.__condition.notify_all()
+
+    def __publish(self, future):
+        try:
+            result = future.result()
+            if result is None or self.target is None:
+                return
+            if isinstance(result, Mapping):
+                if all(np.ndim(value) == 0 for value in result.values()):
+                    self.target.append(**result)
+                else:
+                    self.target.extend(**result)
+            elif isinstance(result, Records):
+                self.target.extend(**result.columns)
+            else:
+                self.target.extend(result)
+        except Exception as e:
+            logging.error("analysis '%s' failed: %s", self.name, e)
+            self.errors += 1
+            self.error = e
+
+    def flush(self):
+        """Submit collected records even if batch size is not reached."""
+        with self.__condition:
+            self.__submit(True)
+
+    def join(self, timeout=None):
+        """Submit collected records and wait until all batches have been
+        published. Returns False on timeout."""
+        with self.__condition:
+            self.__submit(True)
+            return self.__condition.wait_for(lambda: not self.__pending and not self.__size, timeout)
@@ -1,19 +1,21 @@
-import time
 import logging
+import multiprocessing
 import threading
+import time
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 from statemachine import StateMachine, State
-import yaml
-import pyvisa
 
 from .parameter import Parameter
 from .device import DeviceFactory
-from .component import ComponentManager
+from .component import CancellationToken, ComponentManager
 from .collection import Collection
 from .job import Job, JobHandle
+from .jobgraph import JobGraph
 from .service import Service
-from .settings import Settings
+from .settings import SettingsStore
+from .supervisor import Supervisor
 from .utilities import make_path
 
 ORG_NAME = 'HEPHY'
@@ -28,25 +30,41 @@ class Application:
 
     default_backend = '@py'
 
-    event_loop_throttle = .25
-    """Throttles event loop on repeating states."""
+    event_loop_throttle = None
+    """Seconds to repeat state hooks of unchanged states (eg. on_halted), by
+    default hooks are called once per state change."""
+
+    analysis_workers = None
+    """Number of processes running collection analyses, by default the
+    number of processors."""
+
+    analysis_start_method = 'forkserver'
+    """Multiprocessing start method of analysis processes, falls back to
+    'spawn' if not supported. Processes are started while device and
+    service threads are running, forking them could inherit held locks."""
+
+    analysis_timeout = 10.0
+    """Seconds to wait for pending analyses on exit."""
 
     def __init__(self, name, backend=None):
         self.__name = name
         self.__params = OrderedDict()
-        rm = pyvisa.ResourceManager(backend or self.default_backend)
-        self.__device_factory = DeviceFactory(rm)
+        self.__backend = backend or self.default_backend
+        self.__device_factory = None
         self.__devices = OrderedDict()
         self.__collections = ComponentManager(self, type=Collection)
         self.__jobs = ComponentManager(self, type=Job)
         self.__services = ComponentManager(self, type=Service)
-        self.__threads = []
+        self.__analysis_executor = None
         self.__alive = False
         self.__running = False
         self.current_job = None
-        self.__mutex = threading.Lock()
+        self.__mutex = threading.RLock()
+        self.__condition = threading.Condition(self.__mutex)
+        self.__transitions = 0
+        self.__cancellation = CancellationToken(self)
         self.__asm = ApplicationStateMachine()
-        self.active_jobs = set()
+        self.__active_jobs = set()
         self.setup()
 
     @property
@@ -57,18 +75,15 @@ class Application:
     @property
     def settings(self):
         """Returns dictionary of persistent application settings."""
-        with Settings(ORG_NAME, APP_NAME) as settings:
-            return settings
+        return SettingsStore.instance(ORG_NAME, APP_NAME).settings()
 
     def get(self, key, default=None):
         """Returns value by key from persistent application settings."""
-        with Settings(ORG_NAME, APP_NAME) as settings:
-            return settings.get(key, default)
+        return SettingsStore.instance(ORG_NAME, APP_NAME).get(key, default)
 
     def set(self, key, value):
         """Set persistent application settings value for key. Value must be a JSON compatible object."""
-        with Settings(ORG_NAME, APP_NAME) as settings:
-            settings[key] = value
+        SettingsStore.instance(ORG_NAME, APP_NAME).set(key, value)
 
     @property
     def params(self):
@@ -84,22 +99,52 @@ class Application:
 
     # Components
 
+    @property
+    def device_factory(self):
+        """Returns device factory, the VISA resource manager is created on
+        first access."""
+        with self.__mutex:
+            if self.__device_factory is None:
+                import pyvisa
+                rm = pyvisa.ResourceManager(self.__backend)
+                self.__device_factory = DeviceFactory(rm)
+            return self.__device_factory
+
     @property
     def devices(self):
         return self.__devices
 
-    def add_device(self, name, resource_name, config={}):
-        """Register device."""
+    def add_device(self, name, resource_name, config={}, cls=None):
+        """Register device, optionally using a custom device class.
+
+        >>> self.add_device('climate', 'TCPIP::192.168.100.205::1080::SOCKET', cls=CTSDevice)
+        """
         if isinstance(config, str):
+            import yaml
             with open(make_path('config', 'devices', '{}.yml'.format(config))) as f:
                 config = yaml.safe_load(f)
                 print("CONFIG=",config)
         if name in self.__devices:
             raise KeyError("Device with name '{}' already exists.".format(name))
-        device = self.__device_factory.create(name, resource_name, config)
+        device = self.device_factory.create(name, resource_name, config, cls)
         self.__devices[name] = device
         return device
 
+    @property
+    def active_jobs(self):
+        """Returns copy of set of currently running jobs, jobs of a job
+        graph are added and removed by concurrent worker threads."""
+        with self.__mutex:
+            return set(self.__active_jobs)
+
+    def add_active_job(self, job):
+        with self.__mutex:
+            self.__active_jobs.add(job)
+
+    def remove_active_job(self, job):
+        with self.__mutex:
+            self.__active_jobs.discard(job)
+
     @property
     def collections(self):
         return self.__collections.components
@@ -111,6 +156,35 @@ class Application:
         """
         return self.__collections.add_component(cls, name, *args, **kwargs)
 
+    @property
+    def analysis_executor(self):
+        """Returns process pool running collection analyses, created on
+        first access."""
+        with self.__mutex:
+            if self.__analysis_executor is None:
+                method = self.analysis_start_method
+                if method not in multiprocessing.get_all_start_methods():
+                    method = 'spawn'
+                self.__analysis_executor = ProcessPoolExecutor(
+                    max_workers=self.analysis_workers,
+                    mp_context=multiprocessing.get_context(method)
+                )
+            return self.__analysis_executor
+
+    def __shutdown_analyses(self):
+        abandoned = 0
+        deadline = time.monotonic() + self.analysis_timeout
+        for collection in self.collections.values():
+            for analysis in collection.analyses:
+                if not analysis.join(max(0., deadline - time.monotonic())):
+                    logging.error("abandoned analysis '%s' of collection '%s', %s batches pending",
+                                  analysis.name, collection.name, analysis.pending)
+                    abandoned += 1
+        with self.__mutex:
+            if self.__analysis_executor is not None:
+                self.__analysis_executor.shutdown(wait=not abandoned, cancel_futures=True)
+                self.__analysis_executor = None
+
     @property
     def jobs(self):
         return OrderedDict([(k, JobHandle(v)) for k, v in self.__jobs.components.items()])
@@ -122,6 +196,18 @@ class Application:
         """
         return JobHandle(self.__jobs.add_component(cls, name, *args, **kwargs))
 
+    def run_jobs(self, *names, max_workers=None):
+        """Run jobs by name including their required jobs, jobs not
+        depending on each other and not sharing devices run in parallel.
+        No more jobs are started if the current run is cancelled, raising
+        a JobsCancelled exception (see module jobgraph). Returns ordered
+        dict of job results.
+
+        >>> self.run_jobs('climate_settle', 'smu_selftest')
+        """
+        graph = JobGraph(self.jobs, max_workers=max_workers)
+        return graph.run(names, self.cancellation)
+
     @property
     def services(self):
         return self.__services.components
@@ -142,31 +228,69 @@ class Application:
 
     def start(self):
         """Start application run."""
-        self.__mutex.acquire()
-        if self.__asm.is_halted:
-            self.__asm.start()
-        self.__mutex.release()
+        with self.__condition:
+            if self.__asm.is_halted:
+                self.__cancellation = CancellationToken(self)
+                self.__asm.start()
+                self.__notify()
 
     def stop(self):
         """Stop application run."""
-        self.__mutex.acquire()
-        if self.__asm.is_running or self.__asm.is_paused:
-            self.__asm.stop()
-        self.__mutex.release()
+        with self.__condition:
+            if self.__asm.is_running or self.__asm.is_paused:
+                # Cancel run, stopping hooks use a new token
+                self.__cancellation.cancel()
+                self.__cancellation = CancellationToken(self)
+                self.__cancel_reconnects()
+                self.__asm.stop()
+                self.__notify()
 
     def pause(self):
         """Pause running application."""
-        self.__mutex.acquire()
-        if self.__asm.is_running:
-            self.__asm.pause()
-        self.__mutex.release()
+        with self.__condition:
+            if self.__asm.is_running:
+                self.__asm.pause()
+                self.__notify()
 
     def unpause(self):
         """Continues paused application."""
-        self.__mutex.acquire()
-        if self.__asm.is_paused:
-            self.__asm.unpause()
-        self.__mutex.release()
+        with self.__condition:
+            if self.__asm.is_paused:
+                self.__asm.unpause()
+                self.__notify()
+
+    def __cancel_reconnects(self):
+        """Interrupt devices waiting to reconnect a broken connection."""
+        for device in self.__devices.values():
+            cancel_reconnect = getattr(device.resource, 'cancel_reconnect', None)
+            if cancel_reconnect is not None:
+                cancel_reconnect()
+
+    def __notify(self):
+        """Wake up event loop on state change, requires condition lock."""
+        self.__transitions += 1
+        self.__condition.notify_all()
+
+    def notify(self):
+        """Wake up all components waiting on the application."""
+        with self.__condition:
+            self.__condition.notify_all()
+
+    def wait_for(self, predicate, timeout=None):
+        """Wait until predicate returns True, re-evaluated on every state
+        change or notification. Returns last result of predicate.
+
+        >>> app.wait_for(lambda: not app.is_paused)
+        True
+        """
+        with self.__condition:
+            return self.__condition.wait_for(predicate, timeout)
+
+    @property
+    def cancellation(self):
+        """Returns cancellation token of current run, cancelled on stop and
+        quit."""
+        return self.__cancellation
 
     # states
 
@@ -196,7 +320,7 @@ class Application:
     def on_running(self):
         pass
 
-    def on_pause(self):
+    def on_paused(self):
         pass
 
     def on_stopping(self):
@@ -209,7 +333,11 @@ class Application:
 
     def quit(self):
         """Shut down application event loop."""
-        self.__alive = False
+        with self.__condition:
+            self.__alive = False
+            self.__cancellation.cancel()
+            self.__cancel_reconnects()
+            self.__notify()
 
     def __configure(self):
         for collection in self.collections.values():
@@ -226,11 +354,8 @@ class Application:
         self.__alive = True
         self.__configure()
 
-        for service in self.services.values():
-            self.__threads.append(threading.Thread(target=service.run))
-
-        for thread in self.__threads:
-            thread.start()
+        supervisor = Supervisor(self.services.values())
+        supervisor.start()
 
         self.on_enter()
 
@@ -243,34 +368,42 @@ class Application:
                 self.__configure()
 
             # call state hook
-            method = getattr(self, 'on_{}'.format(asm.current_state.identifier))
+            with self.__condition:
+                transitions = self.__transitions
+                method = getattr(self, 'on_{}'.format(asm.identifier))
             method()
 
-            # automatic transitions
-            self.__mutex.acquire()
-            # rRun after configure finished
-            if asm.is_configure and method == self.on_configure:
-                asm.run()
-            # stop after running finshed
-            elif asm.is_running and method == self.on_running:
-                asm.stop()
-            # halt after stopping finshed
-            elif asm.is_stopping and method == self.on_stopping:
-                asm.halt()
-            self.__mutex.release()
-
-            # throttle event loop
-            time.sleep(self.event_loop_throttle)
+            with self.__condition:
+                # automatic transitions
+                # Run after configure finished
+                if asm.is_configure and method == self.on_configure:
+                    asm.run()
+                    self.__notify()
+                # stop after running finshed
+                elif asm.is_running and method == self.on_running:
+                    asm.stop()
+                    self.__notify()
+                # halt after stopping finshed
+                elif asm.is_stopping and method == self.on_stopping:
+                    asm.halt()
+                    self.__notify()
+
+                # wait for state changes
+                self.__condition.wait_for(
+                    lambda: not self.__alive or self.__transitions != transitions,
+                    self.event_loop_throttle
+                )
 
         self.on_exit()
 
         for service in self.services.values():
             service.quit()
 
-        for thread in self.__threads:
-            thread.join()
+        supervisor.join()
+
+        self.__shutdown_analyses()
 
-        self.__threads.clear()
+        SettingsStore.instance(ORG_NAME, APP_NAME).flush()
 
 class ApplicationStateMachine(StateMachine):
     """Application state machine."""
@@ -287,3 +420,31 @@ class ApplicationStateMachine(StateMachine):
     unpause = paused.to(running)
     stop = running.to(stopping) | paused.to(stopping)
     halt = stopping.to(halted)
+
+    # State checks not depending on the python-statemachine version, newer
+    # versions do not provide is_<state> attributes.
+
+    @property
+    def identifier(self):
+        """Returns identifier of current state."""
+        return self.current_state.value
+
+    @property
+    def is_halted(self):
+        return self.identifier == 'halted'
+
+    @property
+    def is_configure(self):
+        return self.identifier == 'configure'
+
+    @property
+    def is_running(self):
+        return self.identifier == 'running'
+
+    @property
+    def is_paused(self):
+        return self.identifier == 'paused'
+
+    @property
+    def is_stopping(self):
+        return self.identifier == 'stopping'
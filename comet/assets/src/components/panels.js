@@ -20,37 +20,41 @@ class LineChart extends React.Component {
   constructor(props) {
     super(props);
     this.state = {
-      offset: 0,
+      cursor: '',
+      generation: '',
       records: [],
     };
   }
-  componentDidMount() {
+  fetchDelta() {
     const {name} = this.props;
-    const {offset} = this.state;
-    fetch(`/api/collections/${name}/data/offset/${offset}`)
+    const {cursor, generation} = this.state;
+    return fetch(`/api/collections/${name}/data?cursor=${cursor}&generation=${generation}`)
     .then(response => response.json())
     .then(data => {
-      const {records} = data.app.collection;
-      const labels = data.app.collection.metrics.map(metric => metric.label);
-      var g = new Dygraph(this.refs.chart, records, {
+      const {collection} = data.app;
+      this.setState(prevState => ({
+        cursor: collection.cursor,
+        generation: collection.generation,
+        records: collection.reset ? collection.records : [...prevState.records, ...collection.records]
+      }));
+      return collection;
+    });
+  }
+  componentDidMount() {
+    this.fetchDelta()
+    .then(collection => {
+      const labels = collection.metrics.map(metric => metric.label);
+      var g = new Dygraph(this.refs.chart, this.state.records, {
         drawPoints: true,
         // showRoller: true,
         // valueRange: [0.0, 1.2],
         labels: labels
       });
       setInterval(() => {
-        const {name} = this.props;
-        const {offset} = this.state;
-        fetch(`/api/collections/${name}/data/offset/${offset}`)
-        .then(response => response.json())
-        .then(data => {
-          const {size} = data.app.collection;
-          const {records} = data.app.collection;
-          this.setState(prevState => ({
-            records: [...prevState.records, ...records]
-          }));
-          g.updateOptions( { 'file': this.state.records } );
-          this.setState({offset: size});
+        this.fetchDelta()
+        .then(collection => {
+          if (collection.reset || collection.records.length)
+            g.updateOptions( { 'file': this.state.records } );
         });
       },1000);
     });
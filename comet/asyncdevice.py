@@ -0,0 +1,96 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+class AsyncDevice:
+    """Asyncio wrapper for a Device.
+
+    Blocking device I/O is executed by a dedicated worker thread per device,
+    so calls to one device are serialized while calls to different devices
+    run concurrently. Config generated commands (see DeviceCommand) are
+    available as coroutine functions too.
+
+    >>> smu = AsyncDevice(app.devices.get('k2410'))
+    >>> multi = AsyncDevice(app.devices.get('k2700'))
+    >>> async def read():
+    ...     return await asyncio.gather(smu.get_reading(), multi.query('FETCH?'))
+    >>> current, voltages = asyncio.run(read())
+    """
+
+    def __init__(self, device):
+        self.__device = device
+        self.__executor = None
+
+    @property
+    def device(self):
+        """Returns wrapped device."""
+        return self.__device
+
+    @property
+    def name(self):
+        return self.__device.name
+
+    @property
+    def executor(self):
+        """Returns worker thread executor, created on first access."""
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.__device.name)
+        return self.__executor
+
+    def close(self):
+        """Shut down worker thread."""
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    async def call(self, method, *args, **kwargs):
+        """Execute blocking callable in device worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
+
+    async def query(self, message, *args, **kwargs):
+        """A combination of write(message) and read()."""
+        return await self.call(self.__device.query, message, *args, **kwargs)
+
+    async def read(self, *args, **kwargs):
+        """Read a string from the device."""
+        return await self.call(self.__device.read, *args, **kwargs)
+
+    async def read_raw(self, *args, **kwargs):
+        """Read the unmodified string sent from the instrument to the computer."""
+        return await self.call(self.__device.read_raw, *args, **kwargs)
+
+    async def read_bytes(self, count, *args, **kwargs):
+        """Read a certain number of bytes from the instrument."""
+        return await self.call(self.__device.read_bytes, count, *args, **kwargs)
+
+    async def write(self, message, *args, **kwargs):
+        """Write a string message to the device."""
+        return await self.call(self.__device.write, message, *args, **kwargs)
+
+    async def write_raw(self, message):
+        """Write a message as byte to the device."""
+        return await self.call(self.__device.write_raw, message)
+
+    async def query_bytes(self, message, count, *args, **kwargs):
+        """Returns decoded byte string by writing raw query message."""
+        return await self.call(self.__device.query_bytes, message, count, *args, **kwargs)
+
+    def __getattr__(self, name):
+        """Returns coroutine function for callable device attributes (eg.
+        config generated commands), other attributes are returned as is."""
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self.__device, name)
+        if not callable(attr):
+            return attr
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.call(attr, *args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,69 @@
+import numpy as np
+
+class BlockError(ValueError):
+    pass
+
+def parse_block_header(data):
+    r"""Returns offset of data and data length of an IEEE 488.2 binary block,
+    length is None for indefinite-length blocks (#0).
+
+    >>> parse_block_header(b'#18\x00\x00\x80?\x00\x00\x00@\n')
+    (3, 8)
+    """
+    start = data.find(b'#')
+    if start < 0 or len(data) < start + 2:
+        raise BlockError("missing binary block header")
+    digits = data[start + 1:start + 2]
+    if not digits.isdigit():
+        raise BlockError("invalid binary block header: {!r}".format(bytes(data[start:start + 2])))
+    digits = int(digits)
+    if not digits:
+        return start + 2, None
+    offset = start + 2 + digits
+    size = data[start + 2:offset]
+    if len(size) < digits or not size.isdigit():
+        raise BlockError("invalid binary block length: {!r}".format(bytes(size)))
+    return offset, int(size)
+
+def decode_block(data, dtype='<f4', termination=b'\n'):
+    r"""Returns array of values decoded from an IEEE 488.2 binary block. The
+    array shares memory with data (read only for bytes).
+
+    Byte order is defined by dtype, eg. '<f4' for little endian and '>f8'
+    for big endian floats. Trailing termination characters of indefinite
+    length blocks are removed.
+
+    >>> decode_block(b'#18\x00\x00\x80?\x00\x00\x00@\n', '<f4')
+    array([1., 2.], dtype=float32)
+    """
+    dtype = np.dtype(dtype)
+    offset, length = parse_block_header(data)
+    if length is None:
+        length = len(data) - offset
+        if termination and (length % dtype.itemsize):
+            end = len(data)
+            while end > offset and data[end - 1:end] in termination:
+                end -= 1
+            length = end - offset
+    elif len(data) < offset + length:
+        raise BlockError("incomplete binary block: {} of {} bytes".format(len(data) - offset, length))
+    if length % dtype.itemsize:
+        raise BlockError("binary block length {} is not a multiple of {} bytes".format(length, dtype.itemsize))
+    return np.frombuffer(data, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+def decode_ascii(text, dtype='f8', separator=','):
+    """Returns array of values parsed from separated ASCII text.
+
+    >>> decode_ascii('+1.0E-06,+2.0E-06')
+    array([1.e-06, 2.e-06])
+    """
+    text = text.strip()
+    if not text:
+        return np.empty(0, dtype=dtype)
+    try:
+        values = np.fromstring(text, dtype=dtype, sep=separator)
+    except ValueError:
+        values = None
+    if values is None or len(values) != text.count(separator) + 1:
+        raise BlockError("unable to parse ASCII values: '{}'".format(text[:64]))
+    return values
@@ -1,16 +1,82 @@
 import logging
-from collections import OrderedDict
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
 
+import numpy as np
+
+from .analysis import Analysis
 from .component import Component
 from .metric import Metric
+from .storage import ColumnBuffer, Records
+from .segments import SpillBuffer
+from .rollup import Rollup
+
+Delta = namedtuple('Delta', 'records cursor generation reset wrapped pending')
+"""Records appended since a cursor, returned by Collection.delta().
+
+:records: records view starting at the requested cursor
+:cursor: cursor to pass on next request
+:generation: generation of collection, changes on every clear
+:reset: True if client must discard its records (new generation or no cursor)
+:wrapped: True if records since cursor have already been dropped from buffer
+:pending: number of records left behind because of a limit
+"""
 
 class Collection(Component):
+    """Data collection storing records of metrics in typed columns.
+
+    :param capacity: number of records to allocate (optional)
+    :param ring_buffer: keep only the latest capacity records (optional)
+    :param spill_path: directory to spill records not fitting into capacity
+        to segment files (optional)
+    :param time_metric: name of metric used as time index, enables time
+        range queries (optional)
+    :param rollup_intervals: bucket widths in seconds of rollup tiers
+        maintained for numeric metrics, requires a time metric (optional)
+
+    >>> app.add_collection('environ', EnvironCollection, capacity=864000, ring_buffer=True)
+    >>> app.add_collection('iv', IVCollection, capacity=65536, spill_path='iv.spill')
+    >>> app.add_collection('environ', EnvironCollection, time_metric='time', rollup_intervals=(1, 10, 60, 600))
+    """
+
+    capacity = None
+    """Default number of records allocated, required for ring buffer mode."""
 
-    def __init__(self, app, name):
+    ring_buffer = False
+    """Keep only the latest capacity records if True."""
+
+    spill_path = None
+    """Directory for spilling older records to segment files, keeping only
+    the latest capacity records in memory."""
+
+    time_metric = None
+    """Name of metric used as time index, values must not decrease."""
+
+    rollup_intervals = ()
+    """Bucket widths in seconds of maintained rollup tiers."""
+
+    def __init__(self, app, name, capacity=None, ring_buffer=None, spill_path=None, time_metric=None, rollup_intervals=None):
         super(Collection, self).__init__(app, name)
-        self.__records = []
+        if capacity is not None:
+            self.capacity = capacity
+        if ring_buffer is not None:
+            self.ring_buffer = ring_buffer
+        if spill_path is not None:
+            self.spill_path = spill_path
+        if time_metric is not None:
+            self.time_metric = time_metric
+        if rollup_intervals is not None:
+            self.rollup_intervals = rollup_intervals
+        if self.ring_buffer and self.spill_path:
+            raise ValueError("ring buffer and spilling are mutually exclusive")
+        self.__buffer = None
+        self.__rollups = OrderedDict()
+        self.__generation = 0
         self.__metrics = OrderedDict()
         self.__handles = []
+        self.__analyses = []
+        self.__mutex = threading.Lock()
         self.setup()
 
     @property
@@ -21,31 +87,238 @@ class Collection(Component):
     def handles(self):
         return self.__handles
 
+    @property
+    def analyses(self):
+        return list(self.__analyses)
+
+    @property
+    def mutex(self):
+        return self.__mutex
+
+    @property
+    def buffer(self):
+        """Returns column buffer, allocated on first access."""
+        if self.__buffer is None:
+            if self.time_metric is not None and self.time_metric not in self.__metrics:
+                raise ValueError("no such time metric: '{}'".format(self.time_metric))
+            if self.rollup_intervals and self.time_metric is None:
+                raise ValueError("rollups require a time metric: '{}'".format(self.name))
+            if self.spill_path:
+                self.__buffer = SpillBuffer(self.__metrics.values(), self.spill_path, self.capacity)
+            else:
+                dtypes = [(name, metric.dtype) for name, metric in self.__metrics.items()]
+                self.__buffer = ColumnBuffer(dtypes, self.capacity, self.ring_buffer)
+            self.__rollups = OrderedDict()
+            names = [metric.name for metric in self.__rollup_metrics()]
+            capacity = self.capacity if self.ring_buffer else None
+            for width in sorted(self.rollup_intervals):
+                self.__rollups[width] = Rollup(width, names, capacity)
+        return self.__buffer
+
+    def __rollup_metrics(self):
+        """Returns list of numeric metrics aggregated by rollups."""
+        return [metric for name, metric in self.__metrics.items() if name != self.time_metric and np.issubdtype(metric.dtype, np.number)]
+
+    @property
+    def rollups(self):
+        """Returns ordered dict of rollup tiers by bucket width."""
+        with self.__mutex:
+            # Allocate buffer and rollups on first access
+            self.buffer
+            return OrderedDict(self.__rollups)
+
+    def select_rollup(self, points, t0=None, t1=None):
+        """Returns finest rollup tier providing not more than points buckets
+        in time range [t0, t1], the coarsest tier if none fits or None if
+        the raw records fit into points.
+
+        >>> rollup = coll.select_rollup(500, t - 72 * 3600, t)
+        >>> rollup.records(t - 72 * 3600, t)
+        """
+        with self.__mutex:
+            buffer = self.buffer
+            if not self.__rollups:
+                return None
+            start = buffer.first if t0 is None else self.__search(t0, 'left')
+            stop = buffer.count if t1 is None else self.__search(t1, 'right')
+            if stop - start <= points:
+                return None
+            for rollup in self.__rollups.values():
+                if rollup.count(t0, t1) <= points:
+                    return rollup
+            return rollup
+
+    @property
+    def count(self):
+        """Returns total number of records appended since last clear,
+        including records already dropped from a ring buffer."""
+        with self.__mutex:
+            return self.buffer.count
+
+    @property
+    def first(self):
+        """Returns absolute offset of oldest record stored."""
+        with self.__mutex:
+            return self.buffer.first
+
+    @property
+    def generation(self):
+        """Returns generation counter, incremented on every clear."""
+        return self.__generation
+
     def __len__(self):
-        return len(self.__records)
+        with self.__mutex:
+            return len(self.buffer)
 
     def clear(self):
-        self.__records.clear()
+        with self.__mutex:
+            self.buffer.clear()
+            for rollup in self.__rollups.values():
+                rollup.clear()
+            self.__generation += 1
 
     def snapshot(self, n):
-        """Retruns a snapshot of recent data records."""
-        return self.__records[-abs(n):]
+        """Retruns a snapshot of recent data records.
+
+        Records are returned as zero-copy view, see class Records.
+        """
+        with self.__mutex:
+            buffer = self.buffer
+            return buffer.view(buffer.count - abs(n))
+
+    def snapshot_from(self, offset, limit=None):
+        """Retruns a snapshot of data records starting with absolute offset,
+        optionally limited to limit records.
+
+        Records are returned as zero-copy view, see class Records.
+        """
+        with self.__mutex:
+            if limit is None:
+                return self.buffer.view(offset)
+            offset = max(int(offset), self.buffer.first)
+            return self.buffer.view(offset, offset + max(0, int(limit)))
+
+    def delta(self, cursor=None, generation=None, limit=None):
+        """Returns records appended since cursor as Delta tuple.
+
+        Pass the returned cursor and generation on the next call to receive
+        only newer records. Without cursor or on a generation mismatch all
+        stored records are returned and reset is set.
+
+        >>> delta = collection.delta()
+        >>> delta = collection.delta(delta.cursor, delta.generation, limit=1000)
+        """
+        cursor = None if cursor is None else int(cursor)
+        with self.__mutex:
+            buffer = self.buffer
+            reset = cursor is None or cursor > buffer.count
+            if generation is not None and generation != self.__generation:
+                reset = True
+            start = buffer.first if reset else cursor
+            wrapped = start < buffer.first
+            start = max(start, buffer.first)
+            stop = buffer.count
+            if limit is not None:
+                stop = min(stop, start + max(0, int(limit)))
+            records = buffer.view(start, stop)
+            return Delta(records, stop, self.__generation, reset, wrapped, buffer.count - stop)
+
+    def __search(self, t, side):
+        if self.time_metric not in self.__metrics:
+            raise ValueError("collection has no time metric: '{}'".format(self.name))
+        return self.buffer.searchsorted(self.time_metric, t, side=side)
+
+    def index_range(self, t0=None, t1=None):
+        """Returns absolute index range (start, stop) of records with time
+        metric in range [t0, t1], open ends if t0 or t1 is None.
+
+        >>> start, stop = coll.index_range(t - 60)
+        >>> coll.snapshot_from(start, 1000)
+        """
+        with self.__mutex:
+            buffer = self.buffer
+            start = buffer.first if t0 is None else self.__search(t0, 'left')
+            stop = buffer.count if t1 is None else self.__search(t1, 'right')
+            return start, max(start, stop)
 
-    def snapshot_from(self, offset):
-        """Retruns a snapshot of data records starting with offset."""
-        return self.__records[offset:]
+    def between(self, t0, t1):
+        """Returns records with time metric in range [t0, t1].
+
+        >>> coll.between(t - 60, t)
+        """
+        with self.__mutex:
+            return self.buffer.view(self.__search(t0, 'left'), self.__search(t1, 'right'))
+
+    def since(self, t):
+        """Returns records with time metric greater or equal t.
+
+        >>> coll.since(time.time() - 600)  # last 10 minutes
+        """
+        with self.__mutex:
+            return self.buffer.view(self.__search(t, 'left'))
+
+    def at_or_before(self, t):
+        """Returns latest record with time metric less or equal t or None.
+
+        >>> coll.at_or_before(t)
+        [1561727614.603935, 42.0]
+        """
+        with self.__mutex:
+            buffer = self.buffer
+            index = self.__search(t, 'right') - 1
+            if index < buffer.first:
+                return None
+            return buffer.view(index, index + 1)[0]
+
+    def __check_time(self, values):
+        """Raises a ValueError if time values would break the time index."""
+        if self.time_metric is None:
+            return
+        buffer = self.buffer
+        values = np.asarray(values)
+        if not len(values):
+            return
+        if buffer.count:
+            values = np.concatenate((buffer.view(buffer.count - 1)[self.time_metric], values))
+        if (np.diff(values) < 0).any():
+            raise ValueError("time metric '{}' must not decrease".format(self.time_metric))
 
     def add_handle(self, handle):
+        """Add a handle receiving every appended record as ordered dict by
+        its append() method. Handles providing an extend() method receive
+        records added by extend() as Records view in a single call."""
         assert hasattr(handle, 'append')
         assert callable(handle.append)
         self.__handles.append(handle)
         return handle
 
+    def add_analysis(self, callback, target=None, batch_size=None, max_pending=None, max_backlog=None, executor=None):
+        """Add an analysis running callback on batches of new records in the
+        application's process pool, see class Analysis. Results are published
+        to target collection (name or instance).
+
+        >>> iv = self.add_collection('iv', IVCollection)
+        >>> self.add_collection('leakage', LeakageCollection)
+        >>> iv.add_analysis(fit_leakage, 'leakage', batch_size=256)
+        """
+        if isinstance(target, str):
+            target = self.app.collections[target]
+        if target is self:
+            raise ValueError("analysis must not publish to its own collection: '{}'".format(self.name))
+        if executor is None:
+            executor = self.app.analysis_executor
+        analysis = Analysis(callback, target, executor, batch_size, max_pending, max_backlog)
+        self.__analyses.append(analysis)
+        return self.add_handle(analysis)
+
     def add_metric(self, name, **kwargs):
         if name in self.__metrics:
             raise ValueError("Metric name already exists: '{}'".format(name))
+        if self.__buffer is not None and self.__buffer.count:
+            raise ValueError("Unable to add metric to non empty collection: '{}'".format(name))
         metric = Metric(name, **kwargs)
         self.__metrics[name] = metric
+        self.__buffer = None
         return metric
 
     def setup(self):
@@ -55,11 +328,85 @@ class Collection(Component):
         pass
 
     def append(self, **kwargs):
-        logging.warning("collection[%s].append(%s)", self.name, kwargs)
+        logging.debug("collection[%s].append(%s)", self.name, kwargs)
         record = OrderedDict()
         for name, metric in self.__metrics.items():
             value = kwargs.get(name)
+            if value is None and metric.dtype is not object:
+                raise ValueError("missing value for metric '{}'".format(name))
             record[name] = metric.type(value)
-        self.__records.append(list(record.values()))
+        with self.__mutex:
+            if self.time_metric is not None:
+                self.__check_time([record[self.time_metric]])
+            self.buffer.append(list(record.values()))
+            if self.__rollups:
+                t = record[self.time_metric]
+                values = [record[metric.name] for metric in self.__rollup_metrics()]
+                for rollup in self.__rollups.values():
+                    rollup.append(t, values)
         for handle in self.__handles:
             handle.append(record)
+
+    def __coerce(self, metric, values):
+        """Returns values converted to metric's column type."""
+        if metric.dtype is object:
+            return np.array([metric.type(value) for value in values], dtype=object)
+        # Like append(), never fill missing values (eg. with NaN)
+        if None in values:
+            raise ValueError("missing values for metric '{}'".format(metric.name))
+        try:
+            return np.asarray(values, dtype=metric.dtype)
+        except (TypeError, ValueError) as e:
+            raise ValueError("invalid values for metric '{}': {}".format(metric.name, e))
+
+    def extend(self, rows=None, **columns):
+        """Append many records at once, either from a sequence of rows (mappings
+        or sequences ordered like metrics) or from per-metric columns. Returns
+        number of appended records.
+
+        Values are converted in a single vectorized pass per metric, handles
+        providing an extend() method receive all records in one call. Like
+        append() a ValueError is raised for missing values of numeric metrics.
+
+        >>> coll.extend([dict(time=t, v=1.2), dict(time=t, v=1.4)])
+        >>> coll.extend([(t, 1.2), (t, 1.4)])
+        >>> coll.extend(time=[t, t], v=[1.2, 1.4])
+        """
+        metrics = list(self.__metrics.values())
+        if rows is not None:
+            if columns:
+                raise ValueError("pass either rows or columns")
+            rows = list(rows)
+            if rows and isinstance(rows[0], Mapping):
+                columns = {metric.name: [row.get(metric.name) for row in rows] for metric in metrics}
+            else:
+                values = list(zip(*rows)) if rows else [()] * len(metrics)
+                if len(values) != len(metrics):
+                    raise ValueError("rows must contain {} values".format(len(metrics)))
+                columns = {metric.name: column for metric, column in zip(metrics, values)}
+        size = max([len(column) for column in columns.values()] or [0])
+        arrays = OrderedDict()
+        for metric in metrics:
+            values = columns.get(metric.name)
+            if values is None:
+                values = [None] * size
+            arrays[metric.name] = self.__coerce(metric, values)
+        logging.debug("collection[%s].extend(%s records)", self.name, size)
+        with self.__mutex:
+            if self.time_metric is not None:
+                self.__check_time(arrays[self.time_metric])
+            self.buffer.extend(arrays)
+            if self.__rollups:
+                t = arrays[self.time_metric]
+                columns = [arrays[metric.name] for metric in self.__rollup_metrics()]
+                for rollup in self.__rollups.values():
+                    rollup.extend(t, columns)
+        if self.__handles:
+            records = Records(arrays)
+            for handle in self.__handles:
+                if callable(getattr(handle, 'extend', None)):
+                    handle.extend(records)
+                else:
+                    for record in records.todicts():
+                        handle.append(record)
+        return size
@@ -31,36 +31,71 @@ class Component(BaseComponent):
     def label(self):
         return self.__label
 
+class CancellationToken:
+    """Cancellation flag shared by components, cancelling wakes up all
+    components waiting on the application.
+
+    >>> token = CancellationToken(app)
+    >>> token.cancel()
+    >>> token.cancelled
+    True
+    """
+
+    def __init__(self, app):
+        self.__app = app
+        self.__cancelled = False
+
+    @property
+    def cancelled(self):
+        return self.__cancelled
+
+    def cancel(self):
+        self.__cancelled = True
+        self.__app.notify()
+
 class ControlComponent(Component):
-    """Application component with flow control functions."""
+    """Application component with flow control functions.
 
-    wait_interval = 0.001
+    Waits are woken up by application state changes and cancellation of the
+    component's cancellation token (by default the application's token of
+    the current run).
+    """
 
     def __init__(self, app, name, label=None):
         super(ControlComponent, self).__init__(app, name, label)
+        self.__cancellation = None
+
+    @property
+    def cancellation(self):
+        """Returns cancellation token of component."""
+        return self.__cancellation or self.app.cancellation
+
+    @cancellation.setter
+    def cancellation(self, token):
+        self.__cancellation = token
+
+    @property
+    def is_cancelled(self):
+        return self.cancellation.cancelled
 
     def wait_on_pause(self):
         """Halts execution if application is paused."""
-        while self.app.is_paused: # TODO
-            time.sleep(self.wait_interval)
+        self.app.wait_for(lambda: not self.app.is_paused or self.is_cancelled)
 
     def wait(self, delay):
-        """Wait for delay in seconds.
+        """Wait for delay in seconds, returns False if cancelled before.
 
         >>> self.wait(1.25)  # waits 1.25 seconds
+        True
         """
-        t = self.time()
-        while self.time() < t + delay:
-            time.sleep(self.wait_interval)
+        return not self.app.wait_for(lambda: self.is_cancelled, delay)
 
     def wait_while_running(self, delay):
         """Wait for delay in seconds or application stops running.
 
-        >>> self.wait(1.25)  # waits 1.25 seconds
+        >>> self.wait_while_running(1.25)  # waits 1.25 seconds
         """
-        t = self.time()
-        while self.time() < t + delay and self.app.is_running:
-            time.sleep(self.wait_interval)
+        self.app.wait_for(lambda: not self.app.is_running or self.is_cancelled, delay)
 
     def time(self):
         """Returns time in seconds.
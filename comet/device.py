@@ -1,12 +1,12 @@
 import logging
 import re
 import threading
+import time
 from collections import OrderedDict
-
-from pyvisa import util as pyvisa_util
-
 from types import MethodType
 
+from .block import parse_block_header, decode_block, decode_ascii
+from .iostats import IOStats
 from .variant import Variant
 
 class DeviceException(Exception):
@@ -35,15 +35,38 @@ class DeviceFactory:
     )
     """Resource specific config options."""
 
+    reconnect_options = (
+        'delay',
+        'factor',
+        'init',
+        'max_delay',
+        'reconnect_timeout',
+    )
+    """Options of config key reconnect, see class ReconnectingResource."""
+
     def __init__(self, resource_manager):
         self.resource_manager = resource_manager
 
-    def create(self, name, resource_name, config={}):
+    def is_reconnecting(self, resource_name, config):
+        """Returns True if resource should be reconnected on broken
+        connections, enabled by default for TCPIP resources. Config key
+        reconnect is either a boolean or a dict of reconnect options."""
+        reconnect = config.get('reconnect')
+        if reconnect is None:
+            return resource_name.upper().startswith('TCPIP')
+        if isinstance(reconnect, dict):
+            return True
+        if not isinstance(reconnect, (bool, int)):
+            raise ValueError("invalid reconnect value, expected boolean or options: {!r}".format(reconnect))
+        return bool(reconnect)
+
+    def create(self, name, resource_name, config={}, cls=None):
         """Creates a new device from configuration.
 
         :param name: device name
         :param resource_name: device resource name
         :param config: device configuration (optional)
+        :param cls: device class, a subclass of Device (optional)
 
         :returns: a Device instance
         """
@@ -51,10 +74,24 @@ class DeviceFactory:
         for key in self.resource_options:
             if key in config:
                 options[key] = config.get(key)
-        resource = self.resource_manager.open_resource(resource_name, **options)
-        device = Device(name, resource)
+        reconnecting = self.is_reconnecting(resource_name, config)
+        if reconnecting:
+            from .resource import ReconnectingResource
+            reconnect = config.get('reconnect')
+            reconnect = reconnect if isinstance(reconnect, dict) else {}
+            for key in reconnect:
+                if key not in self.reconnect_options:
+                    raise KeyError("invalid reconnect option: {}".format(key))
+            resource = ReconnectingResource(self.resource_manager, resource_name, options, **reconnect)
+        else:
+            resource = self.resource_manager.open_resource(resource_name, **options)
+        device = (cls or Device)(name, resource)
+        if reconnecting:
+            resource.on_reconnect = lambda latency: device.stats.record_operation('reconnect', latency)
         # Config values
         setattr(device, 'model', config.get('name'))
+        if 'batch_max_length' in config:
+            device.batch_max_length = int(config.get('batch_max_length'))
         # Create optional error handler
         if 'errors' in config:
             messages = config.get('errors').get('messages', {})
@@ -62,11 +99,30 @@ class DeviceFactory:
             if expression is not None:
                 error_handler = DeviceErrorHandler(expression, messages)
                 device.append_message_handler(error_handler)
+        commands = OrderedDict()
         for name, kwargs in config.get('commands', {}).items():
             command = DeviceCommand(name, **kwargs)
             if hasattr(device, command.name):
                 raise AttributeError(command.name)
-            setattr(device, command.name, MethodType(command, device))
+            setattr(device, command.name, command.bind(device))
+            commands[command.name] = command
+        # Link cache invalidation, command set_<name> invalidates a cached
+        # command get_<name> by default.
+        for command in commands.values():
+            if command.invalidates is None:
+                command.invalidates = []
+                if command.name.startswith('set_'):
+                    getter = commands.get('get_{}'.format(command.name[4:]))
+                    if getter is not None and getter.cache_ttl is not None:
+                        command.invalidates.append(getter.name)
+            for name in command.invalidates:
+                if name not in commands:
+                    raise KeyError("no such command to invalidate: {}".format(name))
+        for name, steps in config.get('sequences', {}).items():
+            sequence = DeviceSequence(name, steps or [], commands)
+            if hasattr(device, sequence.name):
+                raise AttributeError(sequence.name)
+            setattr(device, sequence.name, MethodType(sequence, device))
         return device
 
 class Device:
@@ -79,11 +135,18 @@ class Device:
     'INQUISITION INSTRUMENTS INC.,MODEL 1250'
     """
 
+    batch_max_length = 256
+    """Maximum length of a joined batch message in characters."""
+
+    batch_separator = ';'
+    """Separator joining batched SCPI messages and their responses."""
+
     def __init__(self, name, resource):
         self.__name = name
         self.__resource = resource
         self.__mutex = threading.Lock()
         self.__message_handlers = []
+        self.__stats = IOStats()
 
     @property
     def name(self):
@@ -97,46 +160,71 @@ class Device:
     def mutex(self):
         return self.__mutex
 
+    @property
+    def stats(self):
+        """Returns I/O statistics of device, see class IOStats."""
+        return self.__stats
+
+    def __operation(self, operation, *args):
+        """Call composite resource operation, repeated as a whole by
+        reconnecting resources (see ReconnectingResource.retry)."""
+        retry = getattr(self.__resource, 'retry', None)
+        if retry is None:
+            return operation(*args)
+        return retry(operation, *args)
+
+    def transfer(self, name):
+        """Returns context holding the device lock while recording I/O
+        statistics for operation name."""
+        return self.__stats.transfer(name, self.__mutex)
+
     def query(self, message, *args, **kwargs):
         """A combination of write(message) and read()."""
-        with self.mutex:
+        with self.transfer('query') as transfer:
+            transfer.bytes_out = len(message)
             result = self.resource.query(message, *args, **kwargs)
+            transfer.bytes_in = len(result)
             for handler in self.__message_handlers:
                 handler.handle(result)
             return Variant(result)
 
     def read(self, *args, **kwargs):
         """Read a string from the device."""
-        with self.mutex:
+        with self.transfer('read') as transfer:
             result = self.resource.read(*args, **kwargs)
+            transfer.bytes_in = len(result)
             for handler in self.__message_handlers:
                 handler.handle(result)
             return Variant(result)
 
     def read_raw(self, *args, **kwargs):
         """Read the unmodified string sent from the instrument to the computer."""
-        with self.mutex:
+        with self.transfer('read_raw') as transfer:
             result = self.resource.read_raw(*args, **kwargs)
+            transfer.bytes_in = len(result)
             for handler in self.__message_handlers:
                 handler.handle(result)
             return Variant(result)
 
     def read_bytes(self, count, *args, **kwargs):
         """Read a certain number of bytes from the instrument."""
-        with self.mutex:
+        with self.transfer('read_bytes') as transfer:
             result = self.resource.read_bytes(count, *args, **kwargs)
+            transfer.bytes_in = len(result)
             for handler in self.__message_handlers:
                 handler.handle(result)
             return Variant(result)
 
     def write(self, message, *args, **kwargs):
         """Write a string message to the device."""
-        with self.mutex:
+        with self.transfer('write') as transfer:
+            transfer.bytes_out = len(message)
             return self.resource.write(message, *args, **kwargs)
 
     def write_raw(self, message):
         """Write a message as byte to the device."""
-        with self.mutex:
+        with self.transfer('write_raw') as transfer:
+            transfer.bytes_out = len(message)
             return self.resource.write_raw(message)
 
     def query_bytes(self, message, count, *args, **kwargs):
@@ -145,13 +233,101 @@ class Device:
         >>> device.query_bytes(b'T', 13)
         'T120619130943'
         """
-        with self.mutex:
-            self.resource.write_raw(message)
-            result = self.resource.read_bytes(count, *args, **kwargs)
+        with self.transfer('query_bytes') as transfer:
+            transfer.bytes_out = len(message)
+            def query_bytes():
+                self.resource.write_raw(message)
+                return self.resource.read_bytes(count, *args, **kwargs)
+            result = self.__operation(query_bytes)
+            transfer.bytes_in = len(result)
             for handler in self.__message_handlers:
                 handler.handle(result)
             return Variant(result)
 
+    def __read_block(self):
+        """Returns raw IEEE 488.2 binary block, reads remaining bytes of
+        definite-length blocks containing termination characters."""
+        data = self.resource.read_raw()
+        offset, length = parse_block_header(data)
+        if length is not None:
+            termination = getattr(self.resource, 'read_termination', None) or ''
+            remaining = offset + length + len(termination) - len(data)
+            if remaining > 0:
+                data = bytearray(data)
+                data += self.resource.read_bytes(remaining)
+        return data
+
+    def read_block(self, dtype='<f4'):
+        """Read an IEEE 488.2 binary block (#<n><length><data> or #0<data>)
+        into an array of dtype, eg. '>f4' for big endian floats.
+
+        >>> device.write('FORM:DATA REAL,32;:FORM:BORD SWAP')
+        >>> device.write('TRAC:DATA?')
+        >>> device.read_block('<f4')
+        array([4.2e-06, 4.3e-06, ...], dtype=float32)
+        """
+        with self.transfer('read_block') as transfer:
+            data = self.__operation(self.__read_block)
+            transfer.bytes_in = len(data)
+        return decode_block(data, dtype)
+
+    def query_block(self, message, dtype='<f4'):
+        """A combination of write(message) and read_block(dtype)."""
+        with self.transfer('query_block') as transfer:
+            transfer.bytes_out = len(message)
+            def query_block():
+                self.resource.write(message)
+                return self.__read_block()
+            data = self.__operation(query_block)
+            transfer.bytes_in = len(data)
+        return decode_block(data, dtype)
+
+    def read_ascii(self, dtype='f8', separator=','):
+        """Read separated ASCII values into an array of dtype."""
+        with self.transfer('read_ascii') as transfer:
+            result = self.resource.read()
+            transfer.bytes_in = len(result)
+            for handler in self.__message_handlers:
+                handler.handle(result)
+        return decode_ascii(result, dtype, separator)
+
+    def query_ascii(self, message, dtype='f8', separator=','):
+        """A combination of write(message) and read_ascii(dtype, separator).
+
+        >>> device.query_ascii('FETCH?')
+        array([4.2e-06, 4.3e-06, ...])
+        """
+        with self.transfer('query_ascii') as transfer:
+            transfer.bytes_out = len(message)
+            result = self.resource.query(message)
+            transfer.bytes_in = len(result)
+            for handler in self.__message_handlers:
+                handler.handle(result)
+        return decode_ascii(result, dtype, separator)
+
+    def batch(self):
+        """Returns a batch queuing writes and queries, executed when leaving
+        the context using as few round trips as possible.
+
+        >>> with device.batch() as batch:
+        ...     batch.write('*RST')
+        ...     batch.write('SENS:FUNC "CURR"')
+        ...     idn = batch.query('*IDN?')
+        >>> idn.value
+        'INQUISITION INSTRUMENTS INC.,MODEL 1250'
+        """
+        return DeviceBatch(self)
+
+    @property
+    def message_handlers(self):
+        """Returns list of message handlers."""
+        return list(self.__message_handlers)
+
+    def handle_message(self, message):
+        """Pass message to all message handlers."""
+        for handler in self.__message_handlers:
+            handler.handle(message)
+
     def append_message_handler(self, handler):
         """Append a message handler instance. Resource call results are passed
         to handlers handle() method.
@@ -160,6 +336,133 @@ class Device:
         """
         self.__message_handlers.append(handler)
 
+class BatchResult:
+    """Placeholder for a query response of a batch, available after the
+    batch has been executed."""
+
+    def __init__(self, message):
+        self.message = message
+        self.__value = None
+        self.__done = False
+
+    @property
+    def done(self):
+        return self.__done
+
+    @property
+    def value(self):
+        """Returns response as Variant value."""
+        if not self.__done:
+            raise DeviceException("batch not executed: {}".format(self.message))
+        return self.__value
+
+    def set_value(self, value):
+        self.__value = value
+        self.__done = True
+
+class DeviceBatch:
+    """Queues SCPI writes and queries and sends them joined by the device's
+    batch separator in as few messages as batch_max_length permits. Query
+    responses are split by the same separator and assigned to their
+    BatchResult. All messages are sent holding the device mutex.
+
+    Messages following another message in a joined message are prefixed
+    with a colon (unless starting with ':' or '*') to address the SCPI root.
+
+    >>> batch = DeviceBatch(device)
+    >>> batch.write('OUTP OFF')
+    >>> result = batch.query('READ?')
+    >>> batch.execute()
+    >>> result.value
+    '+4.200000E-06'
+    """
+
+    def __init__(self, device):
+        self.__device = device
+        self.__steps = []
+
+    @property
+    def device(self):
+        return self.__device
+
+    def __len__(self):
+        return len(self.__steps)
+
+    def write(self, message):
+        """Queue a write message."""
+        self.__steps.append((message, None))
+
+    def query(self, message):
+        """Queue a query message, returns a BatchResult."""
+        result = BatchResult(message)
+        self.__steps.append((message, result))
+        return result
+
+    def delay(self, seconds):
+        """Queue a delay, previous messages are sent before waiting."""
+        self.__steps.append((None, float(seconds)))
+
+    def chunks(self):
+        """Returns list of joined messages, their results and seconds to
+        wait after sending (message is None for a leading delay)."""
+        device = self.__device
+        separator = device.batch_separator
+        chunks = []
+        message, results = None, []
+        for step, result in self.__steps:
+            if step is None:
+                chunks.append((message, results, result))
+                message, results = None, []
+                continue
+            step = step.strip()
+            if message is None:
+                message = step
+            else:
+                if not step.startswith((':', '*')):
+                    step = ':' + step
+                if len(message) + len(separator) + len(step) > device.batch_max_length:
+                    chunks.append((message, results, 0))
+                    message, results = step, []
+                else:
+                    message = separator.join((message, step))
+            if result is not None:
+                results.append(result)
+        if message is not None:
+            chunks.append((message, results, 0))
+        return chunks
+
+    def execute(self):
+        """Send queued messages and assign query responses."""
+        device = self.__device
+        chunks = self.chunks()
+        self.__steps = []
+        with device.transfer('batch') as transfer:
+            for message, results, delay in chunks:
+                if message is None:
+                    pass
+                elif not results:
+                    transfer.bytes_out += len(message)
+                    device.resource.write(message)
+                else:
+                    transfer.bytes_out += len(message)
+                    response = device.resource.query(message)
+                    transfer.bytes_in += len(response)
+                    device.handle_message(response)
+                    values = response.split(device.batch_separator)
+                    if len(values) != len(results):
+                        raise DeviceException("unable to split batch response '{}' into {} values".format(response, len(results)))
+                    for result, value in zip(results, values):
+                        result.set_value(Variant(value.strip()))
+                if delay:
+                    time.sleep(delay)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.execute()
+
 class DeviceCommand:
     """Device command created from configuration.
 
@@ -167,20 +470,73 @@ class DeviceCommand:
     :param method: name of resource callback
     :param require: regular expression to validate return value (optional)
     :param description: command documentation (optional)
+    :param cache_ttl: seconds to reuse results per arguments (optional)
+    :param cache: set to 'forever' to cache results until invalidated (optional)
+    :param invalidates: names of commands whose cached results are dropped
+        after calling this command (optional)
+    :param format: return values as array decoded from a binary 'block' or
+        separated 'ascii' values, method must be query or read (optional)
+
+    Message formatting, choices and options are prepared on construction,
+    use bind() to resolve the device method once for repeated calls.
 
     >>> command = DeviceCommand('set_voltage', 'query', message='CTRL:VOLT {:.6f}')
     >>> command(device, 4.2)
+    >>> set_voltage = command.bind(device)
+    >>> set_voltage(4.2)
     """
 
-    def __init__(self, name, method, require=None, choices=None, description=None, **kwargs):
+    cache_forever = 'forever'
+
+    formatted_methods = 'query', 'write', 'query_block', 'query_ascii'
+    """Methods taking a formatted message."""
+
+    formats = 'block', 'ascii'
+    """Array return formats."""
+
+    def __init__(self, name, method, require=None, choices=None, description=None,
+                 cache_ttl=None, cache=None, invalidates=None, format=None, **kwargs):
         self.name = name
         self.method = method
+        self.format = format
+        self.target = method
+        if self.format is not None:
+            if self.format not in self.formats:
+                raise ValueError("invalid format '{}' for command '{}'".format(format, name))
+            if method not in ('query', 'read'):
+                raise ValueError("format requires method query or read for command '{}'".format(name))
+            if require:
+                raise ValueError("require not supported with format for command '{}'".format(name))
+            self.target = '{}_{}'.format(method, format)
         self.require = require or None
         self.choices = choices or None
         self.description = description or ''
+        self.cache_ttl = None
+        if cache is not None:
+            if cache != self.cache_forever:
+                raise ValueError("invalid cache option '{}' for command '{}'".format(cache, name))
+            self.cache_ttl = float('inf')
+        elif cache_ttl is not None:
+            self.cache_ttl = float(cache_ttl)
+        self.invalidates = list(invalidates) if invalidates is not None else None
         self.kwargs = kwargs
         if self.require is not None:
             self.require = re.compile(self.require)
+        self.__cache = {}
+        self.__cache_mutex = threading.Lock()
+        # Prepare message formatting
+        self.__format = None
+        self.__options = dict(kwargs)
+        if self.target in self.formatted_methods:
+            if 'message' not in kwargs:
+                raise ValueError("missing attribute 'message' for command '{}'".format(self.name))
+            self.__format = self.__options.pop('message').format
+        self.__choices = None
+        if self.choices is not None:
+            try:
+                self.__choices = frozenset(self.choices)
+            except TypeError:
+                self.__choices = tuple(self.choices)
 
     @property
     def __name__(self):
@@ -190,44 +546,220 @@ class DeviceCommand:
     def __doc__(self):
         return "{}".format(self.description)
 
-    def __validate_choices(self, *args, **kwargs):
-        if self.choices is None:
-            return
-        for arg in args:
-            if arg not in self.choices:
-                raise ValueError("invalid argument value '{}'".format(arg))
-        for k, v in kwargs:
-            if v not in self.choices:
-                raise ValueError("invalid argument value '{}'".format(v))
-
-    def __create_attrs(self, *args, **kwargs):
-        """Create attributes for command call."""
-        attrs = {}
-        # Load defaults
-        attrs.update(self.kwargs)
-        # Parse string formatting in message
-        if self.method in ('query', 'write'):
-            if 'message' not in attrs:
-                raise ValueError("missing attribute 'message' for command '{}'".format(self.name))
-            self.__validate_choices(*args, **kwargs)
+    def bind(self, device):
+        """Returns command bound to device with resolved device method."""
+        return BoundDeviceCommand(self, device)
+
+    def __validate_choices(self, args, kwargs):
+        choices = self.__choices
+        for value in args + tuple(kwargs.values()):
             try:
-                message = attrs.get('message').format(*args, **kwargs)
-            except IndexError:
-                raise ValueError("missing arguments for command '{}'".format(self.name))
-            attrs['message'] = message
-        return attrs
+                valid = value in choices
+            except TypeError:
+                # Unhashable values (eg. Variant) fall back to comparison
+                valid = value in self.choices
+            if not valid:
+                raise ValueError("invalid argument value '{}'".format(value))
+
+    def format_message(self, *args, **kwargs):
+        """Returns message formatted with arguments, raises a ValueError for
+        invalid choices or missing arguments."""
+        if self.__format is None:
+            raise ValueError("no message to format for command '{}'".format(self.name))
+        if self.__choices is not None:
+            self.__validate_choices(args, kwargs)
+        try:
+            return self.__format(*args, **kwargs)
+        except (IndexError, KeyError):
+            raise ValueError("missing arguments for command '{}'".format(self.name))
+
+    def clear_cache(self):
+        """Drop all cached results."""
+        with self.__cache_mutex:
+            self.__cache.clear()
+
+    def __cache_key(self, args, kwargs):
+        """Returns hashable key for arguments or None if not cacheable."""
+        key = args, tuple(sorted(kwargs.items())) if kwargs else ()
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
     def __call__(self, device, *args, **kwargs):
-        attrs = self.__create_attrs(*args, **kwargs)
+        return self.invoke(device, getattr(device, self.target, None), args, kwargs)
+
+    def invoke(self, device, method, args, kwargs):
+        """Call resolved device method with arguments tuple and keyword
+        arguments dict, recording command statistics."""
+        start = time.perf_counter()
+        try:
+            result, cached = self.__invoke(device, method, args, kwargs)
+        except Exception:
+            device.stats.record_command(self.name, time.perf_counter() - start, error=True)
+            raise
+        device.stats.record_command(self.name, time.perf_counter() - start, cached=cached)
+        return result
+
+    def __invoke(self, device, method, args, kwargs):
+        """Returns result and True if result was cached."""
+        key = None
+        if self.cache_ttl is not None:
+            key = self.__cache_key(args, kwargs)
+            if key is not None:
+                with self.__cache_mutex:
+                    if key in self.__cache:
+                        timestamp, result = self.__cache[key]
+                        if time.monotonic() - timestamp <= self.cache_ttl:
+                            return result, True
+        if self.__format is not None:
+            message = self.format_message(*args, **kwargs)
         # Validate device method
-        if not hasattr(device, self.method):
-            raise DeviceException("no such device method: {}".format(self.method))
-        result = getattr(device, self.method)(**attrs)
+        if method is None:
+            raise DeviceException("no such device method: {}".format(self.target))
+        if self.__format is None:
+            result = method(**self.__options)
+        elif self.__options:
+            result = method(message, **self.__options)
+        else:
+            result = method(message)
+        # Device state might have changed, even if return value is invalid
+        if self.invalidates:
+            for name in self.invalidates:
+                getattr(device, name).clear_cache()
         # Validate return value
         if self.require is not None:
             if not self.require.match(result.str):
                 raise DeviceException("invalid return value '{}' for '{}'".format(result, self.require))
-        return result
+        if key is not None:
+            with self.__cache_mutex:
+                self.__cache[key] = time.monotonic(), result
+        return result, False
+
+class BoundDeviceCommand:
+    """Device command bound to a device, the device method is resolved once
+    on binding. Attributes not defined are looked up on the command."""
+
+    __slots__ = ('__command', '__device', '__method', '__invoke')
+
+    def __init__(self, command, device):
+        self.__command = command
+        self.__device = device
+        self.__method = getattr(device, command.target, None)
+        self.__invoke = command.invoke
+
+    @property
+    def command(self):
+        return self.__command
+
+    @property
+    def __name__(self):
+        return self.__command.name
+
+    @property
+    def __doc__(self):
+        return self.__command.__doc__
+
+    def __getattr__(self, name):
+        return getattr(self.__command, name)
+
+    def __call__(self, *args, **kwargs):
+        return self.__invoke(self.__device, self.__method, args, kwargs)
+
+class DeviceSequence:
+    """Sequence of config commands executed as a single device batch.
+
+    :param name: name of sequence
+    :param steps: list of steps, each mapping a command name to a list of
+        arguments (or a dict of keyword arguments), optional key delay defines
+        seconds to wait after the step (or between steps if used alone)
+    :param commands: mapping of available commands by name
+    :param description: sequence documentation (optional)
+
+    All steps are sent holding the device lock, joined into as few messages
+    as possible (see class DeviceBatch). Only write and query commands can
+    be used. Calling a sequence returns the list of query results.
+
+    >>> sequence = DeviceSequence('do_reset', [{'set_reset': []}, {'set_voltage': [0], 'delay': .5}], commands)
+    >>> sequence(device)
+    []
+    """
+
+    def __init__(self, name, steps, commands, description=None):
+        self.name = name
+        self.description = description or ''
+        self.steps = []
+        for step in steps:
+            step = dict(step)
+            delay = float(step.pop('delay', 0))
+            if not step and delay:
+                self.steps.append((None, (), {}, delay))
+                continue
+            if len(step) != 1:
+                raise ValueError("sequence '{}' step requires exactly one command: {}".format(name, step))
+            command_name, arguments = step.popitem()
+            command = commands.get(command_name)
+            if command is None:
+                raise KeyError("no such command in sequence '{}': {}".format(name, command_name))
+            if command.target not in ('query', 'write'):
+                raise ValueError("command '{}' can not be used in sequence '{}'".format(command_name, name))
+            if arguments is None:
+                arguments = []
+            if isinstance(arguments, dict):
+                args, kwargs = (), dict(arguments)
+            elif isinstance(arguments, (list, tuple)):
+                args, kwargs = tuple(arguments), {}
+            else:
+                args, kwargs = (arguments,), {}
+            # Validate choices and arguments
+            command.format_message(*args, **kwargs)
+            self.steps.append((command, args, kwargs, delay))
+
+    @property
+    def __name__(self):
+        return self.name
+
+    @property
+    def __doc__(self):
+        return "{}".format(self.description)
+
+    def __call__(self, device):
+        start = time.perf_counter()
+        try:
+            results = self.__execute(device)
+        except Exception:
+            device.stats.record_command(self.name, time.perf_counter() - start, error=True)
+            raise
+        device.stats.record_command(self.name, time.perf_counter() - start)
+        return results
+
+    def __execute(self, device):
+        batch = DeviceBatch(device)
+        queries = []
+        for command, args, kwargs, delay in self.steps:
+            if command is None:
+                pass
+            elif command.target == 'query':
+                queries.append((command, batch.query(command.format_message(*args, **kwargs))))
+            else:
+                batch.write(command.format_message(*args, **kwargs))
+            if delay:
+                batch.delay(delay)
+        try:
+            batch.execute()
+        finally:
+            # Device state might have changed
+            for command, args, kwargs, delay in self.steps:
+                for name in getattr(command, 'invalidates', None) or []:
+                    getattr(device, name).clear_cache()
+        results = []
+        for command, result in queries:
+            if command.require is not None:
+                if not command.require.match(result.value.value):
+                    raise DeviceException("invalid return value '{}' for '{}'".format(result.value.value, command.require))
+            results.append(result.value)
+        return results
 
 class DeviceMessageHandler:
 
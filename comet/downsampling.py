@@ -0,0 +1,118 @@
+import numpy as np
+
+from .storage import Records
+
+def lttb_indices(x, y, threshold):
+    """Returns indices of points selected by largest-triangle-three-buckets
+    downsampling algorithm.
+
+    First and last point are always selected, the remaining points are
+    divided into threshold - 2 buckets and for each bucket the point forming
+    the largest triangle with the previously selected point and the average
+    of the next bucket is selected.
+
+    >>> lttb_indices(np.arange(1000), np.random.random(1000), 100)
+    array([  0,  14,  22, ..., 999])
+    """
+    size = len(y)
+    threshold = int(threshold)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = size - 1
+    selected = 0
+    for bucket in range(threshold - 2):
+        begin, end = edges[bucket], edges[bucket + 1]
+        # Average of next bucket (last point for the final bucket)
+        if bucket < threshold - 3:
+            next_end = edges[bucket + 2]
+            avg_x = x[end:next_end].mean()
+            avg_y = y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        ax, ay = x[selected], y[selected]
+        areas = np.abs((ax - avg_x) * (y[begin:end] - ay) - (ax - x[begin:end]) * (avg_y - ay))
+        areas = np.nan_to_num(areas, nan=-1.)
+        selected = begin + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
+
+def minmax_indices(y, threshold):
+    """Returns indices of minimum and maximum points of threshold / 2 equally
+    sized buckets, preserving the envelope of a signal.
+
+    >>> minmax_indices(np.random.random(1000), 100)
+    array([  3,  17,  21, ..., 998])
+    """
+    size = len(y)
+    threshold = int(threshold)
+    if threshold >= size or threshold < 2:
+        return np.arange(size)
+    y = np.asarray(y, dtype=np.float64)
+    width = int(np.ceil(size / (threshold // 2)))
+    buckets = int(np.ceil(size / width))
+    padded = np.full(buckets * width, np.nan)
+    padded[:size] = y
+    padded = padded.reshape(buckets, width)
+    # Replace all NaN buckets to keep nanargmin/nanargmax quiet
+    padded[np.isnan(padded).all(axis=1), 0] = 0.
+    offsets = np.arange(buckets) * width
+    minima = offsets + np.nanargmin(padded, axis=1)
+    maxima = offsets + np.nanargmax(padded, axis=1)
+    indices = np.unique(np.concatenate((minima, maxima)))
+    return indices[indices < size]
+
+modes = {
+    'lttb': lambda x, y, threshold: lttb_indices(x, y, threshold),
+    'minmax': lambda x, y, threshold: minmax_indices(y, threshold),
+}
+"""Mapping downsampling modes to index selection functions."""
+
+def downsample(records, points, mode='lttb'):
+    """Returns downsampled records view containing the union of points
+    selected for every numeric column, the first column is used as x-axis.
+
+    >>> downsample(collection.snapshot_from(0), 1000, mode='minmax')
+    """
+    if mode not in modes:
+        raise ValueError("invalid downsampling mode: '{}'".format(mode))
+    points = int(points)
+    if points < 1:
+        raise ValueError("invalid number of points: {}".format(points))
+    if len(records) <= points:
+        return records
+    columns = list(records.columns.values())
+    x = columns[0]
+    if not np.issubdtype(x.dtype, np.number):
+        x = np.arange(len(records))
+    selection = [np.array([0, len(records) - 1])]
+    for y in columns[1:]:
+        if np.issubdtype(y.dtype, np.number):
+            selection.append(modes[mode](x, y, points))
+    return records.take(np.unique(np.concatenate(selection)))
+
+def downsample_chunks(chunks, points, size, mode='lttb'):
+    """Returns downsampled records of consecutive records views (eg. read
+    segment by segment) containing size records in total. Every chunk is
+    downsampled to its share of points, records are never concatenated
+    before downsampling.
+
+    >>> chunks = (collection.snapshot_from(i, 65536) for i in range(0, count, 65536))
+    >>> downsample_chunks(chunks, 1000, count)
+    """
+    if mode not in modes:
+        raise ValueError("invalid downsampling mode: '{}'".format(mode))
+    points = int(points)
+    if points < 1:
+        raise ValueError("invalid number of points: {}".format(points))
+    selected = []
+    for records in chunks:
+        share = max(3, int(np.ceil(points * len(records) / max(1, size))))
+        selected.append(downsample(records, share, mode))
+    if not selected:
+        return Records([])
+    return Records((name, np.concatenate([records[name] for records in selected])) for name in selected[0].names)
@@ -1,6 +1,12 @@
 from io import StringIO
+import atexit
 import csv
+import glob
+import logging
 import os
+import queue
+import threading
+import time
 
 class DataWriter:
 
@@ -8,35 +14,227 @@ class DataWriter:
         pass
 
 class FileWriter(DataWriter):
+    """Writes records to a text file, one record per line.
 
-    def __init__(self, filename):
+    :param filename: output filename
+    :param buffered: write records using a persistent file handle and a
+        background thread (optional)
+    :param flush_count: flush after number of records (optional)
+    :param flush_interval: flush pending records after seconds (optional)
+    :param queue_size: maximum number of queued batches, append blocks if
+        the queue is full (optional)
+    :param fsync: fsync policy, one of 'never', 'flush' or 'close' (optional)
+
+    In buffered mode records are queued by append() and written by a
+    background thread, call flush() to wait for queued records to be written
+    and close() to stop the thread and close the file. If the background
+    thread fails (eg. unable to open or sync the file) append(), flush() and
+    close() raise its exception.
+
+    >>> with FileWriter('data.txt', buffered=True, flush_interval=5.0) as writer:
+    ...     writer.append(record)
+    """
+
+    flush_count = 1024
+    """Default number of records written before flushing the file."""
+
+    flush_interval = 1.0
+    """Default maximum seconds records stay unflushed."""
+
+    queue_size = 4096
+    """Default maximum number of queued batches."""
+
+    fsync = 'never'
+    """Default fsync policy."""
+
+    fsync_policies = 'never', 'flush', 'close'
+
+    poll_interval = .1
+    """Seconds between checks for a failed background thread while
+    waiting for the queue."""
+
+    def __init__(self, filename, buffered=False, flush_count=None, flush_interval=None, queue_size=None, fsync=None):
         super(FileWriter, self).__init__()
         self.filename = filename
+        self.buffered = buffered
+        if flush_count is not None:
+            self.flush_count = flush_count
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if fsync is not None:
+            self.fsync = fsync
+        if self.fsync not in self.fsync_policies:
+            raise ValueError("invalid fsync policy: '{}'".format(self.fsync))
+        self.__queue = None
+        self.__thread = None
+        self.__error = None
+        self.__failure = None
+        self.__mutex = threading.Lock()
 
     def create(self):
+        self.close()
         with open(self.filename, 'w') as f:
             pass
 
-    def append(self, d):
-        with open(self.filename, 'a') as f:
+    def write_records(self, f, records):
+        """Write list of records to file object, overwrite to customize."""
+        for d in records:
             f.write(format(d))
             f.write(os.linesep)
 
+    def append(self, d):
+        self.__write([d])
+
+    def extend(self, records):
+        self.__write(records.todicts())
+
+    def __write(self, records):
+        if not self.buffered:
+            with open(self.filename, 'a') as f:
+                self.write_records(f, records)
+            return
+        self.__check_error()
+        self.open()
+        self.__put(records)
+
+    def __put(self, item):
+        """Queue item, raises the background thread's exception instead of
+        blocking forever on a full queue."""
+        while True:
+            self.__check_failure()
+            try:
+                self.__queue.put(item, timeout=self.poll_interval)
+                return
+            except queue.Full:
+                pass
+
+    def __check_error(self):
+        self.__check_failure()
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise error
+
+    def __check_failure(self):
+        """Raises exception of failed background thread until closed."""
+        if self.__failure is not None:
+            raise self.__failure
+
+    @property
+    def is_open(self):
+        """Returns True if background writer thread is running."""
+        return self.__thread is not None
+
+    def open(self):
+        """Start background writer thread, called automatically on first
+        append in buffered mode."""
+        with self.__mutex:
+            if self.__thread is None:
+                self.__queue = queue.Queue(self.queue_size)
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+                atexit.register(self.close)
+
+    def flush(self, timeout=None):
+        """Wait until all queued records are written and flushed to file.
+        Raises a TimeoutError if not flushed within timeout seconds."""
+        if self.__thread is not None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            done = threading.Event()
+            self.__put(done)
+            while not done.wait(self.poll_interval):
+                self.__check_failure()
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("flushing '{}' timed out".format(self.filename))
+        self.__check_error()
+
+    def close(self):
+        """Write queued records, stop background thread and close file."""
+        with self.__mutex:
+            thread, self.__thread = self.__thread, None
+            if thread is not None:
+                if self.__failure is None:
+                    self.__queue.put(None)
+                thread.join()
+                atexit.unregister(self.close)
+            failure, self.__failure = self.__failure, None
+        if failure is not None:
+            self.__error = None
+            raise failure
+        self.__check_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __sync(self, f, fsync):
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+    def __run(self):
+        try:
+            self.__write_queue()
+        except Exception as e:
+            logging.error("writer thread of '%s' failed: %s", self.filename, e)
+            self.__failure = e
+            # Wake up pending flush calls and blocked append calls
+            while True:
+                try:
+                    item = self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def __write_queue(self):
+        with open(self.filename, 'a') as f:
+            pending = 0
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(0., deadline - time.monotonic())
+                try:
+                    item = self.__queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = False
+                if item is None:
+                    self.__sync(f, self.fsync != 'never')
+                    break
+                if isinstance(item, threading.Event):
+                    self.__sync(f, self.fsync == 'flush')
+                    pending, deadline = 0, None
+                    item.set()
+                    continue
+                if item:
+                    try:
+                        self.write_records(f, item)
+                    except Exception as e:
+                        self.__error = e
+                    pending += len(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if pending >= self.flush_count or (deadline is not None and time.monotonic() >= deadline):
+                    self.__sync(f, self.fsync == 'flush')
+                    pending, deadline = 0, None
+
 class CSVFileWriter(FileWriter):
 
-    def __init__(self, filename, fieldnames):
-        super(CSVFileWriter, self).__init__(filename)
+    def __init__(self, filename, fieldnames, **kwargs):
+        super(CSVFileWriter, self).__init__(filename, **kwargs)
         self.fieldnames = fieldnames
 
     def create(self):
+        self.close()
         with open(self.filename, 'w') as f:
-            writer = csv.DictWriter(context, fieldnames=self.fieldnames)
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
             writer.writeheader()
 
-    def append(self, d):
-        with open(self.filename, 'a') as f:
-            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
-            writer.writerow(d)
+    def write_records(self, f, records):
+        writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+        writer.writerows(records)
 
 class HephyDBFileWriter(FileWriter):
 
@@ -59,3 +257,84 @@ class HephyDBFileWriter(FileWriter):
     def create_table(self, name, fieldnames):
         self.append("{}[{}]".format(os.linesep, name))
         return CSVFileWriter(self.filename, fieldnames)
+
+class SegmentFileWriter(DataWriter):
+    """Writes records to a directory of fixed size, memory-mapped binary
+    segment files (see class Segment), read them using class SegmentReader.
+
+    :param path: output directory
+    :param metrics: metrics to store, eg. collection.metrics.values()
+    :param segment_size: number of records per segment file (optional)
+
+    >>> writer = SegmentFileWriter('iv.segments', collection.metrics.values())
+    >>> writer.create()
+    >>> collection.add_handle(writer)
+    """
+
+    segment_size = 65536
+    """Default number of records per segment file."""
+
+    def __init__(self, path, metrics, segment_size=None):
+        super(SegmentFileWriter, self).__init__()
+        self.path = path
+        self.metrics = list(metrics)
+        if segment_size is not None:
+            self.segment_size = segment_size
+        self.__segment = None
+        self.__index = 0
+        self.__mutex = threading.Lock()
+
+    def create(self):
+        """Create output directory, removes existing segment files."""
+        from .segments import FILENAME_GLOB
+        self.close()
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        for filename in glob.glob(os.path.join(self.path, FILENAME_GLOB)):
+            os.remove(filename)
+        self.__index = 0
+
+    def __next_segment(self):
+        # Imported on demand, segments require numpy
+        from .segments import Segment, FILENAME_PATTERN
+        if self.__segment is not None:
+            self.__segment.close()
+        filename = os.path.join(self.path, FILENAME_PATTERN.format(self.__index))
+        self.__segment = Segment.create(filename, self.metrics, self.segment_size)
+        self.__index += 1
+        return self.__segment
+
+    def append(self, d):
+        values = [d.get(metric.name) for metric in self.metrics]
+        with self.__mutex:
+            segment = self.__segment
+            if segment is None or segment.is_full:
+                segment = self.__next_segment()
+            segment.append(values)
+
+    def extend(self, records):
+        columns = records.columns
+        offset = 0
+        with self.__mutex:
+            while offset < len(records):
+                segment = self.__segment
+                if segment is None or segment.is_full:
+                    segment = self.__next_segment()
+                offset += segment.extend(columns, offset)
+
+    def flush(self):
+        with self.__mutex:
+            if self.__segment is not None:
+                self.__segment.flush()
+
+    def close(self):
+        with self.__mutex:
+            if self.__segment is not None:
+                self.__segment.close()
+                self.__segment = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
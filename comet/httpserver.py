@@ -10,6 +10,8 @@ from bottle import static_file
 from bottle import run
 
 from . import utilities
+from .downsampling import downsample, downsample_chunks
+from .utilities import make_label
 from . import __version__
 
 class HttpServer:
@@ -19,6 +21,14 @@ class HttpServer:
     default_port = 8080
     default_server = 'paste'
 
+    max_records = None
+    """Maximum number of records returned per collection data request."""
+
+    spill_records = 65536
+    """Maximum number of raw records returned per data request of collections
+    spilling to disk, downsampling reads chunks of this size. Records are
+    never read from all segments at once."""
+
     assets_path = utilities.make_path('assets/dist')
 
     def __init__(self, app):
@@ -73,6 +83,21 @@ class HttpServer:
             devices = [device.name for device in app.devices.values()]
             return dict(app=dict(devices=devices))
 
+        @route('/api/devices/stats')
+        def api_devices_stats():
+            """Returns I/O statistics of all devices, latencies in seconds."""
+            stats = dict((device.name, device.stats.to_dict()) for device in app.devices.values())
+            return dict(app=dict(devices=stats))
+
+        @route('/api/devices/<name>/stats')
+        def api_device_stats(name):
+            """Returns I/O statistics of device, latencies in seconds."""
+            device = app.devices.get(name)
+            if device is None:
+                response.status = 404
+                return dict(error="no such device: '{}'".format(name))
+            return dict(app=dict(device=dict(name=name, stats=device.stats.to_dict())))
+
         @route('/api/collections')
         def api_collections():
             collections = [collection.name for collection in app.collections.values()]
@@ -81,17 +106,116 @@ class HttpServer:
         @route('/api/collections/<name>/data')
         @route('/api/collections/<name>/data/offset/<offset>')
         def api_collections(name, offset=0):
+            """Returns collection records starting with offset.
+
+            Optional query argument `points` downsamples records to about
+            that number of points per metric using `mode` (lttb or minmax).
+            Query arguments `from` and `to` select records by time metric.
+            Collections maintaining rollups return the finest rollup tier
+            fitting into points instead, see field `rollup`. Raw records of
+            collections spilling to disk are limited to spill_records per
+            request, request remaining records starting with the next offset.
+
+            GET /api/collections/iv/data?points=1000&mode=minmax
+            GET /api/collections/iv/data?from=1561727614&to=1561728214
+            """
+            if 'cursor' in request.query:
+                return api_collections_delta(name)
             offset = int(offset)
             records = []
             metrics = []
             size = 0
+            rollup = None
             collection = app.collections.get(name)
             if collection is not None:
-                size = len(collection) # TODO!
-                records = collection.snapshot_from(offset)
-                for metric in collection.metrics.values():
-                    metrics.append(dict(name=metric.name, label=metric.label, unit=metric.unit))
-            return dict(app=dict(collection=dict(name=name, size=size, offset=offset, records=records, metrics=metrics)))
+                size = collection.count
+                t0 = request.query.get('from')
+                t1 = request.query.get('to')
+                points = request.query.get('points')
+                try:
+                    t0 = float(t0) if t0 else None
+                    t1 = float(t1) if t1 else None
+                    if points and not offset:
+                        rollup = collection.select_rollup(int(points), t0, t1)
+                    mode = request.query.get('mode') or 'lttb'
+                    if rollup is not None:
+                        records = rollup.records(t0, t1)
+                    elif collection.spill_path:
+                        records = spilled_records(collection, offset, t0, t1, points, mode)
+                    else:
+                        if t0 is not None or t1 is not None:
+                            records = collection.between(float('-inf') if t0 is None else t0, float('inf') if t1 is None else t1)
+                        else:
+                            records = collection.snapshot_from(offset)
+                        if points:
+                            records = downsample(records, points, mode)
+                except ValueError as e:
+                    response.status = 400
+                    return dict(error=format(e))
+                records = records.tolist()
+                if rollup is not None:
+                    for column in rollup.names:
+                        metric = collection.metrics.get(column.rsplit('_', 1)[0])
+                        unit = metric.unit if metric and column != 'count' else None
+                        metrics.append(dict(name=column, label=make_label(column), unit=unit))
+                    rollup = rollup.width
+                else:
+                    for metric in collection.metrics.values():
+                        metrics.append(dict(name=metric.name, label=metric.label, unit=metric.unit))
+            return dict(app=dict(collection=dict(name=name, size=size, offset=offset, rollup=rollup, records=records, metrics=metrics)))
+
+        def spilled_records(collection, offset, t0, t1, points, mode):
+            """Returns records of a collection spilling to disk, reading at
+            most spill_records at once."""
+            if t0 is not None or t1 is not None:
+                start, stop = collection.index_range(t0, t1)
+            else:
+                start, stop = max(offset, collection.first), collection.count
+            chunk = min(self.spill_records, self.max_records or self.spill_records)
+            if points:
+                chunks = (collection.snapshot_from(index, min(chunk, stop - index)) for index in range(start, stop, chunk))
+                return downsample_chunks(chunks, points, stop - start, mode)
+            return collection.snapshot_from(start, min(chunk, stop - start))
+
+        def api_collections_delta(name):
+            """Returns records appended since cursor.
+
+            Query arguments `cursor` and `generation` are taken from the
+            previous response (leave empty on first request), optional
+            argument `limit` caps the number of returned records.
+
+            GET /api/collections/iv/data?cursor=1024&generation=0&limit=500
+            """
+            collection = app.collections.get(name)
+            if collection is None:
+                response.status = 404
+                return dict(error="no such collection: '{}'".format(name))
+            cursor = request.query.get('cursor') or None
+            generation = request.query.get('generation') or None
+            limit = request.query.get('limit') or self.max_records
+            try:
+                cursor = None if cursor is None else int(cursor)
+                generation = None if generation is None else int(generation)
+                limit = None if limit is None else int(limit)
+            except ValueError as e:
+                response.status = 400
+                return dict(error=format(e))
+            if self.max_records is not None:
+                limit = min(limit, self.max_records)
+            delta = collection.delta(cursor, generation, limit)
+            result = dict(
+                name=name,
+                cursor=delta.cursor,
+                generation=delta.generation,
+                reset=delta.reset,
+                wrapped=delta.wrapped,
+                pending=delta.pending,
+                records=delta.records.tolist()
+            )
+            # Send metrics only on (re)synchronization
+            if delta.reset:
+                result['metrics'] = [dict(name=metric.name, label=metric.label, unit=metric.unit) for metric in collection.metrics.values()]
+            return dict(app=dict(collection=result))
 
         @route('/api/jobs')
         def api_jobs():
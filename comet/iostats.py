@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import OrderedDict
+
+class Histogram:
+    """Latency histogram using HDR-style log-linear buckets.
+
+    Values are recorded in seconds and counted with a resolution of one
+    microsecond, bucket width doubles every power of two keeping a relative
+    error below 1/2^sub_bucket_bits. Recording is O(1).
+
+    >>> histogram = Histogram()
+    >>> histogram.record(.0042)
+    >>> histogram.record(.0050)
+    >>> histogram.percentile(99)
+    0.004864
+    """
+
+    sub_bucket_bits = 4
+    """Number of bits of precision per power of two."""
+
+    resolution = 1e-6
+    """Smallest distinguishable value in seconds."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.__buckets = {}
+        self.__count = 0
+        self.__total = 0.
+        self.__min = None
+        self.__max = None
+
+    @property
+    def count(self):
+        return self.__count
+
+    @property
+    def total(self):
+        return self.__total
+
+    @property
+    def min(self):
+        return self.__min
+
+    @property
+    def max(self):
+        return self.__max
+
+    @property
+    def mean(self):
+        return self.__total / self.__count if self.__count else None
+
+    def __index(self, value):
+        value = int(value / self.resolution)
+        shift = max(0, value.bit_length() - self.sub_bucket_bits - 1)
+        return (shift << self.sub_bucket_bits) + (value >> shift)
+
+    def __lower_bound(self, index):
+        shift = max(0, (index >> self.sub_bucket_bits) - 1)
+        return ((index - (shift << self.sub_bucket_bits)) << shift) * self.resolution
+
+    def record(self, value):
+        """Record a value in seconds."""
+        value = max(0., value)
+        index = self.__index(value)
+        self.__buckets[index] = self.__buckets.get(index, 0) + 1
+        self.__count += 1
+        self.__total += value
+        if self.__min is None or value < self.__min:
+            self.__min = value
+        if self.__max is None or value > self.__max:
+            self.__max = value
+
+    def percentile(self, percent):
+        """Returns lower bound of bucket containing percentile in seconds,
+        None if histogram is empty."""
+        if not self.__count:
+            return None
+        rank = max(1, percent / 100. * self.__count)
+        seen = 0
+        for index in sorted(self.__buckets):
+            seen += self.__buckets[index]
+            if seen >= rank:
+                return max(self.__min, self.__lower_bound(index))
+        return self.__max
+
+    def to_dict(self):
+        return dict(
+            count=self.__count,
+            total=self.__total,
+            mean=self.mean,
+            min=self.__min,
+            max=self.__max,
+            p50=self.percentile(50),
+            p90=self.percentile(90),
+            p99=self.percentile(99),
+            p999=self.percentile(99.9)
+        )
+
+class OperationStats:
+    """Counters of a device operation or command.
+
+    Attribute latency holds time spent on the wire (or in a command),
+    attribute wait the time spent waiting for the device lock.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cached = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = Histogram()
+        self.wait = Histogram()
+
+    def to_dict(self):
+        return dict(
+            calls=self.calls,
+            errors=self.errors,
+            cached=self.cached,
+            bytes_in=self.bytes_in,
+            bytes_out=self.bytes_out,
+            latency=self.latency.to_dict(),
+            wait=self.wait.to_dict()
+        )
+
+class Transfer:
+    """Context acquiring a device lock and recording lock wait time, wire
+    time, transferred bytes and errors of a device operation."""
+
+    __slots__ = ('stats', 'name', 'mutex', 'bytes_in', 'bytes_out', 'start', 'acquired')
+
+    def __init__(self, stats, name, mutex):
+        self.stats = stats
+        self.name = name
+        self.mutex = mutex
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.mutex.acquire()
+        self.acquired = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter()
+        self.mutex.release()
+        self.stats.record_operation(
+            self.name,
+            latency=end - self.acquired,
+            wait=self.acquired - self.start,
+            bytes_in=self.bytes_in,
+            bytes_out=self.bytes_out,
+            error=exc_type is not None
+        )
+
+class IOStats:
+    """Thread safe per device I/O statistics for resource operations (query,
+    read, write, ...) and config generated commands.
+
+    >>> device.stats.operations['query'].calls
+    42
+    >>> device.stats.to_dict()['commands']['get_reading']['latency']['p99']
+    0.012288
+    """
+
+    def __init__(self):
+        self.__mutex = threading.Lock()
+        self.__operations = OrderedDict()
+        self.__commands = OrderedDict()
+
+    @property
+    def operations(self):
+        with self.__mutex:
+            return OrderedDict(self.__operations)
+
+    @property
+    def commands(self):
+        with self.__mutex:
+            return OrderedDict(self.__commands)
+
+    def transfer(self, name, mutex):
+        """Returns context acquiring mutex and recording operation name."""
+        return Transfer(self, name, mutex)
+
+    def __record(self, stats, latency, wait, bytes_in, bytes_out, error, cached):
+        stats.calls += 1
+        stats.errors += error
+        stats.cached += cached
+        stats.bytes_in += bytes_in
+        stats.bytes_out += bytes_out
+        stats.latency.record(latency)
+        if wait is not None:
+            stats.wait.record(wait)
+
+    def record_operation(self, name, latency, wait=None, bytes_in=0, bytes_out=0, error=False):
+        with self.__mutex:
+            stats = self.__operations.get(name)
+            if stats is None:
+                stats = self.__operations[name] = OperationStats()
+            self.__record(stats, latency, wait, bytes_in, bytes_out, error, False)
+
+    def record_command(self, name, latency, error=False, cached=False):
+        with self.__mutex:
+            stats = self.__commands.get(name)
+            if stats is None:
+                stats = self.__commands[name] = OperationStats()
+            self.__record(stats, latency, None, 0, 0, error, cached)
+
+    def clear(self):
+        with self.__mutex:
+            self.__operations.clear()
+            self.__commands.clear()
+
+    def to_dict(self):
+        with self.__mutex:
+            return dict(
+                operations=OrderedDict((name, stats.to_dict()) for name, stats in self.__operations.items()),
+                commands=OrderedDict((name, stats.to_dict()) for name, stats in self.__commands.items())
+            )
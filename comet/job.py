@@ -4,9 +4,17 @@ from .component import ControlComponent
 class Job(ControlComponent):
     """Job base class, inherit to create custom jobs.
 
-    Jobs can be executed in custom applications at any state.
+    Jobs can be executed in custom applications at any state. Jobs executed
+    using Application.run_jobs() run in parallel unless they require each
+    other or share devices.
     """
 
+    requires = ()
+    """Names of jobs required to finish before running this job."""
+
+    devices = ()
+    """Names of devices used by this job."""
+
     def __init__(self, app, name, label=None):
         super(Job, self).__init__(app, name, label)
         self.__progress = 0.0
@@ -46,12 +54,32 @@ class JobHandle(Job):
         super(JobHandle, self).__init__(job.app, job.name, job.label)
         self.__job = job
 
+    @property
+    def requires(self):
+        return tuple(self.__job.requires)
+
+    @property
+    def devices(self):
+        return tuple(self.__job.devices)
+
+    @property
+    def progress(self):
+        return self.__job.progress
+
+    @progress.setter
+    def progress(self, percent):
+        self.__job.progress = percent
+
     def configure(self):
         result = self.__job.configure()
         return result
 
     def run(self):
-        self.app.active_jobs.add(self.__job)
-        result = self.__job.run()
-        self.app.active_jobs.remove(self.__job)
-        return result
+        # Bind job to token of current run
+        self.__job.cancellation = self.app.cancellation
+        self.app.add_active_job(self.__job)
+        try:
+            return self.__job.run()
+        finally:
+            self.app.remove_active_job(self.__job)
+            self.__job.cancellation = None
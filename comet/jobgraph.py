@@ -0,0 +1,112 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class JobsCancelled(Exception):
+    """Raised if a job graph run was cancelled before all jobs finished.
+
+    :param results: ordered dict of results of finished jobs
+    :param skipped: names of jobs not started
+    """
+
+    def __init__(self, results, skipped):
+        super(JobsCancelled, self).__init__("jobs cancelled, skipped: {}".format(", ".join(skipped)))
+        self.results = results
+        self.skipped = skipped
+
+class JobGraph:
+    """Executes jobs respecting their dependencies, independent jobs run in
+    parallel as long as their devices do not overlap.
+
+    Jobs declare names of required jobs in attribute requires and names of
+    used devices in attribute devices (see class Job). Required jobs are
+    executed even if not requested explicitly.
+
+    :param jobs: mapping of job handles by name
+    :param max_workers: maximum number of jobs run in parallel (optional)
+
+    >>> graph = JobGraph(app.jobs)
+    >>> graph.run(['longterm', 'selftest'])
+    OrderedDict([('ramp_up', None), ('selftest', None), ('longterm', None)])
+    """
+
+    thread_name_prefix = 'job'
+
+    def __init__(self, jobs, max_workers=None):
+        self.__jobs = OrderedDict(jobs)
+        self.__max_workers = max_workers
+
+    @property
+    def jobs(self):
+        return OrderedDict(self.__jobs)
+
+    def resolve(self, names):
+        """Returns ordered dict of jobs to run including required jobs,
+        raises a KeyError for unknown jobs and a ValueError for circular
+        dependencies."""
+        resolved = OrderedDict()
+        visiting = set()
+        def visit(name):
+            if name in resolved:
+                return
+            if name in visiting:
+                raise ValueError("circular job dependency: '{}'".format(name))
+            if name not in self.__jobs:
+                raise KeyError("no such job: '{}'".format(name))
+            visiting.add(name)
+            job = self.__jobs[name]
+            for required in job.requires:
+                visit(required)
+            visiting.discard(name)
+            resolved[name] = job
+        for name in names:
+            visit(name)
+        return resolved
+
+    def run(self, names, cancellation=None):
+        """Run jobs by name and their required jobs, returns ordered dict of
+        job results. Re-raises the first exception of a failed job after
+        running jobs returned. No more jobs are started once the optional
+        cancellation token is cancelled, a JobsCancelled exception listing
+        the skipped jobs is raised after running jobs returned."""
+        pending = self.resolve(names)
+        results = OrderedDict()
+        if not pending:
+            return results
+        max_workers = self.__max_workers or len(pending)
+        running = {}
+        busy = set()
+        error = None
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.thread_name_prefix) as executor:
+            while pending or running:
+                cancelled = cancellation is not None and cancellation.cancelled
+                if error is None and not cancelled:
+                    for name, job in list(pending.items()):
+                        if len(running) >= max_workers:
+                            break
+                        devices = set(job.devices)
+                        if devices & busy:
+                            continue
+                        if any(required not in results for required in job.requires):
+                            continue
+                        del pending[name]
+                        busy.update(devices)
+                        logging.debug("starting job '%s'", name)
+                        running[executor.submit(job.run)] = name, devices
+                if not running:
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, devices = running.pop(future)
+                    busy.difference_update(devices)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logging.error("job '%s' failed: %s", name, e)
+                        if error is None:
+                            error = e
+        if error is not None:
+            raise error
+        if pending:
+            raise JobsCancelled(results, list(pending))
+        return results
@@ -1,7 +1,16 @@
+import numpy as np
+
 from .utilities import make_label
 
 class Metric:
 
+    dtypes = {
+        float: np.float64,
+        int: np.int64,
+        bool: np.bool_,
+    }
+    """Mapping metric types to numpy column types, other types are stored as objects."""
+
     def __init__(self, name, **kwargs):
         self.__name = name
         self.__type = kwargs.get('type', float)
@@ -16,6 +25,11 @@ class Metric:
     def type(self):
         return self.__type
 
+    @property
+    def dtype(self):
+        """Returns numpy dtype used to store values of metric."""
+        return self.dtypes.get(self.__type, object)
+
     @property
     def unit(self):
         return self.__unit
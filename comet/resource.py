@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+
+from pyvisa.constants import StatusCode
+from pyvisa.errors import InvalidSession, VisaIOError
+
+connection_error_codes = (
+    StatusCode.error_connection_lost,
+    StatusCode.error_io,
+    StatusCode.error_invalid_object,
+)
+"""VISA status codes indicating a broken connection."""
+
+def is_connection_error(error):
+    """Returns True if exception indicates a broken connection."""
+    if isinstance(error, (ConnectionError, InvalidSession)):
+        return True
+    if isinstance(error, VisaIOError):
+        return error.error_code in connection_error_codes
+    return False
+
+class ReconnectingResource:
+    """VISA resource wrapper reconnecting on broken connections.
+
+    :param resource_manager: a VISA resource manager instance
+    :param resource_name: VISA resource name
+    :param options: keyword arguments passed to open_resource (optional)
+    :param init: messages written after reconnecting (optional)
+    :param on_reconnect: callback called with reconnect latency in seconds (optional)
+
+    If an operation fails due to a broken connection the resource is
+    reopened, retrying with exponential backoff (starting with delay seconds,
+    multiplied by factor up to max_delay) for at most reconnect_timeout
+    seconds. After reconnecting the init messages are written and the failed
+    operation is repeated once as a whole (see retry()). Other attributes are looked up on the wrapped
+    resource, assigned attributes (eg. timeout or read_termination) are set
+    on the wrapped resource and applied again after reconnecting. Attribute
+    reconnects counts successful reconnects, latency holds the duration of
+    the last reconnect in seconds. Waiting for the next reconnect attempt is
+    interrupted by cancel_reconnect(), eg. on application stop.
+
+    >>> resource = ReconnectingResource(rm, 'TCPIP::192.168.100.205::1080::SOCKET', init=['*CLS'])
+    >>> resource.query('*IDN?')
+    """
+
+    delay = 1.0
+    """Initial delay between reconnect attempts in seconds."""
+
+    factor = 2.0
+    """Backoff factor applied to delay after every failed attempt."""
+
+    max_delay = 30.0
+    """Maximum delay between reconnect attempts in seconds."""
+
+    reconnect_timeout = 300.0
+    """Seconds to keep trying to reconnect before giving up, not to be
+    confused with the VISA I/O timeout of the resource."""
+
+    __attributes = 'on_reconnect', 'reconnects', 'latency'
+    """Instance attributes of the wrapper, not set on the wrapped resource."""
+
+    def __init__(self, resource_manager, resource_name, options=None, init=None,
+                 on_reconnect=None, delay=None, factor=None, max_delay=None, reconnect_timeout=None):
+        self.__resource_manager = resource_manager
+        self.__resource_name = resource_name
+        self.__options = dict(options or {})
+        self.__init = list(init or [])
+        self.on_reconnect = on_reconnect
+        if delay is not None:
+            self.delay = float(delay)
+        if factor is not None:
+            self.factor = float(factor)
+        if max_delay is not None:
+            self.max_delay = float(max_delay)
+        if reconnect_timeout is not None:
+            self.reconnect_timeout = float(reconnect_timeout)
+        self.reconnects = 0
+        self.latency = None
+        self.__cancelled = threading.Event()
+        self.__local = threading.local()
+        self.__resource = self.__open()
+
+    @property
+    def resource(self):
+        """Returns currently wrapped resource."""
+        return self.__resource
+
+    @property
+    def resource_name(self):
+        return self.__resource_name
+
+    def __open(self):
+        return self.__resource_manager.open_resource(self.__resource_name, **self.__options)
+
+    def __close(self):
+        try:
+            self.__resource.close()
+        except Exception as e:
+            logging.debug("failed to close resource %s: %s", self.__resource_name, e)
+
+    def cancel_reconnect(self):
+        """Interrupt a reconnect in progress, which raises the last error."""
+        self.__cancelled.set()
+
+    def reconnect(self):
+        """Reopen resource and write init messages, raises the last error if
+        not reconnected within reconnect_timeout or if cancelled."""
+        start = time.monotonic()
+        delay = self.delay
+        self.__cancelled.clear()
+        self.__close()
+        while True:
+            try:
+                resource = self.__open()
+                for message in self.__init:
+                    resource.write(message)
+                break
+            except Exception as e:
+                if not isinstance(e, (VisaIOError, InvalidSession, OSError)):
+                    raise
+                if time.monotonic() - start + delay > self.reconnect_timeout:
+                    logging.error("failed to reconnect %s: %s", self.__resource_name, e)
+                    raise
+                logging.warning("failed to reconnect %s, retry in %.1f s: %s", self.__resource_name, delay, e)
+                if self.__cancelled.wait(delay):
+                    logging.error("cancelled reconnect of %s: %s", self.__resource_name, e)
+                    raise
+                delay = min(delay * self.factor, self.max_delay)
+        self.__resource = resource
+        self.latency = time.monotonic() - start
+        self.reconnects += 1
+        logging.info("reconnected %s in %.3f s", self.__resource_name, self.latency)
+        if self.on_reconnect is not None:
+            self.on_reconnect(self.latency)
+
+    def retry(self, operation, *args, **kwargs):
+        """Call operation, repeated as a whole once after reconnecting on a
+        broken connection. Resource calls made by a running operation are
+        not retried on their own, a query failing while reading is repeated
+        including its write.
+
+        >>> resource.retry(lambda: (resource.write_raw(b'T'), resource.read_bytes(13)))
+        """
+        if getattr(self.__local, 'operation', False):
+            return operation(*args, **kwargs)
+        self.__local.operation = True
+        try:
+            try:
+                return operation(*args, **kwargs)
+            except Exception as e:
+                if not is_connection_error(e):
+                    raise
+                logging.warning("lost connection to %s: %s", self.__resource_name, e)
+            self.reconnect()
+            return operation(*args, **kwargs)
+        finally:
+            self.__local.operation = False
+
+    def __call(self, name, *args, **kwargs):
+        return self.retry(lambda: getattr(self.__resource, name)(*args, **kwargs))
+
+    def query(self, *args, **kwargs):
+        return self.__call('query', *args, **kwargs)
+
+    def query_ascii_values(self, *args, **kwargs):
+        return self.__call('query_ascii_values', *args, **kwargs)
+
+    def query_binary_values(self, *args, **kwargs):
+        return self.__call('query_binary_values', *args, **kwargs)
+
+    def read_ascii_values(self, *args, **kwargs):
+        return self.__call('read_ascii_values', *args, **kwargs)
+
+    def read_binary_values(self, *args, **kwargs):
+        return self.__call('read_binary_values', *args, **kwargs)
+
+    def read(self, *args, **kwargs):
+        return self.__call('read', *args, **kwargs)
+
+    def read_raw(self, *args, **kwargs):
+        return self.__call('read_raw', *args, **kwargs)
+
+    def read_bytes(self, *args, **kwargs):
+        return self.__call('read_bytes', *args, **kwargs)
+
+    def write(self, *args, **kwargs):
+        return self.__call('write', *args, **kwargs)
+
+    def write_raw(self, *args, **kwargs):
+        return self.__call('write_raw', *args, **kwargs)
+
+    def close(self):
+        self.__close()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.__resource, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_') or name in self.__attributes or hasattr(type(self), name):
+            super().__setattr__(name, value)
+        else:
+            setattr(self.__resource, name, value)
+            self.__options[name] = value
@@ -0,0 +1,174 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from .storage import ColumnBuffer, Records
+
+class Rollup:
+    """Incrementally maintained aggregation tier storing count, minimum,
+    maximum and mean of metrics per time bucket.
+
+    :param width: bucket width in seconds
+    :param names: names of aggregated metrics
+    :param capacity: number of buckets kept, oldest are dropped (optional)
+
+    Buckets are aligned to multiples of width, the currently open bucket is
+    updated in O(1) on every append and included in returned records.
+
+    >>> rollup = Rollup(60, ['temp', 'humid'])
+    >>> rollup.append(1561727614.603935, [21.5, 42.0])
+    >>> rollup.names
+    ['time', 'count', 'temp_min', 'temp_max', 'temp_mean', 'humid_min', 'humid_max', 'humid_mean']
+    """
+
+    aggregates = 'min', 'max', 'mean'
+
+    def __init__(self, width, names, capacity=None):
+        self.__width = float(width)
+        if self.__width <= 0:
+            raise ValueError("rollup width must be greater than zero")
+        self.__metrics = list(names)
+        dtypes = [('time', np.float64), ('count', np.int64)]
+        for name in self.__metrics:
+            for aggregate in self.aggregates:
+                dtypes.append(('{}_{}'.format(name, aggregate), np.float64))
+        self.__buffer = ColumnBuffer(dtypes, capacity, ring=bool(capacity))
+        self.clear()
+
+    @property
+    def width(self):
+        return self.__width
+
+    @property
+    def metrics(self):
+        """Returns names of aggregated metrics."""
+        return list(self.__metrics)
+
+    @property
+    def names(self):
+        """Returns names of record columns."""
+        return self.__buffer.names
+
+    def __len__(self):
+        return len(self.__buffer) + (self.__key is not None)
+
+    def clear(self):
+        self.__buffer.clear()
+        self.__key = None
+        self.__count = 0
+        self.__min = []
+        self.__max = []
+        self.__sum = []
+
+    def __open(self, key, count, minimum, maximum, total):
+        self.__key = key
+        self.__count = count
+        self.__min = list(minimum)
+        self.__max = list(maximum)
+        self.__sum = list(total)
+
+    def __current(self):
+        """Returns values of open bucket ordered like columns."""
+        values = [self.__key * self.__width, self.__count]
+        for minimum, maximum, total in zip(self.__min, self.__max, self.__sum):
+            values.extend((minimum, maximum, total / self.__count))
+        return values
+
+    def __close(self):
+        if self.__key is not None:
+            self.__buffer.append(self.__current())
+            self.__key = None
+
+    def append(self, t, values):
+        """Add values (ordered like metrics) of a record with time t."""
+        key = math.floor(t / self.__width)
+        values = [float(value) for value in values]
+        if key != self.__key:
+            self.__close()
+            self.__open(key, 1, values, values, values)
+            return
+        self.__count += 1
+        for index, value in enumerate(values):
+            if value < self.__min[index]:
+                self.__min[index] = value
+            if value > self.__max[index]:
+                self.__max[index] = value
+            self.__sum[index] += value
+
+    def extend(self, t, columns):
+        """Add records from time array t and list of value arrays ordered like
+        metrics, times must not decrease."""
+        t = np.asarray(t, dtype=np.float64)
+        if not len(t):
+            return
+        columns = [np.asarray(column, dtype=np.float64) for column in columns]
+        keys = np.floor(t / self.__width).astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        counts = np.diff(np.append(starts, len(keys)))
+        minima = [np.minimum.reduceat(column, starts) for column in columns]
+        maxima = [np.maximum.reduceat(column, starts) for column in columns]
+        sums = [np.add.reduceat(column, starts) for column in columns]
+        first = 0
+        # Merge first group into open bucket
+        if keys[0] == self.__key:
+            self.__count += int(counts[0])
+            for index in range(len(columns)):
+                self.__min[index] = min(self.__min[index], float(minima[index][0]))
+                self.__max[index] = max(self.__max[index], float(maxima[index][0]))
+                self.__sum[index] += float(sums[index][0])
+            first = 1
+        if first < len(starts):
+            self.__close()
+            last = len(starts) - 1
+            if first < last:
+                closed = OrderedDict()
+                closed['time'] = keys[starts[first:last]] * self.__width
+                closed['count'] = counts[first:last]
+                for index, name in enumerate(self.__metrics):
+                    closed['{}_min'.format(name)] = minima[index][first:last]
+                    closed['{}_max'.format(name)] = maxima[index][first:last]
+                    closed['{}_mean'.format(name)] = sums[index][first:last] / counts[first:last]
+                self.__buffer.extend(closed)
+            self.__open(
+                int(keys[starts[last]]),
+                int(counts[last]),
+                [float(column[last]) for column in minima],
+                [float(column[last]) for column in maxima],
+                [float(column[last]) for column in sums]
+            )
+
+    def __range(self, t0, t1):
+        """Returns start and stop index of closed buckets and True if open
+        bucket overlaps time range [t0, t1]."""
+        buffer = self.__buffer
+        t0 = t0 if t0 is not None and math.isfinite(t0) else None
+        t1 = t1 if t1 is not None and math.isfinite(t1) else None
+        start = stop = None
+        if t0 is not None:
+            start = buffer.searchsorted('time', math.floor(t0 / self.__width) * self.__width, side='left')
+        if t1 is not None:
+            stop = buffer.searchsorted('time', t1, side='right')
+        current = False
+        if self.__key is not None:
+            begin = self.__key * self.__width
+            current = (t1 is None or begin <= t1) and (t0 is None or begin + self.__width > t0)
+        return start, stop, current
+
+    def count(self, t0=None, t1=None):
+        """Returns number of buckets overlapping time range [t0, t1]."""
+        start, stop, current = self.__range(t0, t1)
+        buffer = self.__buffer
+        start = buffer.first if start is None else start
+        stop = buffer.count if stop is None else stop
+        return max(0, stop - start) + current
+
+    def records(self, t0=None, t1=None):
+        """Returns buckets overlapping time range [t0, t1] including the open
+        bucket, bucket time is the start of a bucket."""
+        start, stop, current = self.__range(t0, t1)
+        records = self.__buffer.view(start, stop)
+        if not current:
+            return records
+        values = self.__current()
+        return Records((name, np.append(records[name], value)) for name, value in zip(records.names, values))
@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .service import Service
+
+class Request:
+    """Device request in flight, shared by all callers of identical requests."""
+
+    def __init__(self):
+        self.__event = threading.Event()
+        self.__result = None
+        self.__error = None
+
+    def set_result(self, result):
+        self.__result = result
+        self.__event.set()
+
+    def set_error(self, error):
+        self.__error = error
+        self.__event.set()
+
+    def result(self):
+        """Wait for and return result, re-raises a failed request's exception."""
+        self.__event.wait()
+        if self.__error is not None:
+            raise self.__error
+        return self.__result
+
+class Poll:
+    """Periodic device request owned by a Scheduler.
+
+    :param key: request key (device, method, args, kwargs)
+    :param interval: poll interval in seconds
+    """
+
+    def __init__(self, key, interval):
+        self.key = key
+        self.interval = float(interval)
+        self.deadline = time.monotonic()
+        self.running = False
+        self.value = None
+        self.timestamp = None
+        self.error = None
+        self.__subscribers = []
+
+    @property
+    def subscribers(self):
+        return list(self.__subscribers)
+
+    def subscribe(self, callback):
+        """Register callback called with every polled value."""
+        self.__subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.__subscribers.remove(callback)
+
+    def publish(self, value):
+        for callback in self.__subscribers:
+            try:
+                callback(value)
+            except Exception as e:
+                logging.exception(e)
+
+class Scheduler(Service):
+    """Service owning periodic device polls and coalescing identical device
+    requests into a single I/O.
+
+    Identical concurrent requests (same device, method and arguments) wait
+    for the request already in flight and share its result. Polled values
+    are cached, requests passing max_age are served from that cache.
+
+    Polls are executed independently, every poll is rescheduled as soon as
+    it returned and only one poll per device is in flight at a time, so a
+    slow device does not delay polls of other devices.
+
+    >>> scheduler = app.add_service('scheduler', comet.Scheduler)
+    >>> poll = scheduler.add_poll(cts, 'get_analog_channel', 1, interval=5.0)
+    >>> poll.subscribe(lambda value: print(value))
+    >>> scheduler.request(cts, 'get_analog_channel', 1, max_age=5.0)
+    (21.5, 22.0)
+    """
+
+    max_workers = 4
+    """Maximum number of polls executed concurrently."""
+
+    cache_size = 1024
+    """Maximum number of cached request results, least recently stored
+    results are dropped first."""
+
+    def __init__(self, app, name):
+        self.__mutex = threading.Lock()
+        self.__requests = {}
+        self.__cache = OrderedDict()
+        self.__polls = []
+        self.__wakeup = threading.Event()
+        super(Scheduler, self).__init__(app, name)
+
+    @property
+    def polls(self):
+        with self.__mutex:
+            return list(self.__polls)
+
+    @staticmethod
+    def make_key(device, method, args, kwargs):
+        """Returns hashable key for request or None if arguments are not
+        hashable (eg. lists or variants)."""
+        key = device, method, tuple(args), tuple(sorted(kwargs.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def request(self, device, method, *args, max_age=None, **kwargs):
+        """Call device method by name, coalescing identical requests in
+        flight. If max_age (seconds) is given, a cached value not older than
+        max_age is returned without device I/O. Requests with unhashable
+        arguments are neither coalesced nor cached."""
+        key = self.make_key(device, method, args, kwargs)
+        if key is None:
+            return getattr(device, method)(*args, **kwargs)
+        with self.__mutex:
+            if max_age is not None and key in self.__cache:
+                timestamp, value = self.__cache[key]
+                if time.monotonic() - timestamp <= max_age:
+                    return value
+                del self.__cache[key]
+            request = self.__requests.get(key)
+            leader = request is None
+            if leader:
+                request = Request()
+                self.__requests[key] = request
+        if not leader:
+            return request.result()
+        try:
+            value = getattr(device, method)(*args, **kwargs)
+        except Exception as e:
+            request.set_error(e)
+            raise
+        else:
+            request.set_result(value)
+            with self.__mutex:
+                self.__cache[key] = time.monotonic(), value
+                self.__cache.move_to_end(key)
+                while len(self.__cache) > self.cache_size:
+                    self.__cache.popitem(last=False)
+            return value
+        finally:
+            with self.__mutex:
+                del self.__requests[key]
+
+    def add_poll(self, device, method, *args, interval=1.0, **kwargs):
+        """Add a periodic request, returns Poll object to subscribe to. Polls
+        for identical requests are shared, using the shortest interval."""
+        key = device, method, tuple(args), tuple(sorted(kwargs.items()))
+        with self.__mutex:
+            for poll in self.__polls:
+                if poll.key == key:
+                    poll.interval = min(poll.interval, float(interval))
+                    break
+            else:
+                poll = Poll(key, interval)
+                self.__polls.append(poll)
+        self.__wakeup.set()
+        return poll
+
+    def remove_poll(self, poll):
+        with self.__mutex:
+            self.__polls.remove(poll)
+
+    def clear_cache(self):
+        """Drop all cached request results."""
+        with self.__mutex:
+            self.__cache.clear()
+
+    @property
+    def cache_count(self):
+        """Returns number of cached request results."""
+        with self.__mutex:
+            return len(self.__cache)
+
+    def __execute(self, poll):
+        device, method, args, kwargs = poll.key
+        try:
+            value = self.request(device, method, *args, **dict(kwargs))
+        except Exception as e:
+            logging.error("poll %s.%s%s failed: %s", device.name, method, args, e)
+            poll.error = e
+        else:
+            poll.value = value
+            poll.timestamp = time.time()
+            poll.error = None
+            poll.publish(value)
+
+    def __reschedule(self, poll):
+        with self.__mutex:
+            # Drift free deadlines, skip missed intervals
+            now = time.monotonic()
+            poll.deadline += poll.interval
+            if poll.deadline <= now:
+                poll.deadline = now + poll.interval
+            poll.running = False
+        self.__wakeup.set()
+
+    def quit(self):
+        super(Scheduler, self).quit()
+        self.__wakeup.set()
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as executor:
+            while self.is_alive:
+                self.__wakeup.clear()
+                now = time.monotonic()
+                with self.__mutex:
+                    polls = list(self.__polls)
+                    busy = set(poll.key[0] for poll in polls if poll.running)
+                    due = []
+                    for poll in polls:
+                        device = poll.key[0]
+                        if not poll.running and poll.deadline <= now and device not in busy:
+                            poll.running = True
+                            busy.add(device)
+                            due.append(poll)
+                    # Polls of busy devices are woken up on reschedule
+                    deadlines = [poll.deadline for poll in polls if poll.key[0] not in busy]
+                for poll in due:
+                    future = executor.submit(self.__execute, poll)
+                    future.add_done_callback(lambda future, poll=poll: self.__reschedule(poll))
+                timeout = max(0., min(deadlines) - now) if deadlines else None
+                self.__wakeup.wait(timeout)
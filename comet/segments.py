@@ -0,0 +1,371 @@
+import glob
+import json
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from .storage import ColumnBuffer, Records
+
+MAGIC = b'COMETSEG'
+"""Magic bytes identifying a segment file."""
+
+VERSION = 1
+"""Segment file format version."""
+
+PREFIX = struct.Struct('<8sIIQQ')
+"""Fixed prefix: magic, version, header size, record count, capacity."""
+
+COUNT_OFFSET = 16
+"""Byte offset of record count in prefix."""
+
+ALIGNMENT = 64
+"""Alignment of header and columns in bytes."""
+
+FILENAME_PATTERN = 'segment-{:08d}.seg'
+"""Segment filename, formatted with sequence number."""
+
+FILENAME_GLOB = 'segment-*.seg'
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def column_dtype(dtype):
+    """Returns little endian dtype for column storage, raises a ValueError for
+    types not storable in binary segments."""
+    dtype = np.dtype(dtype)
+    if dtype.hasobject:
+        raise ValueError("unable to store object type in segment")
+    return dtype.newbyteorder('<')
+
+class Segment:
+    """Fixed size, append-only binary segment file storing records in
+    memory-mapped columns.
+
+    A segment starts with a fixed prefix (magic, version, header size, record
+    count and capacity) followed by a JSON header describing the metrics
+    (name, unit, label and dtype). Columns are stored one after another,
+    each aligned to 64 bytes and sized for capacity records.
+
+    >>> segment = Segment.create('segment-00000000.seg', collection.metrics.values(), 65536)
+    >>> segment.append((1561727614.603935, 42.))
+    >>> segment.close()
+    >>> Segment('segment-00000000.seg').records()['v']
+    memmap([42.])
+    """
+
+    def __init__(self, filename, mode='r'):
+        self.__filename = filename
+        self.__mode = mode
+        self.__mm = np.memmap(filename, dtype=np.uint8, mode=mode)
+        magic, version, header_size, _, capacity = PREFIX.unpack_from(self.__mm, 0)
+        if magic != MAGIC:
+            raise ValueError("not a segment file: '{}'".format(filename))
+        if version != VERSION:
+            raise ValueError("unsupported segment version {}: '{}'".format(version, filename))
+        header = json.loads(bytes(self.__mm[PREFIX.size:PREFIX.size + header_size]).decode('utf-8'))
+        self.__metrics = header.get('metrics', [])
+        self.__capacity = capacity
+        self.__count = np.ndarray((1,), dtype='<u8', buffer=self.__mm, offset=COUNT_OFFSET)
+        self.__columns = OrderedDict()
+        offset = align(PREFIX.size + header_size)
+        for metric in self.__metrics:
+            dtype = column_dtype(metric.get('dtype'))
+            self.__columns[metric.get('name')] = np.ndarray((capacity,), dtype=dtype, buffer=self.__mm, offset=offset)
+            offset = align(offset + dtype.itemsize * capacity)
+
+    @classmethod
+    def create(cls, filename, metrics, capacity):
+        """Create a new segment file for metrics and return it opened for
+        appending records. Metrics must provide name, unit, label and dtype
+        attributes (see class Metric)."""
+        capacity = int(capacity)
+        if capacity < 1:
+            raise ValueError("capacity must be greater than zero")
+        header = dict(metrics=[dict(
+            name=metric.name,
+            unit=metric.unit,
+            label=metric.label,
+            dtype=column_dtype(metric.dtype).str
+        ) for metric in metrics])
+        header = json.dumps(header).encode('utf-8')
+        size = align(PREFIX.size + len(header))
+        for metric in metrics:
+            size = align(size + column_dtype(metric.dtype).itemsize * capacity)
+        with open(filename, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(header), 0, capacity))
+            f.write(header)
+            f.truncate(size)
+        return cls(filename, mode='r+')
+
+    @property
+    def filename(self):
+        return self.__filename
+
+    @property
+    def metrics(self):
+        """Returns list of metric descriptions (dict)."""
+        return list(self.__metrics)
+
+    @property
+    def capacity(self):
+        return self.__capacity
+
+    def __len__(self):
+        return int(self.__count[0])
+
+    @property
+    def is_full(self):
+        return len(self) >= self.__capacity
+
+    def records(self, start=None, stop=None):
+        """Returns memory-mapped records view."""
+        count = len(self)
+        return Records((name, column[:count][start:stop]) for name, column in self.__columns.items())
+
+    def append(self, values):
+        """Append a record, values must be ordered like metrics. Returns
+        False if segment is full."""
+        count = len(self)
+        if count >= self.__capacity:
+            return False
+        for column, value in zip(self.__columns.values(), values):
+            column[count] = value
+        self.__count[0] = count + 1
+        return True
+
+    def extend(self, columns, offset=0):
+        """Append records from mapping of equally sized column arrays starting
+        at offset. Returns number of records written."""
+        count = len(self)
+        size = 0
+        for name, column in self.__columns.items():
+            values = np.asarray(columns[name])[offset:offset + self.__capacity - count]
+            column[count:count + len(values)] = values
+            size = len(values)
+        self.__count[0] = count + size
+        return size
+
+    def flush(self):
+        if self.__mode != 'r':
+            self.__mm.flush()
+
+    def close(self):
+        self.flush()
+        self.__columns.clear()
+        self.__count = None
+        self.__mm = None
+
+class SegmentReader:
+    """Reads records from a directory of segment files using memory-mapping.
+
+    >>> reader = SegmentReader('iv.segments')
+    >>> len(reader)
+    1048576
+    >>> reader.read()['i']
+    array([...])
+    """
+
+    def __init__(self, path):
+        self.__path = path
+        filenames = sorted(glob.glob(os.path.join(path, FILENAME_GLOB)))
+        self.__segments = [Segment(filename) for filename in filenames]
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def segments(self):
+        return list(self.__segments)
+
+    @property
+    def metrics(self):
+        for segment in self.__segments:
+            return segment.metrics
+        return []
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.__segments)
+
+    def __iter__(self):
+        """Iterate over zero-copy records views of all segments."""
+        for segment in self.__segments:
+            yield segment.records()
+
+    def read(self):
+        """Returns all records concatenated into new arrays."""
+        names = [metric.get('name') for metric in self.metrics]
+        views = [segment.records() for segment in self.__segments]
+        return Records((name, np.concatenate([view[name] for view in views])) for name in names)
+
+class SpillBuffer:
+    """Column buffer keeping a hot in-memory tail while spilling older records
+    to segment files, records are never dropped.
+
+    :param metrics: metrics to store, see class Metric
+    :param path: directory for segment files
+    :param capacity: number of records kept in memory and per segment (optional)
+
+    Provides the same interface as class ColumnBuffer. Views of records in
+    memory or within a single segment are zero-copy, views spanning
+    multiple segments are concatenated into new arrays.
+
+    Segments are written to a unique subdirectory of path created on first
+    spill, existing files in path (eg. of a previous run or of a
+    SegmentFileWriter) are never touched. Method clear() removes only the
+    segments written by this buffer.
+    """
+
+    default_capacity = 65536
+    """Default number of records kept in memory and per segment file."""
+
+    def __init__(self, metrics, path, capacity=None):
+        self.__metrics = list(metrics)
+        self.__path = path
+        self.__capacity = int(capacity or self.default_capacity)
+        dtypes = [(metric.name, metric.dtype) for metric in self.__metrics]
+        for _, dtype in dtypes:
+            column_dtype(dtype)
+        self.__hot = ColumnBuffer(dtypes, self.__capacity, ring=True)
+        self.__segments = []
+        self.__directory = None
+        self.clear()
+
+    @property
+    def names(self):
+        return self.__hot.names
+
+    @property
+    def dtypes(self):
+        return self.__hot.dtypes
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def directory(self):
+        """Returns subdirectory containing segments of this buffer, None if
+        no records have been spilled yet."""
+        return self.__directory
+
+    @property
+    def capacity(self):
+        """Returns number of records kept in memory."""
+        return self.__capacity
+
+    @property
+    def ring(self):
+        return False
+
+    @property
+    def count(self):
+        return self.__hot.count
+
+    @property
+    def first(self):
+        return 0
+
+    @property
+    def spilled(self):
+        """Returns number of records written to segment files."""
+        return len(self.__segments) * self.__capacity
+
+    @property
+    def segments(self):
+        return list(self.__segments)
+
+    @property
+    def nbytes(self):
+        """Returns number of bytes allocated in memory."""
+        return self.__hot.nbytes
+
+    def __len__(self):
+        return self.__hot.count
+
+    def clear(self):
+        """Remove all records and segment files written by this buffer."""
+        for segment in self.__segments:
+            segment.close()
+            os.remove(segment.filename)
+        self.__segments = []
+        if self.__directory is not None:
+            os.rmdir(self.__directory)
+            self.__directory = None
+        self.__hot.clear()
+
+    def __spill(self):
+        """Write next full chunk of records from memory to a new segment."""
+        start = self.spilled
+        if self.__directory is None:
+            if not os.path.exists(self.__path):
+                os.makedirs(self.__path)
+            self.__directory = tempfile.mkdtemp(prefix='spill-', dir=self.__path)
+        filename = os.path.join(self.__directory, FILENAME_PATTERN.format(len(self.__segments)))
+        segment = Segment.create(filename, self.__metrics, self.__capacity)
+        segment.extend(self.__hot.view(start, start + self.__capacity).columns)
+        segment.flush()
+        self.__segments.append(segment)
+
+    def append(self, values):
+        self.__hot.append(values)
+        if self.__hot.count - self.spilled >= self.__capacity:
+            self.__spill()
+
+    def extend(self, columns):
+        columns = OrderedDict((name, np.asarray(columns[name])) for name in self.names)
+        size = len(next(iter(columns.values()))) if columns else 0
+        offset = 0
+        while offset < size:
+            chunk = self.__capacity - (self.__hot.count - self.spilled)
+            self.__hot.extend(OrderedDict((name, column[offset:offset + chunk]) for name, column in columns.items()))
+            offset += chunk
+            if self.__hot.count - self.spilled >= self.__capacity:
+                self.__spill()
+
+    def searchsorted(self, name, value, side='left'):
+        """Returns absolute index where value would be inserted into sorted
+        column name to maintain order (binary search over segments and
+        memory, see numpy.searchsorted)."""
+        def found(x):
+            return x >= value if side == 'left' else x > value
+        hot = self.__hot.view()[name]
+        hot_first = self.__hot.first
+        if len(hot) and not found(hot[0]):
+            return hot_first + int(np.searchsorted(hot, value, side=side))
+        # Find first segment with a matching last value
+        low, high = 0, len(self.__segments)
+        while low < high:
+            middle = (low + high) // 2
+            if found(self.__segments[middle].records()[name][-1]):
+                high = middle
+            else:
+                low = middle + 1
+        if low < len(self.__segments):
+            column = self.__segments[low].records()[name]
+            return min(hot_first, low * self.__capacity + int(np.searchsorted(column, value, side=side)))
+        return hot_first
+
+    def view(self, start=None, stop=None):
+        """Returns records view for absolute index range [start, stop)."""
+        count = self.__hot.count
+        start = 0 if start is None else max(0, min(int(start), count))
+        stop = count if stop is None else max(start, min(int(stop), count))
+        hot_first = self.__hot.first
+        if start >= hot_first:
+            return self.__hot.view(start, stop)
+        views = []
+        disk_stop = min(stop, hot_first)
+        index = start // self.__capacity
+        while index * self.__capacity < disk_stop:
+            offset = index * self.__capacity
+            views.append(self.__segments[index].records(max(start, offset) - offset, disk_stop - offset))
+            index += 1
+        if stop > hot_first:
+            views.append(self.__hot.view(hot_first, stop))
+        if len(views) == 1:
+            return views[0]
+        return Records((name, np.concatenate([view[name] for view in views])) for name in self.names)
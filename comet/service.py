@@ -1,16 +1,44 @@
 import time
-from .component import ControlComponent
+from .component import CancellationToken, ControlComponent
 
 class Service(ControlComponent):
     """Service base class, inherit to create custom services.
 
-    Services are executed as threads by the application, property is_alive is
-    used to test if the service is beeing executed.
+    Services are executed on a thread pool supervised by the application,
+    property is_alive is used to test if the service is beeing executed.
+    Services raising an exception are restarted according to restart_policy.
+
+    Set interval to call method periodic every interval seconds instead of
+    implementing run.
+
+    >>> class Monitoring(Service):
+    ...     interval = 5.0
+    ...     def periodic(self):
+    ...         self.app.collections.get('environ').append(time=self.time(), temp=read_temp())
     """
 
+    restart_policy = 'on_failure'
+    """Restart policy, either 'on_failure' or 'never'."""
+
+    restart_delay = 1.0
+    """Initial delay in seconds before restarting a failed service."""
+
+    restart_factor = 2.0
+    """Backoff factor applied to restart delay after every failure."""
+
+    max_restart_delay = 60.0
+    """Maximum delay in seconds before restarting a failed service."""
+
+    interval = None
+    """Seconds between calls of method periodic (optional)."""
+
     def __init__(self, app, name):
         super(Service, self).__init__(app, name)
         self.__alive = True
+        self.cancellation = CancellationToken(app)
+        self.failures = 0
+        self.restarts = 0
+        self.error = None
         self.setup()
 
     @property
@@ -19,8 +47,9 @@ class Service(ControlComponent):
         return self.__alive
 
     def quit(self):
-        """Stops executing service."""
+        """Stops executing service, cancels pending waits."""
         self.__alive = False
+        self.cancellation.cancel()
 
     def setup(self):
         pass
@@ -29,4 +58,27 @@ class Service(ControlComponent):
         pass
 
     def run(self):
+        if self.interval is not None:
+            self.run_periodic(self.periodic, self.interval)
+
+    def periodic(self):
         pass
+
+    def run_periodic(self, callback, interval):
+        """Call callback every interval seconds while service is alive.
+        Deadlines are drift free, time spent in callback is taken into
+        account and missed intervals are skipped.
+
+        >>> self.run_periodic(self.read_sensors, 5.0)
+        """
+        interval = float(interval)
+        deadline = time.monotonic()
+        while self.is_alive:
+            callback()
+            deadline += interval
+            now = time.monotonic()
+            if deadline <= now:
+                skipped = int((now - deadline) // interval) + 1
+                deadline += skipped * interval
+            if not self.wait(deadline - now):
+                break
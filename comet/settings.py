@@ -1,7 +1,32 @@
+import atexit
+import copy
 import os
 import json
+import tempfile
+import threading
+import time
 
-from appdirs import user_config_dir
+def user_config_dir(application, organization):
+    """Returns platform specific user configuration directory."""
+    import appdirs
+    return appdirs.user_config_dir(appname=application, appauthor=organization)
+
+def write_json(filename, data):
+    """Atomically write data in JSON format, using a temporary file renamed
+    to filename."""
+    path = os.path.dirname(filename)
+    if not os.path.exists(path):
+        os.makedirs(path)
+    fd, tmpname = tempfile.mkstemp(dir=path, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpname, filename)
+    except BaseException:
+        os.remove(tmpname)
+        raise
 
 class Settings:
     """Storing persistent application settings on any platform.
@@ -19,7 +44,7 @@ class Settings:
         self.__application = application
         self.__organization = organization
         self.__persistent = persistent
-        self.__path = user_config_dir(appname=application, appauthor=organization)
+        self.__path = user_config_dir(application, organization)
         self.__filename = os.path.join(self.__path, self.settings_filename)
         self.__settings = {}
 
@@ -41,7 +66,148 @@ class Settings:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Write application settings to filesystem."""
         if self.__persistent:
-            if not os.path.exists(self.__path):
-                os.makedirs(self.__path)
-            with open(self.__filename, 'w') as f:
-                json.dump(self.__settings, f)
+            write_json(self.__filename, self.__settings)
+
+class SettingsStore:
+    """Process-wide cached persistent application settings.
+
+    Reads are served from memory, the settings file is only reloaded if its
+    modification time changed (checked at most every check_interval
+    seconds). Writes are coalesced and written atomically in the background
+    after write_delay seconds, call flush() to write pending changes
+    immediately.
+
+    >>> store = SettingsStore.instance('HEPHY', 'comet')
+    >>> store.set('user', 'Monty')
+    >>> store.get('user')
+    'Monty'
+    """
+
+    settings_filename = Settings.settings_filename
+    """Filename used to store settings in JSON format."""
+
+    write_delay = 1.0
+    """Seconds to coalesce writes before writing to filesystem."""
+
+    check_interval = 1.0
+    """Minimum seconds between checks for external file modifications."""
+
+    __instances = {}
+    __instances_mutex = threading.Lock()
+
+    @classmethod
+    def instance(cls, organization, application):
+        """Returns shared settings store for organization and application."""
+        with cls.__instances_mutex:
+            key = organization, application
+            if key not in cls.__instances:
+                cls.__instances[key] = cls(organization, application)
+            return cls.__instances[key]
+
+    def __init__(self, organization, application, path=None):
+        self.__organization = organization
+        self.__application = application
+        self.__path = path or user_config_dir(application, organization)
+        self.__filename = os.path.join(self.__path, self.settings_filename)
+        self.__settings = {}
+        self.__dirty = set()
+        self.__deleted = set()
+        self.__mtime = None
+        self.__checked = None
+        self.__timer = None
+        self.__mutex = threading.RLock()
+        self.__load()
+        atexit.register(self.flush)
+
+    @property
+    def organization(self):
+        return self.__organization
+
+    @property
+    def application(self):
+        return self.__application
+
+    @property
+    def filename(self):
+        return self.__filename
+
+    def __stat(self):
+        try:
+            return os.stat(self.__filename).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def __load(self):
+        """Read settings file, keeping pending changes."""
+        mtime = self.__stat()
+        settings = {}
+        if mtime is not None:
+            with open(self.__filename, 'r') as f:
+                settings = json.load(f)
+        for key in self.__dirty:
+            settings[key] = self.__settings[key]
+        for key in self.__deleted:
+            settings.pop(key, None)
+        self.__settings = settings
+        self.__mtime = mtime
+        self.__checked = time.monotonic()
+
+    def __refresh(self):
+        """Reload settings if file was modified by someone else."""
+        if time.monotonic() - self.__checked < self.check_interval:
+            return
+        self.__checked = time.monotonic()
+        if self.__stat() != self.__mtime:
+            self.__load()
+
+    def get(self, key, default=None):
+        """Returns value by key."""
+        with self.__mutex:
+            self.__refresh()
+            return copy.deepcopy(self.__settings.get(key, default))
+
+    def set(self, key, value):
+        """Set value for key, value must be a JSON compatible object."""
+        with self.__mutex:
+            self.__refresh()
+            self.__settings[key] = copy.deepcopy(value)
+            self.__dirty.add(key)
+            self.__deleted.discard(key)
+            self.__schedule()
+
+    def remove(self, key):
+        """Remove value for key."""
+        with self.__mutex:
+            self.__refresh()
+            self.__settings.pop(key, None)
+            self.__dirty.discard(key)
+            self.__deleted.add(key)
+            self.__schedule()
+
+    def settings(self):
+        """Returns copy of all settings."""
+        with self.__mutex:
+            self.__refresh()
+            return copy.deepcopy(self.__settings)
+
+    def __schedule(self):
+        if self.__timer is None:
+            self.__timer = threading.Timer(self.write_delay, self.flush)
+            self.__timer.daemon = True
+            self.__timer.start()
+
+    def flush(self):
+        """Write pending changes to filesystem."""
+        with self.__mutex:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            if not self.__dirty and not self.__deleted:
+                return
+            # Merge with external modifications
+            if self.__stat() != self.__mtime:
+                self.__load()
+            write_json(self.__filename, self.__settings)
+            self.__dirty.clear()
+            self.__deleted.clear()
+            self.__mtime = self.__stat()
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+
+import numpy as np
+
+def to_python(value):
+    """Returns builtin python value for numpy scalar values."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class Records:
+    """Read only view on a range of records stored in typed columns.
+
+    Records do not copy data, columns are numpy array views on the storage
+    they have been taken from.
+
+    >>> records = collection.snapshot(2)
+    >>> records[0]
+    [1561727614.603935, 42.0]
+    >>> records['i']
+    array([42., 43.])
+    >>> records.tolist()
+    [[1561727614.603935, 42.0], [1561727615.607124, 43.0]]
+    """
+
+    def __init__(self, columns):
+        self.__columns = OrderedDict(columns)
+
+    @property
+    def columns(self):
+        """Returns ordered dict of column arrays."""
+        return OrderedDict(self.__columns)
+
+    @property
+    def names(self):
+        """Returns list of column names."""
+        return list(self.__columns.keys())
+
+    def __len__(self):
+        for column in self.__columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.__columns[key]
+        if isinstance(key, slice):
+            return Records((name, column[key]) for name, column in self.__columns.items())
+        return [to_python(column[key]) for column in self.__columns.values()]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def take(self, indices):
+        """Returns records at indices (copy)."""
+        return Records((name, column[indices]) for name, column in self.__columns.items())
+
+    def tolist(self):
+        """Returns list of records, each record is a list of python values."""
+        return [list(row) for row in zip(*[column.tolist() for column in self.__columns.values()])]
+
+    def todicts(self):
+        """Returns list of records, each record is an ordered dict of python values."""
+        names = self.names
+        return [OrderedDict(zip(names, row)) for row in zip(*[column.tolist() for column in self.__columns.values()])]
+
+class ColumnBuffer:
+    """Array backed column storage with optional ring buffer mode.
+
+    Every column is stored in its own typed numpy array. Records are
+    addressed by absolute index, counting every record appended since
+    creation or last call of clear().
+
+    :param dtypes: ordered sequence of (name, dtype) pairs
+    :param capacity: number of records allocated (optional)
+    :param ring: keep only the latest capacity records if True (optional)
+
+    In default mode the capacity is doubled whenever the buffer is full. In
+    ring buffer mode the capacity is fixed and the oldest records get
+    overwritten. Every value is written twice in ring buffer mode (mirrored),
+    so any range of records is a contiguous, zero-copy slice.
+
+    >>> buffer = ColumnBuffer([('time', np.float64), ('n', np.int64)], capacity=4, ring=True)
+    >>> buffer.append((1561727614.603935, 42))
+    """
+
+    default_capacity = 1024
+    """Initial capacity if no capacity is given."""
+
+    def __init__(self, dtypes, capacity=None, ring=False):
+        if ring and not capacity:
+            raise ValueError("ring buffer requires a capacity")
+        if capacity is not None and int(capacity) < 1:
+            raise ValueError("capacity must be greater than zero")
+        self.__dtypes = OrderedDict(dtypes)
+        self.__ring = bool(ring)
+        self.__initial_capacity = int(capacity or self.default_capacity)
+        self.clear()
+
+    @property
+    def names(self):
+        """Returns list of column names."""
+        return list(self.__dtypes.keys())
+
+    @property
+    def dtypes(self):
+        """Returns ordered dict of column dtypes."""
+        return OrderedDict(self.__dtypes)
+
+    @property
+    def capacity(self):
+        """Returns number of records that fit into allocated memory."""
+        return self.__capacity
+
+    @property
+    def ring(self):
+        """Returns True if buffer is in ring buffer mode."""
+        return self.__ring
+
+    @property
+    def count(self):
+        """Returns total number of records appended since last clear."""
+        return self.__count
+
+    @property
+    def first(self):
+        """Returns absolute index of oldest stored record."""
+        return self.__count - len(self)
+
+    @property
+    def nbytes(self):
+        """Returns number of bytes allocated by columns."""
+        return sum(column.nbytes for column in self.__columns.values())
+
+    def __len__(self):
+        if self.__ring:
+            return min(self.__count, self.__capacity)
+        return self.__count
+
+    def __allocate(self, capacity):
+        size = capacity * 2 if self.__ring else capacity
+        return OrderedDict((name, np.zeros(size, dtype=dtype)) for name, dtype in self.__dtypes.items())
+
+    def __grow(self):
+        capacity = self.__capacity * 2
+        columns = self.__allocate(capacity)
+        for name, column in self.__columns.items():
+            columns[name][:self.__count] = column[:self.__count]
+        self.__columns = columns
+        self.__capacity = capacity
+
+    def clear(self):
+        """Remove all records and release grown memory."""
+        self.__capacity = self.__initial_capacity
+        self.__columns = self.__allocate(self.__capacity)
+        self.__count = 0
+
+    def append(self, values):
+        """Append a record, values must be ordered like columns."""
+        if self.__ring:
+            index = self.__count % self.__capacity
+            mirror = index + self.__capacity
+            for column, value in zip(self.__columns.values(), values):
+                column[index] = value
+                column[mirror] = value
+        else:
+            if self.__count >= self.__capacity:
+                self.__grow()
+            index = self.__count
+            for column, value in zip(self.__columns.values(), values):
+                column[index] = value
+        self.__count += 1
+
+    def extend(self, columns):
+        """Append records from mapping of equally sized column arrays, values
+        must already match the column dtypes."""
+        columns = [np.asarray(columns[name]) for name in self.__dtypes.keys()]
+        size = len(columns[0]) if columns else 0
+        for column in columns:
+            if len(column) != size:
+                raise ValueError("columns must be of equal length")
+        if not size:
+            return
+        if self.__ring:
+            # Only the latest capacity records are retained
+            skip = max(0, size - self.__capacity)
+            indices = np.arange(self.__count + skip, self.__count + size) % self.__capacity
+            for target, column in zip(self.__columns.values(), columns):
+                target[indices] = column[skip:]
+                target[indices + self.__capacity] = column[skip:]
+        else:
+            while self.__count + size > self.__capacity:
+                self.__grow()
+            for target, column in zip(self.__columns.values(), columns):
+                target[self.__count:self.__count + size] = column
+        self.__count += size
+
+    def searchsorted(self, name, value, side='left'):
+        """Returns absolute index where value would be inserted into sorted
+        column name to maintain order (binary search, see numpy.searchsorted)."""
+        return self.first + int(np.searchsorted(self.view()[name], value, side=side))
+
+    def view(self, start=None, stop=None):
+        """Returns records view for absolute index range [start, stop).
+
+        Indices are clamped to the range of stored records. In ring buffer
+        mode the returned views share memory with the buffer, records get
+        overwritten once capacity more records have been appended.
+        """
+        first, count = self.first, self.__count
+        start = first if start is None else max(first, min(int(start), count))
+        stop = count if stop is None else max(start, min(int(stop), count))
+        if self.__ring:
+            offset = start % self.__capacity
+            begin, end = offset, offset + (stop - start)
+        else:
+            begin, end = start, stop
+        return Records((name, column[begin:end]) for name, column in self.__columns.items())
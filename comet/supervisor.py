@@ -0,0 +1,69 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+class Supervisor:
+    """Runs services on a managed thread pool, restarting failed services
+    with exponential backoff according to their restart policy.
+
+    >>> supervisor = Supervisor(app.services.values())
+    >>> supervisor.start()
+    >>> for service in app.services.values():
+    ...     service.quit()
+    >>> supervisor.join()
+    """
+
+    thread_name_prefix = 'service'
+
+    def __init__(self, services):
+        self.__services = list(services)
+        self.__executor = None
+        self.__futures = []
+
+    @property
+    def services(self):
+        return list(self.__services)
+
+    def start(self):
+        """Start executing all services."""
+        if not self.__services:
+            return
+        self.__executor = ThreadPoolExecutor(
+            max_workers=len(self.__services),
+            thread_name_prefix=self.thread_name_prefix
+        )
+        self.__futures = [self.__executor.submit(self.supervise, service) for service in self.__services]
+
+    def join(self, timeout=None):
+        """Wait for services to return and shut down thread pool."""
+        if self.__executor is None:
+            return
+        wait(self.__futures, timeout)
+        self.__executor.shutdown(wait=timeout is None)
+        self.__executor = None
+        self.__futures = []
+
+    @classmethod
+    def supervise(cls, service):
+        """Run service until it returns, restart on failure with backoff.
+        The backoff is reset if a service ran longer than its maximum
+        restart delay."""
+        delay = service.restart_delay
+        while service.is_alive:
+            started = time.monotonic()
+            try:
+                service.run()
+                return
+            except Exception as e:
+                logging.exception("service '%s' failed: %s", service.name, e)
+                service.failures += 1
+                service.error = e
+            if service.restart_policy != 'on_failure' or not service.is_alive:
+                return
+            if time.monotonic() - started > service.max_restart_delay:
+                delay = service.restart_delay
+            logging.warning("restarting service '%s' in %.1f s", service.name, delay)
+            if not service.wait(delay):
+                return
+            delay = min(delay * service.restart_factor, service.max_restart_delay)
+            service.restarts += 1
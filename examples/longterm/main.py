@@ -17,6 +17,7 @@ import logging
 import random
 
 import comet
+from comet.jobgraph import JobsCancelled
 from devices import CTSDevice
 
 class Application(comet.Application):
@@ -40,18 +41,16 @@ class Application(comet.Application):
         self.add_param('i_sensor_compliance', default=25.0, prec=1, unit='uA')
         self.add_param('t_longterm', default=60.0, prec=2, unit='min')
         self.add_param('t_interval', default=60.0, prec=2, unit='sec')
-        self.add_param('t_tcp_recover', min=0, type=int, label="Wait on TCP reconnect to cliamte chamber")
-        # register devices
-        self.add_device('climate', self.get('cts_resource'), cls=CTSDevice)
+        # register devices, TCPIP resources reconnect on broken connections
+        self.add_device('climate', self.get('cts_resource'), {'reconnect': {'reconnect_timeout': 300.0}}, cls=CTSDevice)
         #self.add_device('k2410', 'TCPIP::::10001::INSTR')
         #self.add_device('k2700', 'TCPIP::::10002::INSTR')
         # self.add_device('shunt', 'ASRL1::INSTR')
-        # HACK: create a CTS binary device from allocated resource
-        self.cts_device = CTSDevice('cts', self.devices.get('climate').resource)
         # Register collections
         self.add_collection('environ', EnvironCollection)
         self.add_collection('iv', IVCollection)
         # Register services
+        self.add_service('scheduler', comet.Scheduler)
         self.add_service('mon', Monitoring)
         # Register states
         self.add_job('ramp_up', RampUp)
@@ -70,63 +69,62 @@ class Application(comet.Application):
 
         # reset Multi
         k2700 = self.devices.get('k2700')
-        k2700.write('*RST')
-        k2700.write(':FUNC "VOLT:DC", (@101:140)')
-        # delete instrument buffer
-        k2700.write(':TRACE:CLEAR')
-        # turn off continous measurements
-        k2700.write(':INIT:CONT OFF')
-        # set trigger source immediately
-        k2700.write(':TRIG:SOUR IMM')
-        # set channels to scan
         n_sensors = self.params.get('n_sensors').value
-        if n_sensors > 10:
-            offset = n_sensors + 120
-            k2700.write(':ROUTE:SCAN (@111:120,131:{})'.format(offset))
-        else:
-            offset = n_sensors + 100
-            k2700.write('ROUTE:SCAN (@101:{})'.format(offset))
-        k2700.write(':TRIG:COUN 1')
-        k2700.write(':SAMP:COUN {}'.format(n_sensors))
-        # start scan when triggered
-        k2700.write(':ROUT:SCAN:TSO IMM')
-        # enable scan
-        k2700.write(':ROUT:SCAN:LSEL INT')
-        k2700.write(':TRIG:COUN 1')
-        k2700.write(':SAMP:COUN {}'.format(n_sensors))
-        # start scan when triggered
-        k2700.write(':ROUT:SCAN:TSO IMM')
-        # enable scan
-        k2700.write(':ROUT:SCAN:LSEL INT')
+        with k2700.batch() as batch:
+            batch.write('*RST')
+            batch.write(':FUNC "VOLT:DC", (@101:140)')
+            # delete instrument buffer
+            batch.write(':TRACE:CLEAR')
+            # turn off continous measurements
+            batch.write(':INIT:CONT OFF')
+            # set trigger source immediately
+            batch.write(':TRIG:SOUR IMM')
+            # set channels to scan
+            if n_sensors > 10:
+                offset = n_sensors + 120
+                batch.write(':ROUTE:SCAN (@111:120,131:{})'.format(offset))
+            else:
+                offset = n_sensors + 100
+                batch.write('ROUTE:SCAN (@101:{})'.format(offset))
+            batch.write(':TRIG:COUN 1')
+            batch.write(':SAMP:COUN {}'.format(n_sensors))
+            # start scan when triggered
+            batch.write(':ROUT:SCAN:TSO IMM')
+            # enable scan
+            batch.write(':ROUT:SCAN:LSEL INT')
 
         # reset SMU
         k2410 = self.devices.get('k2410')
-        k2410.write('*RST')
-        k2410.write('SENS:AVER:TCON REP')
-        k2410.write('SENS:AVER ON')
-        k2410.write('ROUT:TERM REAR')
-        k2410.write(':SOUR:FUNC VOLT')
-        k2410.write('OUTP OFF')
-        k2410.write('SOUR:VOLT:RANG MAX')
-        # measure current DC
-        k2410.write('SENS:FUNC "CURR"')
-        # output data format
-        k2410.write('SENS:CURR:RANG:AUTO 1')
-        k2410.write('TRIG:CLE')
-        k2410.write('SENS:AVER:TCON REP')
-        k2410.write('SENS:AVER OFF')
-        k2410.write('ROUT:TERM REAR')
+        with k2410.batch() as batch:
+            batch.write('*RST')
+            batch.write('SENS:AVER:TCON REP')
+            batch.write('SENS:AVER ON')
+            batch.write('ROUT:TERM REAR')
+            batch.write(':SOUR:FUNC VOLT')
+            batch.write('OUTP OFF')
+            batch.write('SOUR:VOLT:RANG MAX')
+            # measure current DC
+            batch.write('SENS:FUNC "CURR"')
+            # output data format
+            batch.write('SENS:CURR:RANG:AUTO 1')
+            batch.write('TRIG:CLE')
+            batch.write('SENS:AVER:TCON REP')
+            batch.write('SENS:AVER OFF')
+            batch.write('ROUT:TERM REAR')
         time.sleep(.100)
-        k2410.write('SENS:CURR:PROT:LEV {:E}'.format(compliance_uamp))
-        # clear voltage
-        k2410.write('SOUR:VOLT:LEV {:E}'.format(0.000))
-        # NOTE switch output ON
-        k2410.write('OUTP ON')
+        with k2410.batch() as batch:
+            batch.write('SENS:CURR:PROT:LEV {:E}'.format(compliance_uamp))
+            # clear voltage
+            batch.write('SOUR:VOLT:LEV {:E}'.format(0.000))
+            # NOTE switch output ON
+            batch.write('OUTP ON')
 
     def on_running(self):
-        self.jobs.get('ramp_up').run()
-        self.jobs.get('ramp_bias').run()
-        self.jobs.get('longterm').run()
+        # Runs ramp_up, ramp_bias and longterm
+        try:
+            self.run_jobs('longterm')
+        except JobsCancelled as e:
+            logging.info("stopped, skipped jobs: %s", ", ".join(e.skipped))
 
     def on_stopping(self):
         self.jobs.get('ramp_down').run()
@@ -138,7 +136,7 @@ class EnvironCollection(comet.Collection):
         self.add_metric('temp', unit='°C')
         self.add_metric('humid', unit='%')
         self.add_metric('water', unit='l')
-        writer = comet.CSVFileWriter("dump.csv", fieldnames=['time', 'temp', 'humid', 'water'])
+        writer = comet.CSVFileWriter("dump.csv", fieldnames=['time', 'temp', 'humid', 'water'], buffered=True)
         self.add_handle(writer)
 
 class IVCollection(comet.Collection):
@@ -155,19 +153,23 @@ class IVCollection(comet.Collection):
 
 class Monitoring(comet.Service):
 
-    def run(self):
+    interval = 5.0
+
+    def periodic(self):
         environ = self.app.collections.get('environ')
-        cts = self.app.cts_device
-        while self.is_alive:
-            t = self.time()
-            temp_actual, temp_target = cts.get_analog_channel(1)
-            humid_actual, humid_target = cts.get_analog_channel(2)
-            water_actual, water_target = cts.get_analog_channel(3)
-            environ.append(time=t, temp=temp_actual, humid=humid_actual, water=water_actual)
-            self.wait(5)
+        cts = self.app.devices.get('climate')
+        # Share readings with other consumers of the climate chamber
+        scheduler = self.app.services.get('scheduler')
+        t = self.time()
+        temp_actual, temp_target = scheduler.request(cts, 'get_analog_channel', 1, max_age=1.0)
+        humid_actual, humid_target = scheduler.request(cts, 'get_analog_channel', 2, max_age=1.0)
+        water_actual, water_target = scheduler.request(cts, 'get_analog_channel', 3, max_age=1.0)
+        environ.append(time=t, temp=temp_actual, humid=humid_actual, water=water_actual)
 
 class RampUp(comet.Job):
 
+    devices = ('k2410', 'k2700')
+
     def run(self):
         environ = self.app.collections.get('environ')
         iv = self.app.collections.get('iv')
@@ -200,6 +202,9 @@ class RampUp(comet.Job):
 
 class RampBias(comet.Job):
 
+    requires = ('ramp_up',)
+    devices = ('k2410', 'k2700')
+
     steps = 16
 
     def run(self):
@@ -219,6 +224,9 @@ class RampBias(comet.Job):
 
 class Longterm(comet.Job):
 
+    requires = ('ramp_bias',)
+    devices = ('k2410', 'k2700')
+
     def run(self):
         t_longterm_sec = self.app.params.get('t_longterm').value * 60
         t_interval_sec = self.app.params.get('t_interval').value
@@ -0,0 +1,140 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import env
+
+import numpy as np
+
+from comet.analysis import Analysis
+from comet.application import Application
+from comet.collection import Collection
+
+def fit_slope(columns):
+    slope, offset = np.polyfit(columns['v'], columns['i'], 1)
+    return dict(time=columns['time'][-1], slope=slope, n=len(columns['v']))
+
+def scale(columns):
+    return dict(time=columns['time'], i=columns['i'] * 2)
+
+def fail(columns):
+    raise RuntimeError("fit failed")
+
+class ThreadHandle:
+
+    def __init__(self):
+        self.threads = set()
+
+    def append(self, record):
+        self.threads.add(threading.current_thread().name)
+
+class MyApplication(Application):
+    pass
+
+class IVCollection(Collection):
+
+    def setup(self):
+        self.add_metric('time', unit='s')
+        self.add_metric('v', unit='V')
+        self.add_metric('i', unit='A')
+
+class FitCollection(Collection):
+
+    def setup(self):
+        self.add_metric('time', unit='s')
+        self.add_metric('slope', unit='S')
+        self.add_metric('n', type=int)
+
+class ScaledCollection(Collection):
+
+    def setup(self):
+        self.add_metric('time', unit='s')
+        self.add_metric('i', unit='A')
+
+class AnalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = MyApplication('MyApp')
+        self.iv = self.app.add_collection('iv', IVCollection)
+        self.fit = self.app.add_collection('fit', FitCollection)
+
+    def testProcessPool(self):
+        self.app.analysis_workers = 2
+        with self.app.analysis_executor as executor:
+            analysis = self.iv.add_analysis(fit_slope, 'fit', batch_size=4)
+            self.assertIn(analysis, self.iv.analyses)
+            for i in range(3):
+                self.iv.append(time=i, v=i, i=i * .5)
+            self.assertEqual(analysis.batches, 0)
+            self.iv.extend(time=[3, 4, 5, 6, 7], v=[3, 4, 5, 6, 7], i=[1.5, 2., 2.5, 3., 3.5])
+            self.assertTrue(analysis.join(10))
+        self.assertEqual(analysis.batches, 1)
+        self.assertEqual(analysis.errors, 0)
+        records = self.fit.snapshot(1)
+        self.assertEqual(records['time'].tolist(), [7.])
+        self.assertAlmostEqual(records['slope'][0], .5)
+        self.assertEqual(records['n'].tolist(), [8])
+
+    def testOrder(self):
+        scaled = self.app.add_collection('scaled', ScaledCollection, time_metric='time')
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            analysis = self.iv.add_analysis(scale, scaled, max_pending=3, executor=executor)
+            for i in range(64):
+                self.iv.append(time=i, v=0, i=i)
+            self.assertTrue(analysis.join(10))
+        self.assertEqual(analysis.pending, 0)
+        self.assertEqual(scaled.snapshot(64)['i'].tolist(), [i * 2. for i in range(64)])
+
+    def testPublisherThread(self):
+        handle = self.fit.add_handle(ThreadHandle())
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='executor') as executor:
+            analysis = self.iv.add_analysis(fit_slope, 'fit', batch_size=2, executor=executor)
+            for i in range(8):
+                self.iv.append(time=i, v=i, i=i)
+            self.assertTrue(analysis.join(10))
+        self.assertEqual(sum(self.fit.snapshot(8)['n']), 8)
+        self.assertTrue(handle.threads)
+        self.assertFalse([name for name in handle.threads if name.startswith('executor')])
+
+    def testBacklog(self):
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(release.wait, 10)
+            analysis = self.iv.add_analysis(fit_slope, 'fit', batch_size=2, max_pending=1, max_backlog=4, executor=executor)
+            self.iv.extend(time=[0, 1], v=[0, 1], i=[0, 1])
+            self.assertEqual(analysis.batches, 1)
+            self.iv.extend(time=range(2, 8), v=range(2, 8), i=range(2, 8))
+            self.assertEqual(analysis.dropped, 2)
+            release.set()
+            self.assertTrue(analysis.join(10))
+        self.assertEqual(analysis.batches, 2)
+        self.assertEqual(self.fit.snapshot(2)['n'].tolist(), [2, 4])
+        self.assertEqual(self.fit.snapshot(1)['time'].tolist(), [7.])
+
+    def testFlush(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            analysis = self.iv.add_analysis(fit_slope, self.fit, batch_size=100, executor=executor)
+            self.iv.extend(time=[0, 1], v=[0, 1], i=[0, 1])
+            self.assertEqual(analysis.batches, 0)
+            analysis.flush()
+            self.assertEqual(analysis.batches, 1)
+            self.assertTrue(analysis.join(10))
+        self.assertEqual(self.fit.snapshot(1)['n'].tolist(), [2])
+
+    def testError(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            analysis = self.iv.add_analysis(fail, 'fit', executor=executor)
+            self.iv.append(time=0, v=0, i=0)
+            self.assertTrue(analysis.join(10))
+        self.assertEqual(analysis.errors, 1)
+        self.assertIsInstance(analysis.error, RuntimeError)
+        self.assertEqual(len(self.fit), 0)
+
+    def testInvalid(self):
+        self.assertRaises(KeyError, self.iv.add_analysis, fit_slope, 'missing')
+        self.assertRaises(ValueError, self.iv.add_analysis, fit_slope, self.iv)
+        self.assertRaises(ValueError, Analysis, fit_slope, None, None, batch_size=0)
+        self.assertRaises(ValueError, Analysis, fit_slope, None, None, batch_size=8, max_backlog=4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 import env
 
@@ -11,6 +13,85 @@ class ExampleApplication(Application):
     def code(self):
         pass
 
+class HookApplication(Application):
+
+    def __init__(self):
+        super(HookApplication, self).__init__('app')
+        self.hooks = []
+        self.exited = threading.Event()
+
+    def record(self, name):
+        self.hooks.append((name, time.monotonic()))
+
+    def count(self, name):
+        return [hook for hook, _ in self.hooks].count(name)
+
+    def on_halted(self):
+        self.record('halted')
+
+    def on_configure(self):
+        self.record('configure')
+
+    def on_running(self):
+        self.record('running')
+        # Return on stop or pause
+        token = self.cancellation
+        self.wait_for(lambda: token.cancelled or self.is_paused)
+
+    def on_paused(self):
+        self.record('paused')
+
+    def on_stopping(self):
+        self.record('stopping')
+
+    def on_exit(self):
+        self.record('exit')
+        self.exited.set()
+
+class EventLoopTest(unittest.TestCase):
+
+    timeout = 2.0
+
+    def wait_hook(self, app, name, count=1):
+        """Returns seconds until hook was called count times."""
+        start = time.monotonic()
+        while app.count(name) < count:
+            self.assertLess(time.monotonic() - start, self.timeout, "hook not called: {}".format(name))
+            time.sleep(.001)
+        return time.monotonic() - start
+
+    def testEventLoop(self):
+        app = HookApplication()
+        thread = threading.Thread(target=app.run)
+        thread.start()
+        try:
+            self.wait_hook(app, 'halted')
+            # Idle state hook runs once per state change
+            time.sleep(.2)
+            self.assertEqual(app.count('halted'), 1)
+            app.start()
+            self.assertLess(self.wait_hook(app, 'running'), .5)
+            self.assertEqual(app.count('configure'), 1)
+            app.pause()
+            self.assertLess(self.wait_hook(app, 'paused'), .5)
+            time.sleep(.1)
+            self.assertEqual(app.count('paused'), 1)
+            app.unpause()
+            self.assertLess(self.wait_hook(app, 'running', 2), .5)
+            app.stop()
+            self.assertLess(self.wait_hook(app, 'halted', 2), .5)
+            self.assertEqual(app.count('stopping'), 1)
+            names = [name for name, _ in app.hooks]
+            self.assertEqual(names, ['halted', 'configure', 'running', 'paused', 'running', 'stopping', 'halted'])
+        finally:
+            # Shutdown wakes up the idle loop
+            t = time.monotonic()
+            app.quit()
+            thread.join(self.timeout)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(app.exited.is_set())
+        self.assertLess(time.monotonic() - t, .5)
+
 class ExampleTest(unittest.TestCase):
 
     def testMain(self):
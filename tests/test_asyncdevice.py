@@ -0,0 +1,88 @@
+import unittest
+import asyncio
+import threading
+import time
+import env
+
+from comet.device import Device, DeviceCommand
+from comet.asyncdevice import AsyncDevice
+
+from types import MethodType
+
+class SlowResource:
+    """Answers every query with its message after a delay."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def query(self, message):
+        time.sleep(self.delay)
+        return message
+
+    def write(self, message):
+        time.sleep(self.delay)
+        return len(message)
+
+class BarrierResource:
+    """Queries wait for queries of other resources sharing the barrier,
+    failing if they are not executed concurrently."""
+
+    def __init__(self, barrier):
+        self.barrier = barrier
+        self.active = 0
+        self.peak = 0
+
+    def enter(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+
+    def query(self, message):
+        self.enter()
+        try:
+            self.barrier.wait()
+            time.sleep(.01)
+            return message
+        finally:
+            self.active -= 1
+
+    def write(self, message):
+        self.enter()
+        try:
+            time.sleep(.01)
+            return len(message)
+        finally:
+            self.active -= 1
+
+class AsyncDeviceTest(unittest.TestCase):
+
+    def testGather(self):
+        smu = Device('smu', SlowResource(.1))
+        multi = Device('multi', SlowResource(.1))
+        command = DeviceCommand('get_reading', 'query', message='READ?')
+        smu.get_reading = MethodType(command, smu)
+        async def read():
+            with AsyncDevice(smu) as a, AsyncDevice(multi) as b:
+                return await asyncio.gather(a.get_reading(), b.query('FETCH?'), b.write('INIT'))
+        t = time.monotonic()
+        reading, fetch, count = asyncio.run(read())
+        # Both devices are read concurrently, writes to same device are serialized
+        self.assertLess(time.monotonic() - t, .35)
+        self.assertEqual(reading, 'READ?')
+        self.assertEqual(fetch, 'FETCH?')
+        self.assertEqual(count, 4)
+        self.assertEqual(AsyncDevice(smu).name, 'smu')
+
+    def testConcurrent(self):
+        # Raises BrokenBarrierError if queries of both devices are serialized
+        barrier = threading.Barrier(2, timeout=5.)
+        smu = Device('smu', BarrierResource(barrier))
+        multi = Device('multi', BarrierResource(barrier))
+        async def read():
+            with AsyncDevice(smu) as a, AsyncDevice(multi) as b:
+                return await asyncio.gather(a.query('READ?'), b.write('INIT'), b.query('FETCH?'), b.write('INIT'))
+        self.assertEqual(asyncio.run(read()), ['READ?', 4, 'FETCH?', 4])
+        # Calls to the same device never overlap
+        self.assertEqual(multi.resource.peak, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import env
+
+import numpy as np
+
+from comet.block import BlockError, parse_block_header, decode_block, decode_ascii
+from comet.device import Device, DeviceCommand
+
+class BlockResource:
+    """Returns binary block responses, read_raw stops at termination."""
+
+    read_termination = '\n'
+
+    def __init__(self, response):
+        self.buffer = response
+        self.messages = []
+
+    def write(self, message):
+        self.messages.append(message)
+
+    def query(self, message):
+        self.messages.append(message)
+        return self.buffer.decode().strip()
+
+    def read_raw(self):
+        index = self.buffer.find(b'\n')
+        data, self.buffer = self.buffer[:index + 1], self.buffer[index + 1:]
+        return data
+
+    def read_bytes(self, count):
+        data, self.buffer = self.buffer[:count], self.buffer[count:]
+        return data
+
+class BlockTestCase(unittest.TestCase):
+    def runTest(self):
+        values = np.array([1.5, -2., 4.2e-6], dtype='>f8')
+        data = values.tobytes()
+        self.assertEqual(parse_block_header(b'#224' + data + b'\n'), (4, 24))
+        self.assertEqual(parse_block_header(b'#0' + data), (2, None))
+        # Definite length, big endian
+        result = decode_block(b'#224' + data + b'\n', '>f8')
+        self.assertEqual(result.tolist(), values.tolist())
+        # Indefinite length with termination
+        result = decode_block(b'#0' + data + b'\n', '>f8')
+        self.assertEqual(result.tolist(), values.tolist())
+        # Zero-copy
+        buffer = bytearray(b'#224' + data)
+        result = decode_block(buffer, '>f8')
+        self.assertTrue(np.shares_memory(result, np.frombuffer(buffer, dtype=np.uint8)))
+        self.assertRaises(BlockError, decode_block, b'1.0,2.0')
+        self.assertRaises(BlockError, decode_block, b'#X')
+        self.assertRaises(BlockError, decode_block, b'#230' + data, '>f8')
+        self.assertRaises(BlockError, decode_block, b'#15' + data[:5], '<f4')
+        # ASCII
+        self.assertEqual(decode_ascii('+1.0E-06,+2.5E+00\n').tolist(), [1e-6, 2.5])
+        self.assertEqual(decode_ascii('1;2;3', 'i4', ';').dtype, np.int32)
+        self.assertEqual(len(decode_ascii('')), 0)
+        self.assertRaises(BlockError, decode_ascii, '1.0,OVERFLOW,3.0')
+
+class DeviceBlockTestCase(unittest.TestCase):
+    def runTest(self):
+        # Data contains termination character
+        values = np.array([1., 10., 42.], dtype='<f4')
+        data = b'\n\x00\x00\x00' + values.tobytes()
+        # Indefinite length blocks are terminated by END only
+        resource = BlockResource(b'#216' + data + b'\n' + b'#0' + values.tobytes() + b'\n')
+        device = Device('SMU', resource)
+        result = device.query_block('TRAC:DATA?', '<f4')
+        self.assertEqual(result.tobytes(), data)
+        self.assertEqual(resource.messages, ['TRAC:DATA?'])
+        result = device.read_block('<f4')
+        self.assertEqual(result.tolist(), [1., 10., 42.])
+        self.assertEqual(resource.buffer, b'')
+        self.assertEqual(device.stats.operations['query_block'].bytes_in, 21)
+
+        # Config commands
+        resource = BlockResource(b'#212' + values.astype('>f4').tobytes() + b'\n')
+        device = Device('SMU', resource)
+        command = DeviceCommand('get_buffer', 'query', message='TRAC:DATA?', format='block', dtype='>f4')
+        self.assertEqual(command(device).tolist(), [1., 10., 42.])
+        resource = BlockResource(b'+1.0E+00,+1.0E+01\n')
+        device = Device('SMU', resource)
+        command = DeviceCommand('get_readings', 'query', message='FETCH?', format='ascii')
+        self.assertEqual(command(device).tolist(), [1., 10.])
+        self.assertRaises(ValueError, DeviceCommand, 'get_buffer', 'write', message='TRAC:DATA?', format='block')
+        self.assertRaises(ValueError, DeviceCommand, 'get_buffer', 'query', message='TRAC:DATA?', format='json')
+
+if __name__ == '__main__':
+    unittest.main()
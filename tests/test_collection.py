@@ -0,0 +1,184 @@
+import unittest
+import os
+import tempfile
+import env
+
+import numpy as np
+
+from comet.application import Application
+from comet.collection import Collection
+from comet.storage import ColumnBuffer
+
+class MyApplication(Application):
+    pass
+
+class MyCollection(Collection):
+
+    def setup(self):
+        self.add_metric('time', unit='s')
+        self.add_metric('n', type=int)
+
+class MyHandle:
+
+    def __init__(self):
+        self.batches = []
+
+    def append(self, record):
+        self.batches.append([record])
+
+    def extend(self, records):
+        self.batches.append(records)
+
+class ColumnBufferTest(unittest.TestCase):
+
+    def testGrow(self):
+        buffer = ColumnBuffer([('x', np.float64)], capacity=2)
+        for i in range(5):
+            buffer.append((i,))
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(buffer.capacity, 8)
+        self.assertEqual(buffer.view().tolist(), [[0.], [1.], [2.], [3.], [4.]])
+
+    def testRing(self):
+        buffer = ColumnBuffer([('x', np.float64), ('n', np.int64)], capacity=3, ring=True)
+        for i in range(7):
+            buffer.append((i, i))
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.count, 7)
+        self.assertEqual(buffer.first, 4)
+        self.assertEqual(buffer.view()['n'].tolist(), [4, 5, 6])
+        self.assertEqual(buffer.view(5).tolist(), [[5., 5], [6., 6]])
+        self.assertEqual(buffer.view(0, 5).tolist(), [[4., 4]])
+        self.assertRaises(ValueError, ColumnBuffer, [('x', np.float64)], ring=True)
+
+class CollectionTest(unittest.TestCase):
+
+    def testAppend(self):
+        app = MyApplication('MyApp')
+        collection = MyCollection(app, 'coll')
+        self.assertEqual(len(collection), 0)
+        collection.append(time=1.5, n='42')
+        collection.append(time=2.5, n=43)
+        self.assertEqual(len(collection), 2)
+        self.assertEqual(collection.snapshot(1)[0], [2.5, 43])
+        self.assertEqual(collection.snapshot_from(0).tolist(), [[1.5, 42], [2.5, 43]])
+        self.assertEqual(collection.snapshot(2)['n'].dtype, np.int64)
+        collection.clear()
+        self.assertEqual(len(collection), 0)
+
+    def testRingBuffer(self):
+        app = MyApplication('MyApp')
+        collection = MyCollection(app, 'coll', capacity=4, ring_buffer=True)
+        for i in range(10):
+            collection.append(time=i, n=i)
+        self.assertEqual(len(collection), 4)
+        self.assertEqual(collection.count, 10)
+        self.assertEqual(collection.first, 6)
+        snapshot = collection.snapshot(2)
+        self.assertTrue(np.shares_memory(snapshot['n'], collection.buffer.view()['n'].base))
+        self.assertEqual(snapshot.tolist(), [[8., 8], [9., 9]])
+        self.assertEqual(collection.snapshot_from(0)['n'].tolist(), [6, 7, 8, 9])
+
+    def testExtend(self):
+        app = MyApplication('MyApp')
+        collection = MyCollection(app, 'coll', capacity=4, ring_buffer=True)
+        handle = MyHandle()
+        collection.add_handle(handle)
+        self.assertEqual(collection.extend([dict(time=1, n='1'), dict(time=2, n=2)]), 2)
+        self.assertEqual(collection.extend([(3, 3), (4., 4)]), 2)
+        self.assertEqual(collection.extend(time=np.arange(5., 8.), n=[5, 6, 7]), 3)
+        self.assertEqual(collection.count, 7)
+        self.assertEqual(collection.snapshot_from(0).tolist(), [[4., 4], [5., 5], [6., 6], [7., 7]])
+        self.assertEqual(len(handle.batches), 3)
+        self.assertEqual(handle.batches[-1]['n'].tolist(), [5, 6, 7])
+        self.assertRaises(ValueError, collection.extend, [(1, 'spam')])
+        self.assertRaises(ValueError, collection.extend, time=[1, 2], n=[1])
+        # Missing values raise like append() instead of filling NaN
+        self.assertRaises(ValueError, collection.append, time=8.)
+        self.assertRaises(ValueError, collection.extend, time=[8., 9.])
+        self.assertRaises(ValueError, collection.extend, [dict(time=8., n=8), dict(n=9)])
+        self.assertRaises(ValueError, collection.extend, time=[8., None], n=[8, 9])
+        self.assertEqual(collection.count, 7)
+
+    def testSpill(self):
+        app = MyApplication('MyApp')
+        with tempfile.TemporaryDirectory() as path:
+            # Segments of a previous run or a segment writer must survive
+            existing = os.path.join(path, 'segment-00000000.seg')
+            with open(existing, 'wb') as f:
+                f.write(b'data')
+            collection = MyCollection(app, 'coll', capacity=4, spill_path=path)
+            for i in range(6):
+                collection.append(time=i, n=i)
+            collection.extend(time=np.arange(6., 15.), n=np.arange(6, 15))
+            self.assertEqual(len(collection), 15)
+            self.assertEqual(collection.first, 0)
+            self.assertEqual(len(collection.buffer.segments), 3)
+            self.assertEqual(collection.buffer.nbytes, 4 * 2 * 2 * 8)
+            self.assertEqual(collection.snapshot_from(0)['n'].tolist(), list(range(15)))
+            self.assertEqual(collection.snapshot_from(5)['n'].tolist(), list(range(5, 15)))
+            self.assertEqual(collection.buffer.view(1, 3)['n'].tolist(), [1, 2])
+            self.assertEqual(collection.snapshot(3).tolist(), [[12., 12], [13., 13], [14., 14]])
+            self.assertEqual(collection.delta(limit=2).records['n'].tolist(), [0, 1])
+            directory = collection.buffer.directory
+            self.assertEqual(os.path.dirname(directory), path)
+            self.assertEqual(len(os.listdir(directory)), 3)
+            other = MyCollection(app, 'other', capacity=4, spill_path=path)
+            other.extend(time=np.arange(4.), n=np.arange(4))
+            self.assertNotEqual(other.buffer.directory, directory)
+            collection.clear()
+            self.assertEqual(len(collection), 0)
+            self.assertEqual(sorted(os.listdir(path)), sorted([os.path.basename(other.buffer.directory), 'segment-00000000.seg']))
+            with open(existing, 'rb') as f:
+                self.assertEqual(f.read(), b'data')
+        self.assertRaises(ValueError, MyCollection, app, 'coll', ring_buffer=True, spill_path='spill')
+
+    def testTimeIndex(self):
+        app = MyApplication('MyApp')
+        with tempfile.TemporaryDirectory() as path:
+            for kwargs in (dict(), dict(capacity=8, ring_buffer=True), dict(capacity=4, spill_path=path)):
+                collection = MyCollection(app, 'coll', time_metric='time', **kwargs)
+                collection.extend(time=np.arange(20.) / 2, n=np.arange(20))
+                first = collection.first
+                self.assertEqual(collection.between(6., 7.)['n'].tolist(), [12, 13, 14])
+                self.assertEqual(collection.between(-1., 6.)['n'].tolist(), list(range(first, 13)))
+                self.assertEqual(collection.since(8.6)['n'].tolist(), [18, 19])
+                self.assertEqual(collection.index_range(6., 7.), (12, 15))
+                self.assertEqual(collection.index_range(), (first, 20))
+                self.assertEqual(collection.snapshot_from(12, 2)['n'].tolist(), [12, 13])
+                self.assertEqual(collection.snapshot_from(0, 1)['n'].tolist(), [first])
+                self.assertEqual(collection.at_or_before(2.2), [2., 4] if not first else None)
+                self.assertEqual(collection.at_or_before(7.7), [7.5, 15])
+                self.assertEqual(collection.at_or_before(99.), [9.5, 19])
+                self.assertRaises(ValueError, collection.append, time=1., n=0)
+        collection = MyCollection(app, 'coll')
+        self.assertRaises(ValueError, collection.since, 0.)
+
+    def testDelta(self):
+        app = MyApplication('MyApp')
+        collection = MyCollection(app, 'coll', capacity=4, ring_buffer=True)
+        for i in range(3):
+            collection.append(time=i, n=i)
+        delta = collection.delta(limit=2)
+        self.assertTrue(delta.reset)
+        self.assertEqual(delta.records['n'].tolist(), [0, 1])
+        self.assertEqual(delta.cursor, 2)
+        self.assertEqual(delta.pending, 1)
+        delta = collection.delta(delta.cursor, delta.generation)
+        self.assertFalse(delta.reset)
+        self.assertFalse(delta.wrapped)
+        self.assertEqual(delta.records['n'].tolist(), [2])
+        for i in range(3, 10):
+            collection.append(time=i, n=i)
+        delta = collection.delta(delta.cursor, delta.generation)
+        self.assertTrue(delta.wrapped)
+        self.assertEqual(delta.records['n'].tolist(), [6, 7, 8, 9])
+        self.assertEqual(delta.cursor, 10)
+        collection.clear()
+        delta = collection.delta(delta.cursor, delta.generation)
+        self.assertTrue(delta.reset)
+        self.assertEqual(len(delta.records), 0)
+        self.assertEqual(delta.cursor, 0)
+
+if __name__ == '__main__':
+    unittest.main()
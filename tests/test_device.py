@@ -1,14 +1,18 @@
 import unittest
 import re
+import time
 import env
 
 from pyvisa import ResourceManager
 
+from comet.device import Device
 from comet.device import DeviceException
 from comet.device import DeviceFactory
 from comet.device import DeviceCommand
+from comet.device import DeviceSequence
 from comet.device import DeviceMessageHandler
 from comet.device import DeviceErrorHandler
+from comet.variant import Variant
 
 class DeviceManagerTestCase(unittest.TestCase):
     def setUp(self):
@@ -119,5 +123,157 @@ class DeviceMessageHandlerTestCase(DeviceManagerTestCase):
         })
         self.assertRaises(DeviceException, device.query, '?INVLD')
 
+class FakeResource:
+    """Records written messages, answers queries from a list of responses."""
+
+    def __init__(self, responses=None):
+        self.messages = []
+        self.responses = list(responses or [])
+
+    def write(self, message):
+        self.messages.append(message)
+
+    def query(self, message):
+        self.messages.append(message)
+        return self.responses.pop(0)
+
+class FakeResourceManager:
+    """Opens the same fake resource for every resource name."""
+
+    def __init__(self, resource):
+        self.resource = resource
+
+    def open_resource(self, resource_name, **kwargs):
+        return self.resource
+
+class DeviceBatchTestCase(unittest.TestCase):
+    def runTest(self):
+        resource = FakeResource(['KEITHLEY', '+1.000E-06;0'])
+        device = Device('SMU', resource)
+        device.batch_max_length = 48
+        with device.batch() as batch:
+            batch.write('*RST')
+            batch.write('SENS:AVER:TCON REP')
+            batch.write('SENS:AVER ON')
+            idn = batch.query('*IDN?')
+            reading = batch.query(':READ?')
+            batch.write('OUTP OFF')
+            status = batch.query('OUTP?')
+            self.assertFalse(idn.done)
+            self.assertRaises(DeviceException, lambda: idn.value)
+        self.assertEqual(resource.messages, [
+            '*RST;:SENS:AVER:TCON REP;:SENS:AVER ON;*IDN?',
+            ':READ?;:OUTP OFF;:OUTP?',
+        ])
+        self.assertEqual(idn.value, 'KEITHLEY')
+        self.assertEqual(float(reading.value), 1e-6)
+        self.assertEqual(status.value, '0')
+
+        # Response count mismatch
+        resource = FakeResource(['1;2'])
+        device = Device('SMU', resource)
+        batch = device.batch()
+        batch.query('*OPC?')
+        self.assertRaises(DeviceException, batch.execute)
+
+class DeviceCommandCacheTestCase(unittest.TestCase):
+    def runTest(self):
+        resource = FakeResource(['KEITHLEY', '1E-6', '1E-3', '1E-3', 'ERR'])
+        factory = DeviceFactory(FakeResourceManager(resource))
+        device = factory.create('SMU', 'GPIB::16', {'commands': {
+            'get_idn': {'method': 'query', 'message': '*IDN?', 'cache': 'forever'},
+            'get_range': {'method': 'query', 'message': 'RANG? {}', 'cache_ttl': 60},
+            'set_range': {'method': 'write', 'message': 'RANG {}'},
+            'get_error': {'method': 'query', 'message': 'ERR?'},
+        }})
+        self.assertEqual(device.set_range.invalidates, ['get_range'])
+        self.assertEqual(device.get_error.invalidates, [])
+        self.assertEqual(device.get_idn(), 'KEITHLEY')
+        self.assertEqual(device.get_idn(), 'KEITHLEY')
+        # Cached per arguments
+        self.assertEqual(device.get_range('CURR'), '1E-6')
+        self.assertEqual(device.get_range('CURR'), '1E-6')
+        self.assertEqual(device.get_range('VOLT'), '1E-3')
+        self.assertEqual(resource.messages, ['*IDN?', 'RANG? CURR', 'RANG? VOLT'])
+        # Invalidated by setter
+        device.set_range(1e-3)
+        self.assertEqual(device.get_range('CURR'), '1E-3')
+        self.assertEqual(device.get_idn(), 'KEITHLEY')
+        self.assertEqual(resource.messages[3:], ['RANG 0.001', 'RANG? CURR'])
+        # Not cached
+        self.assertEqual(device.get_error(), 'ERR')
+        self.assertRaises(ValueError, DeviceCommand, 'get_idn', 'query', message='*IDN?', cache='never')
+        self.assertRaises(KeyError, factory.create, 'SMU', 'GPIB::16', {'commands': {
+            'set_range': {'method': 'write', 'message': 'RANG {}', 'invalidates': ['get_range']},
+        }})
+
+class BoundDeviceCommandTestCase(unittest.TestCase):
+    def runTest(self):
+        resource = FakeResource(['OK'])
+        device = Device('SMU', resource)
+        command = DeviceCommand('set_output', 'write', message='OUTP {state}', choices=['ON', 'OFF'])
+        bound = command.bind(device)
+        self.assertEqual(bound.__name__, 'set_output')
+        self.assertEqual(bound.method, 'write')
+        self.assertIs(bound.command, command)
+        bound(state='ON')
+        self.assertRaises(ValueError, bound, state='TOGGLE')
+        # Unhashable arguments are compared with choices
+        self.assertRaises(ValueError, bound, state=[])
+        self.assertEqual(command.format_message(state=Variant('OFF')), 'OUTP OFF')
+        self.assertRaises(ValueError, command.format_message, state=Variant('TOGGLE'))
+        self.assertRaises(ValueError, bound)
+        self.assertEqual(resource.messages, ['OUTP ON'])
+        # Missing message
+        self.assertRaises(ValueError, DeviceCommand, 'set_output', 'write')
+        # Unknown device method
+        bound = DeviceCommand('get_values', 'query_values').bind(device)
+        self.assertRaises(DeviceException, bound)
+
+class DeviceSequenceTestCase(unittest.TestCase):
+    def runTest(self):
+        resource = FakeResource()
+        device = DeviceFactory(FakeResourceManager(resource)).create('SMU', 'GPIB::16', {
+            'commands': {
+                'set_reset': {'method': 'write', 'message': '*RST'},
+                'set_output': {'method': 'write', 'message': 'OUTP {}', 'choices': ['ON', 'OFF']},
+                'set_voltage': {'method': 'write', 'message': 'SOUR:VOLT {:E}'},
+                'get_voltage': {'method': 'query', 'message': 'SOUR:VOLT?', 'cache': 'forever'},
+                'get_idn': {'method': 'query', 'message': '*IDN?'},
+                'get_output': {'method': 'query', 'message': 'OUTP?'},
+            },
+            'sequences': {
+                'do_reset': [
+                    {'set_reset': []},
+                    {'delay': .01},
+                    {'set_output': ['OFF']},
+                    {'get_idn': None},
+                    {'set_voltage': [0], 'delay': .01},
+                    {'get_output': []},
+                ],
+            }
+        })
+        resource.responses = ['1.0', 'KEITHLEY', '0', '0.0']
+        self.assertEqual(device.get_voltage(), '1.0')
+        started = time.monotonic()
+        results = device.do_reset()
+        self.assertGreaterEqual(time.monotonic() - started, .02)
+        self.assertEqual(results, ['KEITHLEY', '0'])
+        self.assertEqual(resource.messages, [
+            'SOUR:VOLT?',
+            '*RST',
+            'OUTP OFF;*IDN?;:SOUR:VOLT 0.000000E+00',
+            'OUTP?',
+        ])
+        # Cache invalidated by set_voltage
+        self.assertEqual(device.get_voltage(), '0.0')
+        self.assertEqual(device.stats.commands['do_reset'].calls, 1)
+        self.assertEqual(device.stats.operations['batch'].calls, 1)
+        # Invalid steps
+        commands = {'set_output': DeviceCommand('set_output', 'write', message='OUTP {}', choices=['ON', 'OFF'])}
+        self.assertRaises(KeyError, DeviceSequence, 'do_output', [{'set_outp': ['ON']}], commands)
+        self.assertRaises(ValueError, DeviceSequence, 'do_output', [{'set_output': ['TOGGLE']}], commands)
+        self.assertRaises(ValueError, DeviceSequence, 'do_output', [{'set_output': ['ON'], 'get_output': []}], commands)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import env
+
+import numpy as np
+
+from comet.storage import Records
+from comet.downsampling import lttb_indices, minmax_indices, downsample, downsample_chunks
+
+class DownsamplingTest(unittest.TestCase):
+
+    def testLttb(self):
+        x = np.arange(1000, dtype=np.float64)
+        y = np.sin(x / 50.)
+        y[500] = 10.
+        indices = lttb_indices(x, y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertIn(500, indices)
+        self.assertTrue((np.diff(indices) > 0).all())
+        self.assertEqual(len(lttb_indices(x[:10], y[:10], 100)), 10)
+
+    def testMinMax(self):
+        y = np.zeros(1000)
+        y[123] = -5.
+        y[777] = 5.
+        indices = minmax_indices(y, 100)
+        self.assertLessEqual(len(indices), 100)
+        self.assertIn(123, indices)
+        self.assertIn(777, indices)
+
+    def testDownsample(self):
+        records = Records([('time', np.arange(1000.)), ('v', np.random.random(1000)), ('i', np.random.random(1000))])
+        result = downsample(records, 50, mode='minmax')
+        # Union of up to 50 points per column plus first and last record
+        self.assertLessEqual(len(result), 2 * 50 + 2)
+        self.assertEqual(result['time'][0], 0.)
+        self.assertEqual(result['time'][-1], 999.)
+        self.assertIs(downsample(records, 1000), records)
+        self.assertRaises(ValueError, downsample, records, 50, mode='spam')
+
+    def testDownsampleChunks(self):
+        records = Records([('time', np.arange(1000.)), ('v', np.random.random(1000))])
+        chunks = [records[offset:offset + 300] for offset in range(0, 1000, 300)]
+        result = downsample_chunks(chunks, 50, 1000, mode='minmax')
+        self.assertLessEqual(len(result), 2 * 50 + 2 * len(chunks))
+        self.assertEqual(result['time'][0], 0.)
+        self.assertEqual(result['time'][-1], 999.)
+        self.assertTrue(np.all(np.diff(result['time']) > 0))
+        self.assertEqual(len(downsample_chunks([], 50, 0)), 0)
+        self.assertRaises(ValueError, downsample_chunks, chunks, 0, 1000)
+
+if __name__ == '__main__':
+    unittest.main()
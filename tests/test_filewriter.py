@@ -0,0 +1,73 @@
+import unittest
+import os
+import tempfile
+import env
+
+from comet.filewriter import FileWriter, CSVFileWriter
+
+class FileWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def filename(self, name):
+        return os.path.join(self.tempdir.name, name)
+
+    def read(self, filename):
+        with open(filename) as f:
+            return f.read().splitlines()
+
+    def testUnbuffered(self):
+        filename = self.filename('data.csv')
+        writer = CSVFileWriter(filename, ['time', 'v'])
+        writer.create()
+        writer.append(dict(time=1, v=2))
+        self.assertEqual(self.read(filename), ['time,v', '1,2'])
+        self.assertFalse(writer.is_open)
+
+    def testBuffered(self):
+        filename = self.filename('data.csv')
+        writer = CSVFileWriter(filename, ['time', 'v'], buffered=True, flush_interval=60.0, fsync='flush')
+        writer.create()
+        for i in range(100):
+            writer.append(dict(time=i, v=i * 2))
+        self.assertTrue(writer.is_open)
+        writer.flush()
+        lines = self.read(filename)
+        self.assertEqual(len(lines), 101)
+        self.assertEqual(lines[-1], '99,198')
+        writer.append(dict(time=100, v=200))
+        writer.close()
+        self.assertFalse(writer.is_open)
+        self.assertEqual(self.read(filename)[-1], '100,200')
+
+    def testFlushCount(self):
+        filename = self.filename('data.txt')
+        with FileWriter(filename, buffered=True, flush_count=2, flush_interval=60.0) as writer:
+            writer.create()
+            writer.append(1)
+            writer.append(2)
+            writer.append(3)
+        self.assertEqual(self.read(filename), ['1', '2', '3'])
+        self.assertRaises(ValueError, FileWriter, filename, fsync='spam')
+
+    def testThreadFailure(self):
+        filename = self.filename(os.path.join('missing', 'data.txt'))
+        writer = FileWriter(filename, buffered=True, queue_size=1)
+        writer.open()
+        self.assertRaises(FileNotFoundError, writer.flush, 5.0)
+        # Must raise instead of blocking on the full queue
+        for i in range(4):
+            self.assertRaises(FileNotFoundError, writer.append, i)
+        self.assertRaises(FileNotFoundError, writer.close)
+        self.assertFalse(writer.is_open)
+        os.makedirs(os.path.dirname(filename))
+        with writer:
+            writer.append(2)
+        self.assertEqual(self.read(filename), ['2'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,19 @@
+import json
+import os
+import tempfile
 import unittest
 import time
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
 import env
 
+import bottle
+
 from comet import Job
 from comet import Application
 from comet import HttpServer
+from comet import Collection
+from comet.device import Device
 
 class MyJob(Job):
     """Prints list of application params and shuts down application."""
@@ -23,8 +32,181 @@ class MyApplication(Application):
         self.add_param('i_compliance', default=1.0, min=0.0, max=2.0, unit='A', label="I compl.")
         self.add_job('list_params', MyJob)
 
+class IVCollection(Collection):
+
+    def setup(self):
+        self.add_metric('time', unit='s')
+        self.add_metric('v', unit='V')
+
+class EchoResource:
+
+    def query(self, message):
+        return message
+
+class ApiTest(unittest.TestCase):
+    """Calls request handlers of the HTTP server through WSGI."""
+
+    def setUp(self):
+        self.app = MyApplication()
+        self.iv = self.app.add_collection('iv', IVCollection, time_metric='time')
+        self.iv.extend(time=range(100), v=[i % 10 for i in range(100)])
+        self.environ = self.app.add_collection('environ', IVCollection, time_metric='time', rollup_intervals=(10, 50))
+        self.environ.extend(time=range(100), v=range(100))
+        self.app.devices['smu'] = Device('smu', EchoResource())
+        self.server = HttpServer(self.app)
+
+    def get(self, path, **query):
+        """Returns status code and decoded JSON response of GET request."""
+        environ = {}
+        setup_testing_defaults(environ)
+        environ['PATH_INFO'] = path
+        environ['QUERY_STRING'] = urlencode(query)
+        status = []
+        body = b''.join(bottle.default_app()(environ, lambda code, headers, exc_info=None: status.append(code)))
+        return int(status[0].split()[0]), json.loads(body.decode())
+
+    def testData(self):
+        status, result = self.get('/api/collections/iv/data')
+        self.assertEqual(status, 200)
+        collection = result['app']['collection']
+        self.assertEqual(collection['name'], 'iv')
+        self.assertEqual(collection['size'], 100)
+        self.assertEqual(collection['offset'], 0)
+        self.assertIsNone(collection['rollup'])
+        self.assertEqual(collection['metrics'], [
+            dict(name='time', label='Time', unit='s'),
+            dict(name='v', label='V', unit='V'),
+        ])
+        self.assertEqual(collection['records'][:2], [[0., 0.], [1., 1.]])
+        status, result = self.get('/api/collections/iv/data/offset/98')
+        self.assertEqual(result['app']['collection']['records'], [[98., 8.], [99., 9.]])
+        status, result = self.get('/api/collections/missing/data')
+        self.assertEqual(status, 200)
+        self.assertEqual(result['app']['collection']['records'], [])
+
+    def testCursor(self):
+        status, result = self.get('/api/collections/iv/data', cursor='', limit=60)
+        self.assertEqual(status, 200)
+        delta = result['app']['collection']
+        self.assertEqual((delta['cursor'], delta['generation'], delta['pending']), (60, 0, 40))
+        self.assertTrue(delta['reset'])
+        self.assertFalse(delta['wrapped'])
+        self.assertEqual(len(delta['records']), 60)
+        self.assertEqual([metric['name'] for metric in delta['metrics']], ['time', 'v'])
+        status, result = self.get('/api/collections/iv/data', cursor=delta['cursor'], generation=delta['generation'])
+        delta = result['app']['collection']
+        self.assertFalse(delta['reset'])
+        self.assertNotIn('metrics', delta)
+        self.assertEqual((delta['cursor'], delta['pending']), (100, 0))
+        self.assertEqual(delta['records'][0], [60., 0.])
+        # Generation changes on clear
+        self.iv.clear()
+        status, result = self.get('/api/collections/iv/data', cursor=100, generation=0)
+        delta = result['app']['collection']
+        self.assertTrue(delta['reset'])
+        self.assertEqual((delta['cursor'], delta['generation'], delta['records']), (0, 1, []))
+        # Limit is capped by server
+        self.server.max_records = 10
+        status, result = self.get('/api/collections/environ/data', cursor='', limit=50)
+        self.assertEqual(len(result['app']['collection']['records']), 10)
+
+    def testCursorErrors(self):
+        for query in (dict(cursor='abc'), dict(cursor='', generation='x'), dict(cursor='', limit='1.5')):
+            status, result = self.get('/api/collections/iv/data', **query)
+            self.assertEqual(status, 400)
+            self.assertIn('error', result)
+        status, result = self.get('/api/collections/missing/data', cursor='')
+        self.assertEqual(status, 404)
+        self.assertEqual(result, dict(error="no such collection: 'missing'"))
+
+    def testPoints(self):
+        status, result = self.get('/api/collections/iv/data', points=10, mode='minmax')
+        self.assertEqual(status, 200)
+        records = result['app']['collection']['records']
+        self.assertLessEqual(len(records), 12)
+        self.assertEqual(records[0], [0., 0.])
+        self.assertEqual(records[-1], [99., 9.])
+        status, result = self.get('/api/collections/iv/data', points=10)
+        self.assertLessEqual(len(result['app']['collection']['records']), 12)
+        for query in (dict(points='abc'), dict(points=0), dict(points=10, mode='median')):
+            status, result = self.get('/api/collections/iv/data', **query)
+            self.assertEqual(status, 400)
+            self.assertIn('error', result)
+
+    def testRange(self):
+        status, result = self.get('/api/collections/iv/data', **{'from': 10, 'to': 12.5})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['app']['collection']['records'], [[10., 0.], [11., 1.], [12., 2.]])
+        status, result = self.get('/api/collections/iv/data', **{'from': 95})
+        self.assertEqual(len(result['app']['collection']['records']), 5)
+        status, result = self.get('/api/collections/iv/data', to=1)
+        self.assertEqual(len(result['app']['collection']['records']), 2)
+        status, result = self.get('/api/collections/iv/data', **{'from': 'yesterday'})
+        self.assertEqual(status, 400)
+        self.assertIn('error', result)
+
+    def testRollup(self):
+        status, result = self.get('/api/collections/environ/data', points=20)
+        self.assertEqual(status, 200)
+        collection = result['app']['collection']
+        self.assertEqual(collection['rollup'], 10)
+        self.assertEqual([metric['name'] for metric in collection['metrics']], ['time', 'count', 'v_min', 'v_max', 'v_mean'])
+        self.assertEqual(collection['metrics'][2], dict(name='v_min', label='V min', unit='V'))
+        self.assertIsNone(collection['metrics'][1]['unit'])
+        self.assertEqual(len(collection['records']), 10)
+        self.assertEqual(collection['records'][0][:4], [0., 10, 0., 9.])
+        status, result = self.get('/api/collections/environ/data', points=5, **{'from': 0, 'to': 99})
+        self.assertEqual(result['app']['collection']['rollup'], 50)
+        # Raw records fitting into points
+        status, result = self.get('/api/collections/environ/data', points=1000)
+        self.assertIsNone(result['app']['collection']['rollup'])
+        self.assertEqual(len(result['app']['collection']['records']), 100)
+
+    def testSpill(self):
+        with tempfile.TemporaryDirectory() as path:
+            spill = self.app.add_collection('spill', IVCollection, capacity=16, spill_path=path, time_metric='time')
+            spill.extend(time=range(100), v=range(100))
+            self.assertGreater(spill.buffer.spilled, 0)
+            self.server.spill_records = 20
+            # Record sizes of all reads
+            reads = []
+            snapshot_from = spill.snapshot_from
+            def read(offset, limit=None):
+                records = snapshot_from(offset, limit)
+                reads.append(len(records))
+                return records
+            spill.snapshot_from = read
+            status, result = self.get('/api/collections/spill/data/offset/10')
+            self.assertEqual(status, 200)
+            records = result['app']['collection']['records']
+            self.assertEqual(result['app']['collection']['size'], 100)
+            self.assertEqual([record[0] for record in records], list(range(10, 30)))
+            status, result = self.get('/api/collections/spill/data', **{'from': 50, 'to': 60})
+            self.assertEqual(len(result['app']['collection']['records']), 11)
+            status, result = self.get('/api/collections/spill/data', points=10, mode='minmax')
+            records = result['app']['collection']['records']
+            self.assertLess(len(records), 30)
+            self.assertEqual((records[0][0], records[-1][0]), (0., 99.))
+            self.assertLessEqual(max(reads), 20)
+            self.assertEqual(len(reads), 2 + 5)
+
+    def testStats(self):
+        self.app.devices['smu'].query('*IDN?')
+        status, result = self.get('/api/devices/stats')
+        self.assertEqual(status, 200)
+        stats = result['app']['devices']['smu']
+        self.assertEqual(stats['operations']['query']['calls'], 1)
+        self.assertEqual(stats['operations']['query']['bytes_out'], 5)
+        self.assertEqual(set(stats['operations']['query']['latency']), {'count', 'total', 'mean', 'min', 'max', 'p50', 'p90', 'p99', 'p999'})
+        status, result = self.get('/api/devices/smu/stats')
+        self.assertEqual(result['app']['device']['name'], 'smu')
+        status, result = self.get('/api/devices/missing/stats')
+        self.assertEqual(status, 404)
+        self.assertEqual(result, dict(error="no such device: 'missing'"))
+
 class CommandLineTest(unittest.TestCase):
 
+    @unittest.skipUnless(os.environ.get('COMET_SERVER_TEST'), "serves until interrupted, set COMET_SERVER_TEST=1")
     def testMain(self):
         app = MyApplication()
         server = HttpServer(app)
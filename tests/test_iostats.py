@@ -0,0 +1,85 @@
+import threading
+import unittest
+import env
+
+from comet.device import Device, DeviceCommand
+from comet.iostats import Histogram, IOStats
+
+class FakeResource:
+
+    def write(self, message):
+        return len(message)
+
+    def query(self, message):
+        if message == 'ERR?':
+            raise IOError("timeout")
+        return '+1.000E-06'
+
+class HistogramTestCase(unittest.TestCase):
+    def runTest(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(histogram.percentile(50), None)
+        for value in range(1, 1001):
+            histogram.record(value * 1e-4)
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.mean, .05005)
+        self.assertEqual(histogram.min, 1e-4)
+        self.assertEqual(histogram.max, .1)
+        # Relative error below 1/16
+        for percent in (1, 50, 90, 99, 99.9):
+            expected = percent * 1e-3
+            self.assertLessEqual(histogram.percentile(percent), expected * 1.001)
+            self.assertGreater(histogram.percentile(percent), expected * (1 - 1 / 16.))
+        # Maximum lies in the last bucket, reported by its lower bound
+        self.assertLessEqual(histogram.percentile(100), histogram.max)
+        self.assertGreater(histogram.percentile(100), histogram.max * (1 - 1 / 16.))
+        self.assertEqual(set(histogram.to_dict().keys()), {'count', 'total', 'mean', 'min', 'max', 'p50', 'p90', 'p99', 'p999'})
+
+class DeviceStatsTestCase(unittest.TestCase):
+    def runTest(self):
+        device = Device('SMU', FakeResource())
+        device.write('*RST')
+        device.query('READ?')
+        device.query('READ?')
+        self.assertRaises(IOError, device.query, 'ERR?')
+        operations = device.stats.operations
+        self.assertEqual(list(operations.keys()), ['write', 'query'])
+        self.assertEqual(operations['write'].calls, 1)
+        self.assertEqual(operations['write'].bytes_out, 4)
+        self.assertEqual(operations['query'].calls, 3)
+        self.assertEqual(operations['query'].errors, 1)
+        self.assertEqual(operations['query'].bytes_out, 14)
+        self.assertEqual(operations['query'].bytes_in, 20)
+        self.assertEqual(operations['query'].wait.count, 3)
+        # Lock released after failure
+        self.assertFalse(device.mutex.locked())
+
+        # Commands
+        command = DeviceCommand('get_reading', 'query', message='READ?', cache_ttl=60)
+        command(device)
+        command(device)
+        command = DeviceCommand('get_reading', 'query', message='ERR?')
+        self.assertRaises(IOError, command, device)
+        stats = device.stats.commands['get_reading']
+        self.assertEqual(stats.calls, 3)
+        self.assertEqual(stats.cached, 1)
+        self.assertEqual(stats.errors, 1)
+        self.assertEqual(device.stats.to_dict()['commands']['get_reading']['calls'], 3)
+
+        device.stats.clear()
+        self.assertEqual(device.stats.to_dict(), {'operations': {}, 'commands': {}})
+
+class MutexWaitTestCase(unittest.TestCase):
+    def runTest(self):
+        device = Device('SMU', FakeResource())
+        device.mutex.acquire()
+        thread = threading.Thread(target=device.write, args=('*RST',))
+        thread.start()
+        thread.join(.05)
+        device.mutex.release()
+        thread.join()
+        self.assertGreaterEqual(device.stats.operations['write'].wait.max, .04)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 import env
 
@@ -36,5 +38,32 @@ class JobTest(unittest.TestCase):
         job.run()
         self.assertEqual(job.progress, 100.0) # 100%
 
+class WaitingJob(Job):
+
+    def run(self):
+        return self.wait(60)
+
+class JobWaitTest(unittest.TestCase):
+
+    def testWait(self):
+        app = MyApplication('MyApp')
+        handle = app.add_job('waiting', WaitingJob)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(handle.run()))
+        thread.start()
+        time.sleep(.01)
+        self.assertEqual(len(app.active_jobs), 1)
+        # Returns a snapshot
+        app.active_jobs.clear()
+        self.assertEqual(len(app.active_jobs), 1)
+        t = time.monotonic()
+        token = app.cancellation
+        app.quit()
+        thread.join()
+        self.assertLess(time.monotonic() - t, 1.)
+        self.assertEqual(results, [False])
+        self.assertTrue(token.cancelled)
+        self.assertEqual(len(app.active_jobs), 0)
+
 if __name__ == '__main__':
     unittest.main()
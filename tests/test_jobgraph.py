@@ -0,0 +1,137 @@
+import threading
+import time
+import unittest
+import env
+
+from comet.application import Application
+from comet.job import Job
+from comet.jobgraph import JobGraph, JobsCancelled
+
+class RecordingJob(Job):
+
+    duration = .05
+
+    def run(self):
+        with self.app.lock:
+            self.app.events.append(('start', self.name, time.monotonic()))
+            self.app.peak = max(self.app.peak, len(self.app.active_jobs))
+        time.sleep(self.duration)
+        with self.app.lock:
+            self.app.events.append(('stop', self.name, time.monotonic()))
+        return self.name
+
+class ClimateSettle(RecordingJob):
+    devices = ('climate',)
+
+class SmuSelftest(RecordingJob):
+    devices = ('smu',)
+
+class RampUp(RecordingJob):
+    requires = ('climate_settle', 'smu_selftest')
+    devices = ('smu',)
+
+class Longterm(RecordingJob):
+    requires = ('ramp_up',)
+    devices = ('smu', 'climate')
+
+class ClimateLog(RecordingJob):
+    devices = ('climate',)
+
+class FailingJob(RecordingJob):
+
+    def run(self):
+        raise RuntimeError(self.name)
+
+class MyApplication(Application):
+
+    def setup(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.peak = 0
+        self.add_job('climate_settle', ClimateSettle)
+        self.add_job('smu_selftest', SmuSelftest)
+        self.add_job('ramp_up', RampUp)
+        self.add_job('longterm', Longterm)
+        self.add_job('climate_log', ClimateLog)
+
+    def interval(self, name):
+        times = [t for event, job, t in self.events if job == name]
+        return times[0], times[1]
+
+def overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+class JobGraphTest(unittest.TestCase):
+
+    def testDependencies(self):
+        app = MyApplication('MyApp')
+        graph = JobGraph(app.jobs)
+        self.assertEqual(list(graph.resolve(['longterm'])), ['climate_settle', 'smu_selftest', 'ramp_up', 'longterm'])
+        self.assertRaises(KeyError, graph.resolve, ['selftest'])
+        class Circular(RecordingJob):
+            requires = ('circular',)
+        app.add_job('circular', Circular)
+        self.assertRaises(ValueError, JobGraph(app.jobs).resolve, ['circular'])
+
+    def testRun(self):
+        app = MyApplication('MyApp')
+        results = app.run_jobs('longterm', 'climate_log')
+        self.assertEqual(set(results.keys()), {'climate_settle', 'smu_selftest', 'ramp_up', 'longterm', 'climate_log'})
+        self.assertEqual(results['longterm'], 'longterm')
+        settle = app.interval('climate_settle')
+        selftest = app.interval('smu_selftest')
+        ramp_up = app.interval('ramp_up')
+        longterm = app.interval('longterm')
+        log = app.interval('climate_log')
+        # Independent jobs with distinct devices run in parallel
+        self.assertTrue(overlaps(settle, selftest))
+        self.assertEqual(app.peak, 2)
+        # Dependencies
+        self.assertGreaterEqual(ramp_up[0], max(settle[1], selftest[1]))
+        self.assertGreaterEqual(longterm[0], ramp_up[1])
+        # Shared devices never overlap
+        self.assertFalse(overlaps(log, settle))
+        self.assertFalse(overlaps(log, longterm))
+        self.assertEqual(len(app.active_jobs), 0)
+
+    def testFailure(self):
+        app = MyApplication('MyApp')
+        app.add_job('failing', FailingJob)
+        class Dependent(RecordingJob):
+            requires = ('failing',)
+        app.add_job('dependent', Dependent)
+        self.assertRaises(RuntimeError, app.run_jobs, 'dependent', 'smu_selftest')
+        self.assertEqual([job for event, job, t in app.events], ['smu_selftest', 'smu_selftest'])
+
+    def testCancelled(self):
+        app = MyApplication('MyApp')
+        app.cancellation.cancel()
+        with self.assertRaises(JobsCancelled) as context:
+            app.run_jobs('longterm')
+        self.assertEqual(context.exception.skipped, ['climate_settle', 'smu_selftest', 'ramp_up', 'longterm'])
+        self.assertEqual(context.exception.results, {})
+
+    def testCancelledWhileRunning(self):
+        app = MyApplication('MyApp')
+        class CancellingJob(RecordingJob):
+            def run(self):
+                self.app.cancellation.cancel()
+                return super(CancellingJob, self).run()
+        app.add_job('cancelling', CancellingJob)
+        class Dependent(RecordingJob):
+            requires = ('cancelling',)
+        app.add_job('dependent', Dependent)
+        with self.assertRaises(JobsCancelled) as context:
+            app.run_jobs('dependent')
+        self.assertEqual(list(context.exception.results), ['cancelling'])
+        self.assertEqual(context.exception.skipped, ['dependent'])
+
+    def testProgress(self):
+        app = MyApplication('MyApp')
+        handle = app.jobs.get('longterm')
+        handle.progress = 42
+        self.assertEqual(handle.progress, 42.)
+        self.assertEqual(app.jobs.get('longterm').progress, 42.)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import threading
+import time
+import unittest
+import env
+
+from pyvisa.constants import StatusCode
+from pyvisa.errors import VisaIOError
+
+from comet.application import Application
+from comet.device import Device, DeviceFactory
+from comet.resource import ReconnectingResource, is_connection_error
+
+class FlakyResource:
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.messages = []
+        self.closed = False
+
+    def write(self, message):
+        if self.manager.broken:
+            self.manager.broken -= 1
+            raise VisaIOError(StatusCode.error_connection_lost)
+        self.messages.append(message)
+
+    def read(self):
+        if self.manager.broken_reads:
+            self.manager.broken_reads -= 1
+            raise VisaIOError(StatusCode.error_connection_lost)
+        return 'OK' if self.messages else ''
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def write_raw(self, message):
+        self.write(message.decode())
+
+    def read_bytes(self, count):
+        return self.read().encode()[:count]
+
+    def query_binary_values(self, message):
+        self.write(message)
+        return [len(self.read())]
+
+    def close(self):
+        self.closed = True
+
+class FlakyResourceManager:
+    """Opens flaky resources, fails to open while refused is not zero."""
+
+    def __init__(self):
+        self.resources = []
+        self.broken = 0
+        self.broken_reads = 0
+        self.refused = 0
+
+    def open_resource(self, resource_name, **kwargs):
+        if self.refused:
+            self.refused -= 1
+            raise ConnectionRefusedError(resource_name)
+        resource = FlakyResource(self)
+        resource.options = kwargs
+        # Like pyvisa, options are set as resource attributes
+        for key, value in kwargs.items():
+            setattr(resource, key, value)
+        self.resources.append(resource)
+        return resource
+
+class ReconnectingResourceTestCase(unittest.TestCase):
+    def runTest(self):
+        self.assertTrue(is_connection_error(VisaIOError(StatusCode.error_connection_lost)))
+        self.assertTrue(is_connection_error(ConnectionResetError()))
+        self.assertFalse(is_connection_error(VisaIOError(StatusCode.error_timeout)))
+        self.assertFalse(is_connection_error(ValueError()))
+
+        rm = FlakyResourceManager()
+        latencies = []
+        resource = ReconnectingResource(rm, 'TCPIP::localhost::1080::SOCKET', {'timeout': 1000}, init=['*CLS'], on_reconnect=latencies.append, delay=.001)
+        self.assertEqual(resource.reconnect_timeout, 300.)
+        self.assertEqual(resource.options, {'timeout': 1000})
+        self.assertEqual(resource.timeout, 1000)
+        self.assertEqual(resource.query('*IDN?'), 'OK')
+        self.assertEqual(resource.reconnects, 0)
+        # Lost connection, two refused reconnect attempts
+        rm.broken = 1
+        rm.refused = 2
+        self.assertEqual(resource.query('READ?'), 'OK')
+        self.assertEqual(resource.reconnects, 1)
+        self.assertEqual(len(rm.resources), 2)
+        self.assertTrue(rm.resources[0].closed)
+        self.assertIs(resource.resource, rm.resources[1])
+        self.assertEqual(rm.resources[1].messages, ['*CLS', 'READ?'])
+        self.assertEqual(latencies, [resource.latency])
+        self.assertGreater(resource.latency, .002)
+        # Assigned attributes are applied after reconnecting
+        resource.read_termination = '\r\n'
+        self.assertEqual(rm.resources[1].read_termination, '\r\n')
+        self.assertNotIn('read_termination', resource.__dict__)
+        rm.broken = 1
+        resource.write('*RST')
+        self.assertEqual(rm.resources[2].options, {'timeout': 1000, 'read_termination': '\r\n'})
+        self.assertEqual(resource.read_termination, '\r\n')
+        # Give up after timeout
+        resource.reconnect_timeout = .01
+        rm.broken = 1
+        rm.refused = 100
+        self.assertRaises(ConnectionRefusedError, resource.write, 'OUTP OFF')
+        # Other errors are passed
+        rm.refused = 0
+        resource.reconnect()
+        rm.resources[-1].write = None
+        self.assertRaises(TypeError, resource.write, 'OUTP OFF')
+
+class DeviceFactoryReconnectTestCase(unittest.TestCase):
+    def runTest(self):
+        rm = FlakyResourceManager()
+        factory = DeviceFactory(rm)
+        device = factory.create('cts', 'TCPIP::localhost::1080::SOCKET', {'reconnect': {'delay': .001}})
+        self.assertIsInstance(device.resource, ReconnectingResource)
+        self.assertEqual(device.resource.delay, .001)
+        device = factory.create('cts', 'TCPIP::localhost::1080::SOCKET', {'timeout': 1000, 'reconnect': {'reconnect_timeout': 60}})
+        self.assertEqual(device.resource.reconnect_timeout, 60.)
+        self.assertEqual(device.resource.options, {'timeout': 1000})
+        rm.broken = 1
+        device.write('*RST')
+        self.assertEqual(device.stats.operations['reconnect'].calls, 1)
+        device = factory.create('cts', 'TCPIP::localhost::1080::SOCKET', {'reconnect': False})
+        self.assertNotIsInstance(device.resource, ReconnectingResource)
+        device = factory.create('smu', 'GPIB::16', {})
+        self.assertNotIsInstance(device.resource, ReconnectingResource)
+        device = factory.create('smu', 'GPIB::16', {'reconnect': True})
+        self.assertIsInstance(device.resource, ReconnectingResource)
+        self.assertRaises(KeyError, factory.create, 'cts', 'TCPIP::localhost::1080::SOCKET', {'reconnect': {'retries': 4}})
+        self.assertRaises(KeyError, factory.create, 'cts', 'TCPIP::localhost::1080::SOCKET', {'reconnect': {'timeout': 300}})
+        self.assertFalse(factory.is_reconnecting('TCPIP::localhost::1080::SOCKET', {'reconnect': 0}))
+        self.assertTrue(factory.is_reconnecting('GPIB::16', {'reconnect': {}}))
+        self.assertRaises(ValueError, factory.is_reconnecting, 'GPIB::16', {'reconnect': 'no'})
+
+class ReconnectOperationTestCase(unittest.TestCase):
+    def runTest(self):
+        rm = FlakyResourceManager()
+        resource = ReconnectingResource(rm, 'TCPIP::localhost::1080::SOCKET', delay=.001)
+        device = Device('cts', resource)
+        # Queries failing while reading are repeated including the write
+        rm.broken_reads = 1
+        self.assertEqual(resource.query_binary_values('TRAC:DATA?'), [2])
+        self.assertEqual(rm.resources[-1].messages, ['TRAC:DATA?'])
+        rm.broken_reads = 1
+        self.assertEqual(device.query_bytes(b'T', 2), b'OK')
+        self.assertEqual(rm.resources[-1].messages, ['T'])
+        self.assertEqual(resource.reconnects, 2)
+        # Operations are repeated once only
+        rm.broken_reads = 2
+        self.assertRaises(VisaIOError, device.query_bytes, b'T', 2)
+        self.assertEqual(resource.reconnects, 3)
+
+class ReconnectCancelTestCase(unittest.TestCase):
+    def runTest(self):
+        rm = FlakyResourceManager()
+        resource = ReconnectingResource(rm, 'TCPIP::localhost::1080::SOCKET', delay=60.)
+        app = Application('MyApp')
+        app.devices['cts'] = Device('cts', resource)
+        rm.broken = 1
+        rm.refused = 100
+        errors = []
+        def write():
+            try:
+                app.devices['cts'].write('*RST')
+            except Exception as e:
+                errors.append(e)
+        thread = threading.Thread(target=write)
+        start = time.monotonic()
+        thread.start()
+        # Quit while waiting for the next reconnect attempt
+        while rm.refused == 100:
+            time.sleep(.001)
+        app.quit()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIsInstance(errors[0], ConnectionRefusedError)
+        # Cancelling does not affect later reconnects
+        rm.refused = 0
+        resource.reconnect()
+        self.assertEqual(resource.reconnects, 1)
+
+class CustomDevice(Device):
+    pass
+
+class DeviceFactoryClassTestCase(unittest.TestCase):
+    def runTest(self):
+        factory = DeviceFactory(FlakyResourceManager())
+        device = factory.create('cts', 'TCPIP::localhost::1080::SOCKET', {}, cls=CustomDevice)
+        self.assertIsInstance(device, CustomDevice)
+        self.assertIsInstance(device.resource, ReconnectingResource)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import env
+
+import numpy as np
+
+from comet.application import Application
+from comet.collection import Collection
+from comet.rollup import Rollup
+
+class MyApplication(Application):
+    pass
+
+class MyCollection(Collection):
+
+    def setup(self):
+        self.add_metric('time', unit='s')
+        self.add_metric('temp', unit='degC')
+        self.add_metric('label', type=str)
+
+class RollupTest(unittest.TestCase):
+
+    def testAppend(self):
+        rollup = Rollup(10, ['v'])
+        for t in range(25):
+            rollup.append(t, [t])
+        self.assertEqual(len(rollup), 3)
+        self.assertEqual(rollup.names, ['time', 'count', 'v_min', 'v_max', 'v_mean'])
+        self.assertEqual(rollup.records().tolist(), [
+            [0., 10, 0., 9., 4.5],
+            [10., 10, 10., 19., 14.5],
+            [20., 5, 20., 24., 22.]
+        ])
+        self.assertEqual(rollup.records(12, 15).tolist(), [[10., 10, 10., 19., 14.5]])
+        self.assertEqual(rollup.count(12, 21), 2)
+
+    def testExtend(self):
+        reference = Rollup(10, ['v'])
+        rollup = Rollup(10, ['v'])
+        t = np.arange(0., 95., 1.5)
+        for value in t:
+            reference.append(value, [value * 2])
+        rollup.extend(t[:7], [t[:7] * 2])
+        rollup.extend(t[7:8], [t[7:8] * 2])
+        rollup.extend(t[8:], [t[8:] * 2])
+        self.assertEqual(rollup.records().tolist(), reference.records().tolist())
+
+    def testCollection(self):
+        app = MyApplication('MyApp')
+        collection = MyCollection(app, 'coll', time_metric='time', rollup_intervals=(60, 1, 10))
+        self.assertEqual(list(collection.rollups.keys()), [1, 10, 60])
+        collection.extend(time=np.arange(0., 600., .5), temp=np.ones(1200), label=['x'] * 1200)
+        collection.append(time=600., temp=3., label='y')
+        self.assertEqual(collection.rollups[60].metrics, ['temp'])
+        self.assertIsNone(collection.select_rollup(2000))
+        self.assertEqual(collection.select_rollup(100).width, 10)
+        self.assertEqual(collection.select_rollup(150, 500., 600.).width, 1)
+        self.assertEqual(collection.select_rollup(5).width, 60)
+        self.assertEqual(collection.rollups[60].records(540).tolist(), [[540., 120, 1., 1., 1.], [600., 1, 3., 3., 3.]])
+        collection.clear()
+        self.assertEqual(len(collection.rollups[60]), 0)
+        self.assertRaises(ValueError, MyCollection(app, 'coll', rollup_intervals=(1,)).append, time=0, temp=0, label='')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import threading
+import time
+import env
+
+from comet.application import Application
+from comet.scheduler import Scheduler
+
+class MyApplication(Application):
+    pass
+
+class SlowDevice:
+
+    name = 'slow'
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_channel(self, channel):
+        self.calls += 1
+        time.sleep(.1)
+        return channel * 2
+
+class FastDevice:
+
+    name = 'fast'
+
+    def get_channel(self, channel):
+        return channel
+
+class SchedulerTest(unittest.TestCase):
+
+    def testCoalescing(self):
+        app = MyApplication('MyApp')
+        scheduler = Scheduler(app, 'scheduler')
+        device = SlowDevice()
+        results = []
+        def worker():
+            results.append(scheduler.request(device, 'get_channel', 21))
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(device.calls, 1)
+        self.assertEqual(scheduler.request(device, 'get_channel', 21, max_age=10.), 42)
+        self.assertEqual(device.calls, 1)
+        self.assertEqual(scheduler.request(device, 'get_channel', 21), 42)
+        self.assertEqual(device.calls, 2)
+        # Unhashable arguments are not coalesced
+        self.assertIsNone(scheduler.make_key(device, 'get_channel', ([1],), {}))
+        self.assertEqual(scheduler.request(device, 'get_channel', [1], max_age=10.), [1, 1])
+        self.assertEqual(scheduler.request(device, 'get_channel', channel=[1]), [1, 1])
+        self.assertEqual(device.calls, 4)
+        poll = scheduler.add_poll(device, 'get_channel', [1])
+        self.assertIs(scheduler.add_poll(device, 'get_channel', [1]), poll)
+
+    def testPoll(self):
+        app = MyApplication('MyApp')
+        scheduler = Scheduler(app, 'scheduler')
+        device = SlowDevice()
+        poll = scheduler.add_poll(device, 'get_channel', 1, interval=.05)
+        self.assertIs(scheduler.add_poll(device, 'get_channel', 1, interval=1.), poll)
+        values = []
+        poll.subscribe(values.append)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        time.sleep(.35)
+        scheduler.quit()
+        thread.join()
+        self.assertGreaterEqual(len(values), 2)
+        self.assertEqual(poll.value, 2)
+        self.assertEqual(set(values), {2})
+
+    def testIndependentPolls(self):
+        app = MyApplication('MyApp')
+        scheduler = Scheduler(app, 'scheduler')
+        slow = SlowDevice()
+        slow_poll = scheduler.add_poll(slow, 'get_channel', 1, interval=.05)
+        fast_poll = scheduler.add_poll(FastDevice(), 'get_channel', 1, interval=.02)
+        fast_values = []
+        fast_poll.subscribe(fast_values.append)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        time.sleep(.35)
+        scheduler.quit()
+        thread.join()
+        # Slow polls of one device never overlap and do not block fast polls
+        self.assertLessEqual(slow.calls, 4)
+        self.assertGreater(len(fast_values), slow.calls * 2)
+
+    def testCacheSize(self):
+        app = MyApplication('MyApp')
+        scheduler = Scheduler(app, 'scheduler')
+        scheduler.cache_size = 4
+        device = FastDevice()
+        for channel in range(10):
+            scheduler.request(device, 'get_channel', channel)
+        self.assertEqual(scheduler.cache_count, 4)
+        self.assertEqual(scheduler.request(device, 'get_channel', 9, max_age=10.), 9)
+        scheduler.clear_cache()
+        self.assertEqual(scheduler.cache_count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
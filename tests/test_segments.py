@@ -0,0 +1,52 @@
+import unittest
+import os
+import tempfile
+import env
+
+import numpy as np
+
+from comet.metric import Metric
+from comet.storage import Records
+from comet.segments import Segment, SegmentReader
+from comet.filewriter import SegmentFileWriter
+
+class SegmentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.metrics = [Metric('time', unit='s'), Metric('n', type=int), Metric('ok', type=bool)]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testSegment(self):
+        filename = os.path.join(self.tempdir.name, 'test.seg')
+        segment = Segment.create(filename, self.metrics, 2)
+        self.assertTrue(segment.append((1.5, 42, True)))
+        self.assertTrue(segment.append((2.5, 43, False)))
+        self.assertFalse(segment.append((3.5, 44, True)))
+        segment.close()
+        segment = Segment(filename)
+        self.assertEqual(len(segment), 2)
+        self.assertEqual(segment.capacity, 2)
+        self.assertEqual(segment.metrics[0], dict(name='time', unit='s', label='Time', dtype='<f8'))
+        self.assertEqual(segment.records().tolist(), [[1.5, 42, True], [2.5, 43, False]])
+        self.assertRaises(ValueError, Segment.create, filename, [Metric('name', type=str)], 2)
+
+    def testWriter(self):
+        path = os.path.join(self.tempdir.name, 'data')
+        writer = SegmentFileWriter(path, self.metrics, segment_size=4)
+        writer.create()
+        writer.append(dict(time=0., n=0, ok=True))
+        writer.extend(Records([('time', np.arange(1., 10.)), ('n', np.arange(1, 10)), ('ok', np.ones(9, dtype=bool))]))
+        writer.close()
+        reader = SegmentReader(path)
+        self.assertEqual(reader.path, path)
+        self.assertFalse(hasattr(reader, 'directory'))
+        self.assertEqual(len(reader.segments), 3)
+        self.assertEqual(len(reader), 10)
+        self.assertEqual(reader.read()['n'].tolist(), list(range(10)))
+        self.assertEqual([len(records) for records in reader], [4, 4, 2])
+
+if __name__ == '__main__':
+    unittest.main()
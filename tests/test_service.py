@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 import env
 
@@ -44,5 +46,24 @@ class ServiceTest(unittest.TestCase):
         service.quit()
         self.assertFalse(service.is_alive)
 
+class ServiceWaitTest(unittest.TestCase):
+
+    def testWait(self):
+        app = MyApplication('MyApp')
+        service = MyService(app, 'MyTestService')
+        self.assertTrue(service.wait(.001))
+        results = []
+        thread = threading.Thread(target=lambda: results.append(service.wait(60)))
+        thread.start()
+        time.sleep(.01)
+        t = time.monotonic()
+        service.quit()
+        thread.join()
+        self.assertLess(time.monotonic() - t, 1.)
+        self.assertEqual(results, [False])
+        self.assertTrue(service.is_cancelled)
+        # Application token not affected
+        self.assertFalse(app.cancellation.cancelled)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,12 @@
 import unittest
+import json
+import os
+import tempfile
+import time
 import env
 
 from comet import Settings
+from comet import SettingsStore
 
 class SettingsTest(unittest.TestCase):
 
@@ -9,5 +14,44 @@ class SettingsTest(unittest.TestCase):
         with Settings('HEPHY', 'comet', persistent=False) as settings:
             print(settings)
 
+class SettingsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def read(self, store):
+        with open(store.filename) as f:
+            return json.load(f)
+
+    def testWriteBehind(self):
+        store = SettingsStore('HEPHY', 'comet', path=self.tempdir.name)
+        store.write_delay = 60.0
+        store.set('user', 'Monty')
+        store.set('users', ['Monty', 'John'])
+        self.assertEqual(store.get('user'), 'Monty')
+        self.assertFalse(os.path.exists(store.filename))
+        store.flush()
+        self.assertEqual(self.read(store), {'user': 'Monty', 'users': ['Monty', 'John']})
+        store.remove('users')
+        store.flush()
+        self.assertEqual(self.read(store), {'user': 'Monty'})
+        self.assertEqual(os.listdir(self.tempdir.name), ['settings.json'])
+
+    def testReload(self):
+        store = SettingsStore('HEPHY', 'comet', path=self.tempdir.name)
+        store.check_interval = 0.0
+        store.set('user', 'Monty')
+        store.flush()
+        time.sleep(0.01)
+        with open(store.filename, 'w') as f:
+            json.dump({'user': 'John', 'spam': 42}, f)
+        store.set('eggs', 1)
+        self.assertEqual(store.get('user'), 'John')
+        store.flush()
+        self.assertEqual(self.read(store), {'user': 'John', 'spam': 42, 'eggs': 1})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import env
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Measured in a fresh interpreter, prints elapsed seconds and loaded modules.
+script = """
+import json, sys, time
+t = time.perf_counter()
+import comet
+import_time = time.perf_counter() - t
+modules = sorted(name for name in {heavy!r} if name in sys.modules)
+import comet.filewriter
+writer_modules = sorted(name for name in {heavy!r} if name in sys.modules)
+from comet.application import Application
+t = time.perf_counter()
+Application('benchmark')
+construct_time = time.perf_counter() - t
+print(json.dumps(dict(import_time=import_time, construct_time=construct_time, modules=modules, writer_modules=writer_modules)))
+"""
+
+class StartupBenchmarkTest(unittest.TestCase):
+    """Regression benchmark of the startup of comet. By default timing
+    budgets are enforced with a tolerance for loaded test machines, strict
+    budgets only if environment variable COMET_BENCHMARK is set."""
+
+    import_budget = 0.1
+    """Maximum seconds for importing package comet."""
+
+    construct_budget = 0.05
+    """Maximum seconds for constructing an application."""
+
+    heavy_modules = ('pyvisa', 'yaml', 'statemachine', 'bottle', 'appdirs', 'numpy')
+    """Modules not to be loaded by importing package comet."""
+
+    tolerance = 5
+    """Factor applied to budgets unless running as benchmark."""
+
+    repeat = 3
+
+    def measure(self, repeat):
+        environ = dict(os.environ, PYTHONPATH=root)
+        code = script.format(heavy=self.heavy_modules)
+        results = []
+        for _ in range(repeat):
+            output = subprocess.check_output([sys.executable, '-c', code], cwd=root, env=environ)
+            results.append(json.loads(output.decode().splitlines()[-1]))
+        return results
+
+    def testModules(self):
+        result, = self.measure(1)
+        self.assertEqual(result['modules'], [])
+        self.assertEqual(result['writer_modules'], [])
+
+    def testBudget(self):
+        tolerance = 1 if os.environ.get('COMET_BENCHMARK') else self.tolerance
+        results = self.measure(self.repeat)
+        import_time = min(result['import_time'] for result in results)
+        construct_time = min(result['construct_time'] for result in results)
+        self.assertLess(import_time, self.import_budget * tolerance)
+        self.assertLess(construct_time, self.construct_budget * tolerance)
+
+    def testLazyAttributes(self):
+        import comet
+        self.assertIn('Application', dir(comet))
+        self.assertIs(comet.Variant, __import__('comet.variant', fromlist=['Variant']).Variant)
+        self.assertRaises(AttributeError, getattr, comet, 'Missing')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import time
+import unittest
+import env
+
+from comet.application import Application
+from comet.service import Service
+from comet.supervisor import Supervisor
+
+class FailingService(Service):
+
+    restart_delay = .01
+
+    def setup(self):
+        self.runs = 0
+
+    def run(self):
+        self.runs += 1
+        if self.runs < 3:
+            raise RuntimeError("failure #{}".format(self.runs))
+        self.wait(60)
+
+class BrokenService(FailingService):
+
+    restart_policy = 'never'
+
+class PeriodicService(Service):
+
+    interval = .05
+
+    def setup(self):
+        self.calls = []
+
+    def periodic(self):
+        self.calls.append(time.monotonic())
+        # Time spent in periodic must not add up
+        time.sleep(.04)
+
+class SupervisorTest(unittest.TestCase):
+
+    def testSupervisor(self):
+        app = Application('MyApp')
+        failing = app.add_service('failing', FailingService)
+        broken = app.add_service('broken', BrokenService)
+        supervisor = Supervisor(app.services.values())
+        supervisor.start()
+        time.sleep(.21)
+        t = time.monotonic()
+        for service in app.services.values():
+            service.quit()
+        supervisor.join()
+        self.assertLess(time.monotonic() - t, 1.)
+        # Restarted with backoff
+        self.assertEqual(failing.runs, 3)
+        self.assertEqual(failing.failures, 2)
+        self.assertEqual(failing.restarts, 2)
+        self.assertIsInstance(failing.error, RuntimeError)
+        # Not restarted
+        self.assertEqual(broken.runs, 1)
+        self.assertEqual(broken.restarts, 0)
+
+    def testPeriodic(self):
+        app = Application('MyApp')
+        periodic = app.add_service('periodic', PeriodicService)
+        supervisor = Supervisor([periodic])
+        supervisor.start()
+        time.sleep(.6)
+        periodic.quit()
+        supervisor.join()
+        calls = periodic.calls
+        self.assertGreaterEqual(len(calls), 4)
+        # At most one call per interval, a late call is followed by an
+        # early one but never by two calls within the same interval
+        slots = [int((call - calls[0] + .005) // periodic.interval) for call in calls]
+        for previous, slot in zip(slots, slots[1:]):
+            self.assertGreater(slot, previous)
+        # Drift free: mean period stays at the interval, a drifting loop
+        # would call every interval plus time spent in periodic (1.8x)
+        period = (calls[-1] - calls[0]) / (len(calls) - 1)
+        self.assertLess(period, periodic.interval * 1.4)
+
+if __name__ == '__main__':
+    unittest.main()